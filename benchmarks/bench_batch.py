@@ -0,0 +1,102 @@
+"""
+Measures the bookkeeping of BatchManager.save (chunking, building the requests and matching
+the responses) against a client answering batch requests without network, and compares it
+with the previous implementation, which removed sent objects from the list and scanned the
+requests for each response bId.
+
+    python benchmarks/bench_batch.py
+
+The time per object stays flat as batches grow, while the previous implementation slows down
+with the size of the batch.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from quickbooks import codec  # noqa: E402
+from quickbooks.batch import BatchManager  # noqa: E402
+from quickbooks.objects import Customer  # noqa: E402
+from quickbooks.objects.batchrequest import BatchItemResponse, BatchResponse  # noqa: E402
+
+
+class EchoClient(object):
+    """
+    Answers batch requests with the objects sent, like QBO does for successful updates
+    """
+
+    def batch_operation(self, request_body):
+        items = codec.loads(request_body)["BatchItemRequest"]
+
+        # Reversed, QBO doesn't keep the order of the requests
+        return {"BatchItemResponse": [
+            {"bId": item["bId"], "Customer": item["Customer"]} for item in reversed(items)]}
+
+    def invalidate_cache(self, qbbo, pk):
+        pass
+
+
+class LegacyBatchManager(BatchManager):
+    def save(self, obj_list, qb=None):
+        batch_response = BatchResponse()
+
+        while len(obj_list) > 0:
+            temp_list = obj_list[:self._max_request_items]
+            obj_list = [item for item in obj_list if item not in temp_list]
+            result = self.process_batch(temp_list, qb=qb)
+
+            batch_response.batch_responses += result.batch_responses
+            batch_response.original_list += result.original_list
+            batch_response.successes += result.successes
+            batch_response.faults += result.faults
+
+        return batch_response
+
+    def batch_results_to_list(self, json_data, batch, original_list):
+        response = BatchResponse()
+        response.original_list = original_list
+
+        for data in json_data['BatchItemResponse']:
+            response_item = BatchItemResponse.from_json(data)
+
+            batch_item = [obj for obj in batch.BatchItemRequest if obj.bId == response_item.bId][0]
+            response_item.set_object(batch_item.get_object())
+
+            response.batch_responses.append(response_item)
+            response.successes.append(Customer.from_json(data["Customer"]))
+
+        return response
+
+
+def customers(count):
+    return [Customer.from_json(
+        {"Id": str(i), "SyncToken": "0", "DisplayName": "Customer {0}".format(i)})
+        for i in range(count)]
+
+
+def run(manager_class, obj_list):
+    start = time.perf_counter()
+    results = manager_class("update").save(obj_list, qb=EchoClient())
+    elapsed = time.perf_counter() - start
+
+    assert len(results.successes) == len(obj_list)
+    return elapsed
+
+
+def main(sizes=(1000, 5000, 10000, 100000), legacy_sizes=(1000, 5000, 10000)):
+    for count in sizes:
+        obj_list = customers(count)
+        current = run(BatchManager, obj_list)
+        line = "{0:>7} objects  current {1:8.2f} s {2:6.1f} us/object".format(
+            count, current, current / count * 1e6)
+
+        if count in legacy_sizes:
+            legacy = run(LegacyBatchManager, obj_list)
+            line += "  legacy {0:8.2f} s {1:6.1f} us/object".format(legacy, legacy / count * 1e6)
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Decodes a query response page of 1000 invoices with every installed JSON backend.
+
+    python benchmarks/bench_json_decode.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_from_json import invoice_json  # noqa: E402
+from quickbooks import codec  # noqa: E402
+
+
+def main(number=10):
+    page = {"QueryResponse": {"Invoice": [invoice_json() for _ in range(1000)], "startPosition": 1,
+                              "maxResults": 1000}}
+    content = json.dumps(page).encode("utf-8")
+    print("page size {0:.1f} MB".format(len(content) / 1e6))
+
+    # What requests' Response.json() does for a response with a known encoding
+    baseline = min(timeit.repeat(
+        lambda: json.loads(content.decode("utf-8")), number=number, repeat=3))
+    print("{0:<11} {1:8.1f} ms".format("requests", baseline / number * 1e3))
+
+    for name in codec.DECODER_PREFERENCE:
+        if name not in codec.DECODERS:
+            continue
+
+        codec.set_backend(decoder=name)
+        elapsed = min(timeit.repeat(lambda: codec.loads(content), number=number, repeat=3))
+        print("{0:<11} {1:8.1f} ms  speedup {2:4.1f}x".format(
+            name, elapsed / number * 1e3, baseline / elapsed))
+
+    codec.set_backend()
+
+
+if __name__ == "__main__":
+    main()
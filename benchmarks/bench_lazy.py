@@ -0,0 +1,56 @@
+"""
+Compares from_json with lazy_class for a scan reading Id, DocNumber and DepartmentRef of
+every invoice of a page.
+
+    python benchmarks/bench_lazy.py
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_from_json import invoice_json  # noqa: E402
+from quickbooks.mixins import lazy_class  # noqa: E402
+from quickbooks.objects import Invoice  # noqa: E402
+
+
+def scan(cls, page):
+    invoices = [cls.from_json(data) for data in page]
+
+    for invoice in invoices:
+        invoice.Id, invoice.DocNumber, invoice.DepartmentRef
+
+    return invoices
+
+
+def allocated(cls, page):
+    tracemalloc.start()
+    invoices = scan(cls, page)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del invoices
+    return size
+
+
+def main(number=5):
+    page = [invoice_json() for _ in range(1000)]
+
+    for cls in (Invoice, lazy_class(Invoice)):
+        scan(cls, page)
+
+    eager = min(timeit.repeat(lambda: scan(Invoice, page), number=number, repeat=3)) / number
+    lazy = min(timeit.repeat(
+        lambda: scan(lazy_class(Invoice), page), number=number, repeat=3)) / number
+
+    print("1000 invoices  from_json {0:6.1f} ms {1:6.1f} MB  lazy {2:6.1f} ms {3:6.1f} MB  "
+          "speedup {4:4.1f}x".format(
+              eager * 1e3, allocated(Invoice, page) / 1e6, lazy * 1e3,
+              allocated(lazy_class(Invoice), page) / 1e6, eager / lazy))
+
+
+if __name__ == "__main__":
+    main()
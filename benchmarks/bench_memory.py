@@ -0,0 +1,56 @@
+"""
+Compares the memory taken by objects built by from_json with their compact_class version.
+
+    python benchmarks/bench_memory.py
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_from_json import ADDRESS, META, REF, bill_json, invoice_json  # noqa: E402
+from quickbooks.mixins import compact_class  # noqa: E402
+from quickbooks.objects import Bill, Customer, Invoice  # noqa: E402
+from quickbooks.objects.base import Ref  # noqa: E402
+
+
+def customer_json():
+    return {
+        "Id": "1", "SyncToken": "0", "DisplayName": "Amy's Bird Sanctuary", "GivenName": "Amy",
+        "FamilyName": "Lauterbach", "CompanyName": "Amy's Bird Sanctuary", "Active": True,
+        "Taxable": True, "Balance": 239.0, "BalanceWithJobs": 239.0,
+        "PreferredDeliveryMethod": "Print", "MetaData": META, "BillAddr": ADDRESS,
+        "ShipAddr": ADDRESS, "PrimaryEmailAddr": {"Address": "amy@example.com"},
+        "PrimaryPhone": {"FreeFormNumber": "(650) 555-3311"}, "CurrencyRef": REF,
+    }
+
+
+def footprint(cls, data, count=2000):
+    """
+    :return: Bytes allocated per object, json data excluded
+    """
+    cls.from_json(data)
+
+    tracemalloc.start()
+    objects = [cls.from_json(data) for _ in range(count)]
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del objects
+    return allocated / float(count)
+
+
+def main():
+    for cls, data in ((Ref, REF), (Customer, customer_json()), (Invoice, invoice_json(lines=5)),
+                      (Bill, bill_json(lines=5))):
+        default = footprint(cls, data)
+        compact = footprint(compact_class(cls), data)
+
+        print("{0:<9} default {1:8.0f} bytes  compact {2:8.0f} bytes  saving {3:3.0f}%".format(
+            cls.__name__, default, compact, 100 * (1 - compact / default)))
+
+
+if __name__ == "__main__":
+    main()
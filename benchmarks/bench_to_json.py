@@ -0,0 +1,33 @@
+"""
+Compares the pretty printed ToJsonMixin.to_json with to_compact_json, which is used for
+request bodies.
+
+    python benchmarks/bench_to_json.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_from_json import bill_json, invoice_json, journal_entry_json  # noqa: E402
+from quickbooks.objects import Bill, Invoice, JournalEntry  # noqa: E402
+
+
+def main(number=200):
+    for cls, data in ((Invoice, invoice_json()), (Bill, bill_json()),
+                      (JournalEntry, journal_entry_json())):
+        obj = cls.from_json(data)
+
+        pretty = min(timeit.repeat(obj.to_json, number=number, repeat=5))
+        compact = min(timeit.repeat(obj.to_compact_json, number=number, repeat=5))
+
+        print("{0:<13} to_json {1:8.1f} us {2:6d} bytes  to_compact_json {3:8.1f} us {4:6d} bytes  "
+              "speedup {5:4.1f}x".format(
+                  cls.__name__, pretty / number * 1e6, len(obj.to_json()), compact / number * 1e6,
+                  len(obj.to_compact_json()), pretty / compact))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ import getopt
 from intuitlib.client import AuthClient
 from intuitlib.enums import Scopes
 from quickbooks import QuickBooks
+from quickbooks.cache import EntityCache
+from quickbooks.mixins import lazy_class
 from quickbooks.objects.customer import Customer
 from quickbooks.objects.invoice import Invoice
 from quickbooks.objects.department import Department
@@ -87,8 +89,6 @@ class PythonQuickBooks(object):
 
         Create a client for the API and load all the clients
         to speed up the retrival process.
-
-        TODO now it loads only 1000 clients, extend to all
         """
 
         super(PythonQuickBooks, self).__init__()
@@ -99,51 +99,21 @@ class PythonQuickBooks(object):
         self.trovati = 0
 
     def _load_customers(self):
-        customers = Customer.where(
-            "Active=True",
-            order_by='DisplayName',
-            max_results=1000,
-            start_position=1,
-            qb=self.client)
-
-        customers += Customer.where(
+        return list(Customer.iter_where(
             "Active=True",
             order_by='DisplayName',
-            max_results=1000,
-            start_position=1000,
-            qb=self.client)
-
-        return customers
+            qb=self.client))
 
     def _load_invoices(self):
-        invoices = Invoice.where(
-            max_results=1000,
-            start_position=1,
+        # Only a few fields are read, nested objects are built when accessed
+        return list(lazy_class(Invoice).iter_all(
             order_by="TxnDate DESC",
-            qb=self.client)
-
-        invoices += Invoice.where(
-            max_results=1000,
-            start_position=1000,
-            order_by="TxnDate DESC",
-            qb=self.client)
-
-        return invoices
+            qb=self.client))
 
     def _load_creditnotes(self):
-        creditnotes = CreditMemo.where(
-            max_results=1000,
-            start_position=1,
+        return list(lazy_class(CreditMemo).iter_all(
             order_by="TxnDate DESC",
-            qb=self.client)
-
-        creditnotes += CreditMemo.where(
-            max_results=1000,
-            start_position=1000,
-            order_by="TxnDate DESC",
-            qb=self.client)
-
-        return creditnotes
+            qb=self.client))
 
     def _create_client(self):
         auth_client = AuthClient(
@@ -176,7 +146,9 @@ class PythonQuickBooks(object):
             auth_client=auth_client,
             refresh_token=REFRESH_TOKEN,
             company_id=COMPANY_ID,
-            minorversion=54
+            minorversion=54,
+            # Customers and terms are read again for every invoice
+            entity_cache=EntityCache(),
         )
 
         # return None
@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+try:  # Python 3
+    import http.client as httplib
+except ImportError:  # Python 2
+    import httplib
+
+from . import codec, exceptions
+from .client import QuickBooks
+
+try:
+    import aiohttp
+except ImportError:
+    print("Please install aiohttp to use AsyncQuickBooks:\n\n")
+    print("pip install python-quickbooks[async]\n")
+    raise
+
+
+class AsyncResponse(object):
+    """
+    Fully read aiohttp response exposing the parts of the requests.Response interface
+    used by QuickBooks._handle_response
+    """
+
+    def __init__(self, status_code, content, encoding="utf-8", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, "replace")
+
+    def json(self):
+        return codec.loads(self.content)
+
+
+class AsyncQuickBooks(QuickBooks):
+    """
+    QuickBooks client for asyncio applications. make_request, process_request and
+    download_pdf are coroutines, so every API method built on them (query,
+    get_single_object, create_object, update_object, delete_object, batch_operation,
+    change_data_capture, get_report, misc_operation, ...) returns an awaitable.
+
+    Instances are never shared through the global client. Several clients (one per realm)
+    can share one aiohttp.ClientSession by passing it in as http_session.
+    """
+    is_async = True
+
+    _http_session = None
+    _owns_http_session = True
+
+    def __new__(cls, **kwargs):
+        instance = object.__new__(cls)
+        instance._configure(**kwargs)
+
+        return instance
+
+    def _configure(self, **kwargs):
+        if 'http_session' in kwargs:
+            self._http_session = kwargs['http_session']
+            self._owns_http_session = False
+
+        super(AsyncQuickBooks, self)._configure(**kwargs)
+
+    def _start_session(self):
+        self._init_token_manager()
+        self.token_manager.get_access_token()
+
+        # aiohttp sessions are bound to the running event loop, the session is opened by the first
+        # request
+        self.session = None
+
+    def _get_http_session(self):
+        if self._http_session is None or self._http_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_connections * self.pool_maxsize,
+                limit_per_host=self.pool_maxsize,
+                force_close=not self.keep_alive,
+            )
+            self._http_session = aiohttp.ClientSession(connector=connector)
+            self._owns_http_session = True
+
+        return self._http_session
+
+    async def close(self):
+        if self._http_session is not None and self._owns_http_session:
+            await self._http_session.close()
+
+        self._http_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def make_request(self, request_type, url, request_body=None,
+                           content_type='application/json', params=None, file_path=None):
+        url, headers, params, request_body = self._prepare_request(
+            url, request_body, content_type, params, file_path)
+
+        req = await self._send(request_type, url, headers=headers, params=params, data=request_body)
+
+        return self._handle_response(req)
+
+    async def _send(self, request_type, url, **kwargs):
+        if self.retry_policy is None:
+            return await self._send_once(request_type, url, **kwargs)
+
+        params = self.retry_policy.prepare_params(request_type, kwargs.get('params'))
+        started = time.time()
+        attempt = 0
+
+        while True:
+            try:
+                req = await self._send_once(request_type, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                delay = self.retry_policy.next_delay(
+                    attempt, started, request_type, url, params, exception=e)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry_policy.next_delay(
+                    attempt, started, request_type, url, params, response=req)
+                if delay is None:
+                    return req
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send_once(self, request_type, url, **kwargs):
+        req = await self.process_request(request_type, url, **kwargs)
+
+        if req.status_code == httplib.UNAUTHORIZED and self.token_manager is not None:
+            # The access token expired or was revoked: refresh it and try once more
+            await self._run_blocking(
+                self.token_manager.refresh, self._sent_access_token(kwargs['headers']))
+            req = await self.process_request(request_type, url, **kwargs)
+
+        return req
+
+    @staticmethod
+    async def _run_blocking(function, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, function, *args)
+
+    async def process_request(self, request_type, url, headers="", params="", data=""):
+        if self.auth_client is None:
+            raise exceptions.QuickbooksException('No session manager')
+
+        access_token = self.auth_client.access_token
+        if self.token_manager is not None:
+            if self.token_manager.needs_refresh():
+                # Token refreshes use blocking HTTP calls
+                await self._run_blocking(self.token_manager.get_access_token)
+            access_token = self.token_manager.access_token
+
+        headers.update({'Authorization': 'Bearer ' + access_token})
+
+        # aiohttp only accepts strings as query string values
+        params = dict((key, str(value)) for key, value in (params or {}).items())
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+
+        try:
+            request = self._get_http_session().request(
+                request_type, url, headers=headers, params=params, data=data or None)
+
+            async with request as response:
+                content = await response.read()
+
+                return AsyncResponse(
+                    response.status, content, response.charset or "utf-8", response.headers)
+        finally:
+            if self.rate_limiter is not None:
+                self.rate_limiter.release()
+
+    async def get_single_object(self, qbbo, pk, use_cache=True):
+        """
+        Entities are always read from QBO: entity_cache backends and its SyncToken validation
+        are blocking. Saving, deleting or voiding still removes the entity from entity_cache, so
+        a cache shared with a QuickBooks client stays current.
+        """
+        return await self.get(self._single_object_url(qbbo, pk), {})
+
+    async def download_pdf(self, qbbo, item_id):
+        if self.auth_client is None:
+            raise exceptions.QuickbooksException('No session')
+
+        url, headers = self._prepare_pdf_request(qbbo, item_id)
+        response = await self._send("GET", url, headers=headers)
+
+        return self._handle_pdf_response(response)
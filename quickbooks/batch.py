@@ -1,26 +1,51 @@
+import time
 import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 from .client import QuickBooks
 from .exceptions import QuickbooksException
-from .objects.batchrequest import IntuitBatchRequest, BatchItemRequest, BatchOperation, BatchResponse, BatchItemResponse
+from .mixins import MAX_CONCURRENT_REQUESTS, _json_object_name
+from .query import QuerySet
+from .objects.batchrequest import IntuitBatchRequest, BatchItemRequest, BatchOperation, \
+    BatchResponse, BatchItemResponse, Fault
 
 
 class BatchManager(object):
-    def __init__(self, operation, max_request_items=30):
+    def __init__(self, operation, max_request_items=30, sparse=False, max_workers=1,
+                 retry_policy=None):
+        """
+        :param operation: create, update or delete
+        :param max_request_items: Maximum number of objects sent in one batch request
+        :param sparse: Send sparse updates with only the changed fields (see UpdateMixin.save)
+        :param max_workers: Number of batch requests sent concurrently by save (at most
+        MAX_CONCURRENT_REQUESTS)
+        :param retry_policy: BatchRetryPolicy deciding which faulted items are sent again.
+        Without one, every fault is returned.
+        """
         self._max_request_items = max_request_items
+        self._sparse = sparse
+        self._max_workers = max(1, min(max_workers, MAX_CONCURRENT_REQUESTS))
+        self._retry_policy = retry_policy
 
         if operation in ["create", "update", "delete"]:
             self._operation = operation
         else:
             raise QuickbooksException("Operation not supported.")
 
-    def save(self, obj_list, qb=None):
+    def save(self, obj_list, qb=None, callback=None):
+        """
+        Sends the objects in batch requests of max_request_items objects, up to max_workers
+        requests at a time.
+        :param callback: Function called with the BatchResponse of each batch request, as it arrives
+        :return: BatchResponse of all the requests, in the order of obj_list
+        """
         batch_response = BatchResponse()
 
-        while len(obj_list) > 0:
-            temp_list = obj_list[:self._max_request_items]
-            obj_list = [item for item in obj_list if item not in temp_list]
-            result = self.process_batch(temp_list, qb=qb)
+        for result in self.iter_save(obj_list, qb=qb):
+            if callback is not None:
+                callback(result)
 
             batch_response.batch_responses += result.batch_responses
             batch_response.original_list += result.original_list
@@ -29,37 +54,225 @@ class BatchManager(object):
 
         return batch_response
 
+    def iter_save(self, obj_list, qb=None):
+        """
+        Version of save yielding the BatchResponse of each batch request, in the order of
+        obj_list, without keeping the previous ones. obj_list can be any iterable, like a
+        generator reading the objects from a file; it is read as the requests are sent.
+        :return: Generator of BatchResponse
+        """
+        obj_iter = iter(obj_list)
+        chunks = iter(lambda: list(islice(obj_iter, self._max_request_items)), [])
+
+        if self._max_workers > 1:
+            results = self._process_batches(chunks, qb)
+        else:
+            results = (self.process_batch(chunk, qb=qb) for chunk in chunks)
+
+        if self._retry_policy is not None:
+            return (self._retry_faults(result, qb) for result in results)
+
+        return results
+
     def process_batch(self, obj_list, qb=None):
         if not qb:
             qb = QuickBooks()
 
         batch = self.list_to_batch_request(obj_list)
-        json_data = qb.batch_operation(batch.to_json())
+        json_data = self._send(batch.to_compact_json(), obj_list, qb)
         batch_response = self.batch_results_to_list(json_data, batch, obj_list)
 
         return batch_response
 
+    def _process_batches(self, chunks, qb):
+        """
+        Yields the BatchResponse of each chunk, in order, keeping up to max_workers requests in
+        flight. Requests are built and serialized while the previous ones are sent.
+        """
+        if not qb:
+            qb = QuickBooks()
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            def submit(obj_list):
+                batch = self.list_to_batch_request(obj_list)
+                future = executor.submit(self._send, batch.to_compact_json(), obj_list, qb)
+                return obj_list, batch, future
+
+            pending = deque(submit(chunk) for chunk in islice(chunks, self._max_workers))
+
+            try:
+                while pending:
+                    obj_list, batch, future = pending.popleft()
+                    json_data = future.result()
+
+                    for chunk in islice(chunks, 1):
+                        pending.append(submit(chunk))
+
+                    yield self.batch_results_to_list(json_data, batch, obj_list)
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
+
+    def _retry_faults(self, result, qb):
+        """
+        Sends the objects of result with retriable faults again, in new batch requests, until they
+        succeed, fail permanently or retry_policy.max_retries is reached. Stale objects get the
+        current SyncToken first, so their changes overwrite the changes made by someone else.
+        :return: BatchResponse of the objects of result, in the same order
+        """
+        # Latest response and new object of each object
+        outcomes = {}
+        not_found = set()
+        self._add_outcomes(outcomes, result)
+
+        for attempt in range(self._retry_policy.max_retries):
+            if not self._retry_round(attempt, result.original_list, outcomes, not_found, qb):
+                break
+
+        response = BatchResponse()
+        response.original_list = result.original_list
+
+        for obj in result.original_list:
+            if id(obj) not in outcomes:
+                # Left out of the response like batch_results_to_list does
+                continue
+
+            response_item, new_object = outcomes[id(obj)]
+            response.batch_responses.append(response_item)
+
+            if response_item.Fault:
+                response.faults.append(response_item.Fault)
+            else:
+                response.successes.append(new_object)
+
+        return response
+
+    def _retry_round(self, attempt, obj_list, outcomes, not_found, qb):
+        """
+        Waits for the backoff of the attempt if needed, refreshes the SyncToken of the stale
+        objects and sends the retriable objects again, updating outcomes.
+        :return: False when nothing was left to retry
+        """
+        stale, delayed = self._retriable_objects(obj_list, outcomes, not_found)
+
+        if delayed:
+            time.sleep(self._retry_policy.backoff(attempt))
+
+        if stale:
+            refreshed = self._refresh_sync_tokens(stale, qb)
+            not_found.update(id(obj) for obj in stale if id(obj) not in refreshed)
+
+        retry_list = [obj for obj in stale + delayed if id(obj) not in not_found]
+
+        for index in range(0, len(retry_list), self._max_request_items):
+            retry_result = self.process_batch(
+                retry_list[index:index + self._max_request_items], qb=qb)
+            self._add_outcomes(outcomes, retry_result)
+
+        return bool(retry_list)
+
+    def _retriable_objects(self, obj_list, outcomes, not_found):
+        """
+        :return: Lists of the objects of obj_list whose latest fault is stale, and of the ones
+        whose latest fault is retried after a delay
+        """
+        policy = self._retry_policy
+        stale = []
+        delayed = []
+
+        for obj in obj_list:
+            # Objects missing from the response have no outcome
+            response_item, _ = outcomes.get(id(obj), (None, None))
+            if response_item is None or not response_item.Fault or id(obj) in not_found:
+                continue
+
+            kind = policy.classify(response_item.Fault)
+            if not policy.is_retriable(kind, self._operation):
+                continue
+
+            if kind == policy.STALE:
+                stale.append(obj)
+            else:
+                delayed.append(obj)
+
+        return stale, delayed
+
+    @staticmethod
+    def _add_outcomes(outcomes, result):
+        # successes are in the order of the successful batch_responses
+        successes = iter(result.successes)
+
+        for response_item in result.batch_responses:
+            outcomes[id(response_item.get_object())] = (
+                response_item, None if response_item.Fault else next(successes))
+
+    @staticmethod
+    def _refresh_sync_tokens(obj_list, qb):
+        """
+        Reads the current SyncToken of the objects, with one query per class and 250 objects
+        :return: set of the id() of the objects refreshed, objects missing from QBO are left out
+        """
+        classes = OrderedDict()
+        for obj in obj_list:
+            classes.setdefault(type(obj), []).append(obj)
+
+        refreshed = set()
+        for cls, objects in classes.items():
+            current = cls.choose([str(obj.Id) for obj in objects], qb=qb, as_dict=True)
+
+            for obj in objects:
+                if str(obj.Id) in current:
+                    obj.SyncToken = current[str(obj.Id)].SyncToken
+                    refreshed.add(id(obj))
+
+        return refreshed
+
+    def _send(self, request_body, obj_list, qb):
+        try:
+            return qb.batch_operation(request_body)
+        finally:
+            if self._operation != BatchOperation.CREATE:
+                for obj in obj_list:
+                    qb.invalidate_cache(obj.qbo_object_name, obj.Id)
+
     def list_to_batch_request(self, obj_list):
         batch = IntuitBatchRequest()
 
         for obj in obj_list:
-            batch_item = BatchItemRequest()
-            batch_item.bId = str(uuid.uuid4())
-            batch_item.operation = self._operation
-            batch_item.set_object(obj)
-
-            batch.BatchItemRequest.append(batch_item)
+            batch.BatchItemRequest.append(self._batch_item(obj))
 
         return batch
 
+    def _batch_item(self, obj):
+        batch_item = BatchItemRequest()
+        batch_item.bId = str(uuid.uuid4())
+        batch_item.operation = self._operation
+        batch_item.set_object(obj)
+
+        if self._is_sparse(obj):
+            # get_object still returns obj
+            setattr(batch_item, obj.qbo_object_name, obj.sparse_update_data())
+        elif self._operation == BatchOperation.UPDATE and getattr(obj, '_partial', False):
+            raise QuickbooksException(
+                "Cannot update partial {0} objects without sparse=True".format(obj.qbo_object_name))
+
+        return batch_item
+
+    def _is_sparse(self, obj):
+        if self._operation != BatchOperation.UPDATE or not hasattr(obj, 'sparse_update_data'):
+            return False
+
+        return bool(self._sparse)
+
     def batch_results_to_list(self, json_data, batch, original_list):
         response = BatchResponse()
         response.original_list = original_list
+        batch_items = dict((batch_item.bId, batch_item) for batch_item in batch.BatchItemRequest)
 
         for data in json_data['BatchItemResponse']:
             response_item = BatchItemResponse.from_json(data)
 
-            batch_item = [obj for obj in batch.BatchItemRequest if obj.bId == response_item.bId][0]
+            batch_item = batch_items[response_item.bId]
             response_item.set_object(batch_item.get_object())
 
             response.batch_responses.append(response_item)
@@ -76,16 +289,205 @@ class BatchManager(object):
         return response
 
 
-def batch_create(obj_list, qb=None):
-    batch_mgr = BatchManager(BatchOperation.CREATE)
+class BatchResult(object):
+    """
+    Result of an item of a BatchBuilder, set once the batch is sent
+    """
+
+    def __init__(self, operation, original):
+        """
+        :param operation: create, update, delete or query
+        :param original: Object sent, or list of the select statements of a query
+        """
+        self.operation = operation
+        self.original = original
+        # New object (status Deleted for deletes), or list of the objects of a query
+        self.result = [] if operation == BatchOperation.QUERY else None
+        self.fault = None
+
+    @property
+    def failed(self):
+        return self.fault is not None
+
+    def __repr__(self):
+        return "<BatchResult {0} {1}>".format(self.operation, "failed" if self.failed else "ok")
+
+
+class BatchBuilder(object):
+    """
+    Batch of creates, updates, deletes and queries on any entities, sent in as few batch requests
+    as possible:
+
+        builder = BatchBuilder()
+        invoice = builder.create(new_invoice)
+        customer = builder.update(changed_customer)
+        items = builder.query(Item, "Active = true")
+        builder.send(qb=client)
+
+    Each method returns the BatchResult of its item, filled by send. Items are sent in the order
+    they are added, max_request_items per request; QBO processes the items of a request in order.
+    """
+
+    def __init__(self, max_request_items=30, sparse=False, max_workers=1):
+        """
+        :param max_request_items: Maximum number of items sent in one batch request
+        :param sparse: Default of update, see BatchManager
+        :param max_workers: Number of batch requests sent concurrently (at most
+        MAX_CONCURRENT_REQUESTS). Items depending on items of previous requests must be sent
+        with 1, the default.
+        """
+        self._max_request_items = max_request_items
+        self._sparse = sparse
+        self._max_workers = max(1, min(max_workers, MAX_CONCURRENT_REQUESTS))
+        # Tuples of the BatchItemRequest, its BatchResult and the class decoding its response
+        self._items = []
+        self._results = []
+
+    def __len__(self):
+        """
+        :return: Number of items, a query split in several statements counting for each
+        """
+        return len(self._items)
+
+    def create(self, obj):
+        return self._add_object(BatchManager(BatchOperation.CREATE), obj)
+
+    def update(self, obj, sparse=None):
+        """
+        :param sparse: Send a sparse update, defaults to the sparse option of the builder
+        """
+        if sparse is None:
+            sparse = self._sparse
+
+        batch_mgr = BatchManager(BatchOperation.UPDATE, sparse=sparse)
+        return self._add_object(batch_mgr, obj)
+
+    def delete(self, obj):
+        return self._add_object(BatchManager(BatchOperation.DELETE), obj)
+
+    def _add_object(self, batch_mgr, obj):
+        result = BatchResult(batch_mgr._operation, obj)
+        self._items.append((batch_mgr._batch_item(obj), result, type(obj)))
+        self._results.append(result)
+
+        return result
+
+    def query(self, query, where_clause="", order_by="", max_results="", fields=None):
+        """
+        :param query: Class of the entities, or a QuerySet (like
+        Item.objects.filter(Active=True)), whose statements are sent as separate items when an
+        IN list is split
+        :param where_clause: see ListMixin.where, when query is a class
+        :param order_by:
+        :param max_results: QBO returns 100 entities by default, at most 1000
+        :param fields: see ListMixin.where
+        :return: BatchResult whose result is the list of the entities found
+        """
+        if isinstance(query, QuerySet):
+            statements = query.statements()
+            result_class = query.cls._result_class(query._fields)
+        else:
+            statements = [query._build_select(where_clause, order_by, "", max_results, fields)]
+            result_class = query._result_class(fields)
+
+        result = BatchResult(BatchOperation.QUERY, statements)
+
+        for statement in statements:
+            batch_item = BatchItemRequest()
+            batch_item.bId = str(uuid.uuid4())
+            batch_item.operation = None
+            batch_item.Query = statement
+            self._items.append((batch_item, result, result_class))
+
+        self._results.append(result)
+
+        return result
+
+    def send(self, qb=None):
+        """
+        :return: List of the BatchResult of the items, in the order they were added
+        """
+        if not qb:
+            qb = QuickBooks()
+
+        chunks = [self._items[index:index + self._max_request_items]
+                  for index in range(0, len(self._items), self._max_request_items)]
+
+        if self._max_workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                responses = list(executor.map(lambda chunk: self._send(chunk, qb), chunks))
+        else:
+            responses = [self._send(chunk, qb) for chunk in chunks]
+
+        for chunk, json_data in zip(chunks, responses):
+            self._set_results(chunk, json_data)
+
+        return list(self._results)
+
+    @staticmethod
+    def _send(items, qb):
+        batch = IntuitBatchRequest()
+        batch.BatchItemRequest = [batch_item for batch_item, _, _ in items]
+
+        try:
+            return qb.batch_operation(batch.to_compact_json())
+        finally:
+            for batch_item, result, _ in items:
+                if result.operation in (BatchOperation.UPDATE, BatchOperation.DELETE):
+                    qb.invalidate_cache(result.original.qbo_object_name, result.original.Id)
+
+    @staticmethod
+    def _set_results(items, json_data):
+        responses = dict((data['bId'], data) for data in json_data['BatchItemResponse'])
+
+        # In the order of the items, so the results of a split query keep their order
+        for batch_item, result, result_class in items:
+            data = responses.get(batch_item.bId)
+            if data is None:
+                continue
+
+            if 'Fault' in data:
+                result.fault = Fault.from_json(data['Fault'])
+                result.fault.original_object = result.original
+            elif result.operation == BatchOperation.QUERY:
+                query_response = data.get('QueryResponse', {})
+                item_list = query_response.get(_json_object_name(result_class), [])
+                result.result += [result_class.from_json(item_json) for item_json in item_list]
+            else:
+                result.result = result_class.from_json(data[result_class.qbo_object_name])
+
+
+def batch_create(obj_list, qb=None, max_workers=1, retry_policy=None):
+    batch_mgr = BatchManager(
+        BatchOperation.CREATE, max_workers=max_workers, retry_policy=retry_policy)
     return batch_mgr.save(obj_list, qb=qb)
 
 
-def batch_update(obj_list, qb=None):
-    batch_mgr = BatchManager(BatchOperation.UPDATE)
+def batch_update(obj_list, qb=None, sparse=False, max_workers=1, retry_policy=None):
+    batch_mgr = BatchManager(BatchOperation.UPDATE, sparse=sparse, max_workers=max_workers,
+                             retry_policy=retry_policy)
     return batch_mgr.save(obj_list, qb=qb)
 
 
-def batch_delete(obj_list, qb=None):
-    batch_mgr = BatchManager(BatchOperation.DELETE)
-    return batch_mgr.save(obj_list, qb=qb)
\ No newline at end of file
+def batch_delete(obj_list, qb=None, max_workers=1, retry_policy=None):
+    batch_mgr = BatchManager(
+        BatchOperation.DELETE, max_workers=max_workers, retry_policy=retry_policy)
+    return batch_mgr.save(obj_list, qb=qb)
+
+
+def batch_create_iter(obj_list, qb=None, max_workers=1, retry_policy=None):
+    batch_mgr = BatchManager(
+        BatchOperation.CREATE, max_workers=max_workers, retry_policy=retry_policy)
+    return batch_mgr.iter_save(obj_list, qb=qb)
+
+
+def batch_update_iter(obj_list, qb=None, sparse=False, max_workers=1, retry_policy=None):
+    batch_mgr = BatchManager(BatchOperation.UPDATE, sparse=sparse, max_workers=max_workers,
+                             retry_policy=retry_policy)
+    return batch_mgr.iter_save(obj_list, qb=qb)
+
+
+def batch_delete_iter(obj_list, qb=None, max_workers=1, retry_policy=None):
+    batch_mgr = BatchManager(
+        BatchOperation.DELETE, max_workers=max_workers, retry_policy=retry_policy)
+    return batch_mgr.iter_save(obj_list, qb=qb)
\ No newline at end of file
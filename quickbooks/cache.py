@@ -0,0 +1,228 @@
+import threading
+import time
+from collections import OrderedDict
+
+from . import codec
+from .utils import escape_string
+
+# Reference data rarely changes and can be kept for a day
+REFERENCE_TTL = 24 * 60 * 60
+REFERENCE_ENTITIES = (
+    "Term", "Department", "TaxCode", "TaxRate", "TaxAgency", "PaymentMethod", "Class",
+    "CompanyCurrency",
+)
+
+
+class CacheBackend(object):
+    """
+    Stores the json documents cached by EntityCache. Subclasses implement get, set, delete and
+    clear.
+    """
+
+    def get(self, key):
+        """
+        :param key:
+        :return: str stored for key, or None when missing or expired
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """
+        :param key:
+        :param value: str
+        :param ttl: Seconds the value is kept
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """
+    Least recently used cache of the current process, keeping at most max_entries values.
+    Thread-safe.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache shared by processes through Redis, or any client implementing the get, set, delete
+    and scan_iter methods of redis-py (e.g. fakeredis as a local stand-in).
+    """
+
+    def __init__(self, client, prefix="quickbooks:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+
+        return value
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+class EntityCache(object):
+    """
+    Read-through cache of the entities read by QuickBooks.get_single_object (and so
+    ReadMixin.get), keyed by realm, entity and Id. Entities are kept for ttl seconds, reference
+    data (REFERENCE_ENTITIES: Term, Department, TaxCode, ...) for REFERENCE_TTL, and ttls
+    overrides the time of any entity; a ttl of 0 disables caching of that entity.
+
+    save, delete and void remove the entity from the cache. With validate_sync_token, cached
+    entities are only used after checking with a query selecting their SyncToken that they
+    haven't been changed by someone else, which still costs a (small) request.
+    """
+
+    def __init__(self, backend=None, ttl=300, ttls=None, validate_sync_token=False):
+        """
+        :param backend: CacheBackend, a MemoryCache by default
+        :param ttl: Seconds entities are kept
+        :param ttls: dict of seconds entities are kept by entity name, like {"Customer": 3600}
+        :param validate_sync_token: Check the SyncToken of cached entities before using them
+        """
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttl = ttl
+        self.ttls = dict((name, REFERENCE_TTL) for name in REFERENCE_ENTITIES)
+        self.ttls.update(ttls or {})
+        self.validate_sync_token = validate_sync_token
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+
+    @staticmethod
+    def key(company_id, qbbo, pk):
+        return "{0}:{1}:{2}".format(company_id, qbbo, pk)
+
+    def ttl_for(self, qbbo):
+        """
+        :return: Seconds entities named qbbo are kept
+        """
+        return self.ttls.get(qbbo, self.ttl)
+
+    def get(self, qb, qbbo, pk):
+        """
+        :param qb: QuickBooks client, used for its company_id and to validate SyncTokens
+        :param qbbo: Entity name
+        :param pk: Id
+        :return: Cached response of get_single_object, or None
+        """
+        key = self.key(qb.company_id, qbbo, pk)
+        value = self.backend.get(key) if self.ttl_for(qbbo) else None
+
+        if value is None:
+            self._count('_misses')
+            return None
+
+        json_data = codec.loads(value)
+
+        if self.validate_sync_token and not self._is_current(qb, qbbo, pk, json_data):
+            self.backend.delete(key)
+            self._count('_stale')
+            return None
+
+        self._count('_hits')
+        return json_data
+
+    def set(self, qb, qbbo, pk, json_data):
+        """
+        :param json_data: Response of get_single_object
+        """
+        ttl = self.ttl_for(qbbo)
+
+        if ttl:
+            self.backend.set(self.key(qb.company_id, qbbo, pk), codec.dumps(json_data), ttl)
+
+    def invalidate(self, qb, qbbo, pk):
+        self.backend.delete(self.key(qb.company_id, qbbo, pk))
+
+    def clear(self):
+        self.backend.clear()
+
+    def _is_current(self, qb, qbbo, pk, json_data):
+        entity = _entity_json(json_data)
+        select = "SELECT Id, SyncToken FROM {0} WHERE Id = '{1}'".format(
+            qbbo, escape_string(str(pk)))
+
+        for current in qb.query(select).get("QueryResponse", {}).get(qbbo, []):
+            return current.get("SyncToken") == entity.get("SyncToken")
+
+        return False
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """
+        :return: dict with hits, misses and stale (cached entities found changed by
+        validate_sync_token)
+        """
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "stale": self._stale}
+
+
+def _entity_json(json_data):
+    """
+    :return: json of the entity in a get_single_object response, like json_data["Customer"]
+    """
+    for value in json_data.values():
+        if isinstance(value, dict) and "Id" in value:
+            return value
+
+    return {}
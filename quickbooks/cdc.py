@@ -1,27 +1,59 @@
-from datetime import datetime
+import threading
+import warnings
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from dateutil.parser import isoparse
+
 from .client import QuickBooks
 from .objects.changedatacapture import QueryResponse, CDCResponse
 from .helpers import qb_datetime_format
+from .mixins import MAX_CONCURRENT_REQUESTS
+
+# QBO returns at most 1000 changed entities per entity type
+CDC_MAX_RESULTS = 1000
+
+# Change of an entity, object is the decoded entity (only Id, status and MetaData for deletes)
+ChangeEvent = namedtuple('ChangeEvent', ['entity_type', 'operation', 'object'])
+
+
+class TruncatedChangesWarning(UserWarning):
+    """
+    Deletes may be missing from changes completed with queries (see fetch_changes)
+    """
 
 
-def change_data_capture(qbo_class_list, timestamp, qb=None):
+class ChangeOperation(object):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+def change_data_capture(qbo_class_list, timestamp, qb=None, max_workers=4):
+    """
+    :param qbo_class_list: Classes of the entities
+    :param timestamp: Changes made since this time are returned
+    :param qb:
+    :param max_workers: Number of concurrent queries used to complete truncated responses (see
+    fetch_changes)
+    :return: CDCResponse with a list of the changed objects for each class. Its truncated
+    attribute lists the entity names whose deletes may be missing, a TruncatedChangesWarning
+    is issued for them.
+    """
     if qb is None:
         qb = QuickBooks()
 
     cdc_class_dict = dict((cls.qbo_object_name, cls) for cls in qbo_class_list)
 
     cdc_class_names = list(cdc_class_dict.keys())
-    entity_list_string = ','.join(cdc_class_names)
 
-    if isinstance(timestamp, datetime):
-        timestamp_string = qb_datetime_format(timestamp)
-    else:
-        timestamp_string = timestamp
-
-    resp = qb.change_data_capture(entity_list_string, timestamp_string)
+    resp, truncated = _cdc_request(qbo_class_list, timestamp, qb, max_workers)
+    _warn_truncated(truncated)
 
     cdc_response_dict = resp.pop('CDCResponse')
     cdc_response = CDCResponse.from_json(resp)
+    cdc_response.truncated = truncated
 
     query_response_list = cdc_response_dict[0]['QueryResponse']
     for query_response_dict in query_response_list:
@@ -38,3 +70,281 @@ def change_data_capture(qbo_class_list, timestamp, qb=None):
             setattr(cdc_response, qb_object_name, query_response)
 
     return cdc_response
+
+
+def fetch_changes(qbo_class_list, timestamp, qb=None, max_workers=4):
+    """
+    Version of change_data_capture returning the json of the changed entities, for consumers
+    storing them as they are.
+
+    QBO returns at most 1000 changes per entity type. When that many are returned, the changes
+    are read again with queries on MetaData.LastUpdatedTime, from timestamp to the time of the
+    response: the time window is split in halves until each part holds at most 1000 entities,
+    and the parts are queried concurrently. Results are merged by Id, keeping the latest version.
+    Queries don't return deleted entities, so deletes beyond the first 1000 changes are missed:
+    the names of these entities are returned, for consumers to reconcile them.
+
+    :param qbo_class_list: Classes of the entities
+    :param timestamp: Changes made since this time are returned
+    :param qb:
+    :param max_workers: Number of concurrent queries used to complete truncated responses
+    :return: Tuple of the time of the response, as sent by QBO, a dict of the lists of the json
+    of the changed entities by entity name (deleted entities have the status Deleted), and the
+    list of the entity names whose changes were completed with queries, missing later deletes.
+    """
+    if qb is None:
+        qb = QuickBooks()
+
+    cdc_class_names = [cls.qbo_object_name for cls in qbo_class_list]
+    resp, truncated = _cdc_request(qbo_class_list, timestamp, qb, max_workers)
+
+    changes = dict((name, []) for name in cdc_class_names)
+    for query_response_dict in resp['CDCResponse'][0]['QueryResponse']:
+        for name in cdc_class_names:
+            changes[name].extend(query_response_dict.get(name, []))
+
+    return resp.get('time'), changes, truncated
+
+
+def iter_changes(qbo_class_list, timestamp, qb=None, max_workers=4):
+    """
+    Generator version of change_data_capture, yielding a ChangeEvent for each change, in the
+    order of MetaData.LastUpdatedTime. Objects are decoded as they are yielded, so consumers can
+    write each change before the next one is decoded.
+
+    Entities with the status Deleted are DELETE events. Entities with SyncToken 0 are CREATE
+    events, other entities UPDATE events (including entities both created and updated since
+    timestamp).
+
+    :param qbo_class_list: Classes of the entities
+    :param timestamp: Changes made since this time are returned
+    :param qb:
+    :param max_workers: see fetch_changes
+    :return: Generator of ChangeEvent. A TruncatedChangesWarning is issued for entities whose
+    deletes may be missing (see fetch_changes).
+    """
+    _, changes, truncated = fetch_changes(qbo_class_list, timestamp, qb=qb, max_workers=max_workers)
+    _warn_truncated(truncated)
+
+    return _iter_events(qbo_class_list, changes)
+
+
+def _iter_events(qbo_class_list, changes):
+    cdc_class_dict = dict((cls.qbo_object_name, cls) for cls in qbo_class_list)
+    items = [(name, item_json) for name, item_list in changes.items() for item_json in item_list]
+    items.sort(key=lambda item: _last_updated(item[1]))
+
+    for name, item_json in items:
+        yield ChangeEvent(name, _operation(item_json), cdc_class_dict[name].from_json(item_json))
+
+
+def _warn_truncated(truncated):
+    if truncated:
+        message = "More than {0} changes of {1}, deletes after the first {0} changes are missing"
+        warnings.warn(message.format(CDC_MAX_RESULTS, ", ".join(truncated)),
+                      TruncatedChangesWarning, stacklevel=3)
+
+
+def _operation(item_json):
+    if item_json.get('status') == 'Deleted':
+        return ChangeOperation.DELETE
+
+    if str(item_json.get('SyncToken')) == '0':
+        return ChangeOperation.CREATE
+
+    return ChangeOperation.UPDATE
+
+
+class ChangeFeed(object):
+    """
+    Near real-time feed of the changes of some entity types, polling change data capture. Each
+    poll returns the changes made since the time of the previous response (as sent by QBO), so
+    no change is missed between polls; a change can be returned again by the next poll when it
+    was made at the time of the response, consumers should ignore versions they already have.
+
+    truncated lists the entity names whose deletes may be missing from the last poll (see
+    fetch_changes), a TruncatedChangesWarning is issued for them.
+    """
+
+    def __init__(self, qbo_class_list, since, qb=None, interval=60, max_workers=4):
+        """
+        :param qbo_class_list: Classes of the entities
+        :param since: Time of the first changes returned, str or datetime
+        :param qb:
+        :param interval: Seconds between polls of start
+        :param max_workers: see fetch_changes
+        """
+        self.qbo_class_list = list(qbo_class_list)
+        self.since = since
+        self.qb = qb
+        self.interval = interval
+        self.max_workers = max_workers
+        self.truncated = []
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """
+        Requests the changes made since the previous poll. since is moved to the time of the
+        response once every event has been consumed, so changes are requested again by the next
+        poll when the consumer stops on an error.
+        :return: Generator of ChangeEvent
+        """
+        qb = self.qb if self.qb is not None else QuickBooks()
+        response_time, changes, self.truncated = fetch_changes(
+            self.qbo_class_list, self.since, qb=qb, max_workers=self.max_workers)
+        _warn_truncated(self.truncated)
+
+        for event in _iter_events(self.qbo_class_list, changes):
+            yield event
+
+        if response_time:
+            self.since = response_time
+
+    def start(self, callback, on_error=None):
+        """
+        Starts a daemon thread polling every interval seconds and calling callback with each event.
+        :param callback: Function called with each ChangeEvent
+        :param on_error: Function called with the exception when a poll or callback fails, the
+        changes are then requested again by the next poll
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(callback, on_error), name="quickbooks-change-feed")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, callback, on_error):
+        while not self._stop_event.is_set():
+            try:
+                for event in self.poll():
+                    callback(event)
+            except Exception as e:
+                if on_error is not None:
+                    on_error(e)
+
+            self._stop_event.wait(self.interval)
+
+
+def _cdc_request(qbo_class_list, timestamp, qb, max_workers):
+    """
+    :return: Response of the CDC request, with the truncated lists of changes completed, and the
+    list of the names of these entities
+    """
+    cdc_class_dict = dict((cls.qbo_object_name, cls) for cls in qbo_class_list)
+    resp = qb.change_data_capture(','.join(cdc_class_dict), _format_timestamp(timestamp))
+    truncated = []
+
+    for query_response_dict in resp['CDCResponse'][0]['QueryResponse']:
+        for name, cls in cdc_class_dict.items():
+            item_list = query_response_dict.get(name)
+
+            if item_list and len(item_list) >= CDC_MAX_RESULTS:
+                until = _parse_timestamp(resp.get('time')) or datetime.now(timezone.utc)
+                queried = _query_changes(cls, _parse_timestamp(timestamp), until, qb, max_workers)
+                query_response_dict[name] = merge_changes(item_list, queried)
+                truncated.append(name)
+
+    return resp, truncated
+
+
+def merge_changes(*item_lists):
+    """
+    :param item_lists: Lists of the json of changed entities
+    :return: List of the json of the changed entities, with the latest version (by
+    MetaData.LastUpdatedTime) of each Id, in the order the Ids are first found
+    """
+    merged = OrderedDict()
+
+    for item_list in item_lists:
+        for item_json in item_list:
+            entity_id = str(item_json.get('Id'))
+            current = merged.get(entity_id)
+
+            if current is None or _last_updated(item_json) >= _last_updated(current):
+                merged[entity_id] = item_json
+
+    return list(merged.values())
+
+
+def _last_updated(item_json):
+    last_updated = _parse_timestamp((item_json.get('MetaData') or {}).get('LastUpdatedTime'))
+
+    return last_updated or datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _query_changes(cls, since, until, qb, max_workers):
+    """
+    :return: List of the json of the entities of cls last updated between since and until
+    """
+    windows = [(since, until)]
+    complete_windows = []
+    workers = max(1, min(max_workers, MAX_CONCURRENT_REQUESTS))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while windows:
+            counts = list(executor.map(
+                lambda window: cls.count(_window_clause(*window), qb=qb) or 0, windows))
+            split_windows = []
+
+            for (start, end), count in zip(windows, counts):
+                seconds = int((end - start).total_seconds())
+
+                if count <= CDC_MAX_RESULTS or seconds <= 1:
+                    if count:
+                        complete_windows.append((start, end))
+                else:
+                    # Whole seconds, QBO times have no fractions
+                    middle = start + timedelta(seconds=seconds // 2)
+                    split_windows += [(start, middle), (middle, end)]
+
+            windows = split_windows
+
+        pages = executor.map(
+            lambda window: list(
+                cls._iter_pages(_window_clause(*window), "", CDC_MAX_RESULTS, 0, qb)),
+            complete_windows)
+
+        return [item_json for page in pages for item_json in page]
+
+
+def _window_clause(start, end):
+    return "MetaData.LastUpdatedTime >= '{0}' AND MetaData.LastUpdatedTime < '{1}'".format(
+        _format_timestamp(start), _format_timestamp(end))
+
+
+def _format_timestamp(timestamp):
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is not None:
+            return timestamp.isoformat()
+
+        return qb_datetime_format(timestamp)
+
+    return timestamp
+
+
+def _parse_timestamp(timestamp):
+    """
+    :return: Aware datetime, times without offset are taken as UTC
+    """
+    if not timestamp:
+        return None
+
+    if not isinstance(timestamp, datetime):
+        timestamp = isoparse(timestamp)
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+    return timestamp.replace(microsecond=0)
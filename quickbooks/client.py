@@ -10,9 +10,13 @@ except ImportError:  # Python 2
 
 import textwrap
 import codecs
-import json
+import time
 
-from . import exceptions
+import requests
+
+from . import codec, exceptions
+from .transport import PooledHTTPAdapter
+from .tokens import TokenManager
 import base64
 import hashlib
 import hmac
@@ -37,6 +41,19 @@ class QuickBooks(object):
     sandbox = False
     minorversion = None
     verifier_token = None
+    refresh_token = None
+    token_store = None
+    token_manager = None
+    retry_policy = None
+    rate_limiter = None
+    entity_cache = None
+
+    pool_connections = 10
+    pool_maxsize = 10
+    pool_block = False
+    keep_alive = True
+    transport_adapter = None
+    is_async = False
 
     sandbox_api_url_v3 = "https://sandbox-quickbooks.api.intuit.com/v3"
     api_url_v3 = "https://quickbooks.api.intuit.com/v3"
@@ -55,6 +72,13 @@ class QuickBooks(object):
     __instance = None
     __use_global = False
 
+    # Arguments stored as they are by _configure
+    _options = (
+        'refresh_token', 'pool_connections', 'pool_maxsize', 'pool_block', 'keep_alive',
+        'token_store', 'token_manager', 'company_id', 'minorversion', 'verifier_token',
+        'retry_policy', 'rate_limiter', 'entity_cache',
+    )
+
     def __new__(cls, **kwargs):
         """
         If global is disabled, don't set global client instance.
@@ -66,40 +90,64 @@ class QuickBooks(object):
         else:
             instance = object.__new__(cls)
 
-        if 'refresh_token' in kwargs:
-            instance.refresh_token = kwargs['refresh_token']
-
-        if 'auth_client' in kwargs:
-            instance.auth_client = kwargs['auth_client']
-
-            if instance.auth_client.environment == Environments.SANDBOX:
-                instance.sandbox = True
-            else:
-                instance.sandbox = False
+        instance._configure(**kwargs)
 
-            instance._start_session()
+        return instance
 
-        if 'company_id' in kwargs:
-            instance.company_id = kwargs['company_id']
+    def _configure(self, **kwargs):
+        # Set before the session is started, which uses the pool options and stores tokens by
+        # company_id
+        for option in self._options:
+            if option in kwargs:
+                setattr(self, option, kwargs[option])
 
-        if 'minorversion' in kwargs:
-            instance.minorversion = kwargs['minorversion']
+        if 'auth_client' in kwargs:
+            self.auth_client = kwargs['auth_client']
 
-        if 'verifier_token' in kwargs:
-            instance.verifier_token = kwargs.get('verifier_token')
+            if self.auth_client.environment == Environments.SANDBOX:
+                self.sandbox = True
+            else:
+                self.sandbox = False
 
-        return instance
+            self._start_session()
 
     def _start_session(self):
-        if self.auth_client.access_token is None:
-            self.auth_client.refresh(refresh_token=self.refresh_token)
+        self._init_token_manager()
 
         self.session = OAuth2Session(
             client_id=self.auth_client.client_id,
             client_secret=self.auth_client.client_secret,
-            access_token=self.auth_client.access_token,
+            access_token=self.token_manager.get_access_token(),
         )
 
+        # Reuse the adapter when the session is rebuilt so open connections are kept
+        if self.transport_adapter is None:
+            self.transport_adapter = PooledHTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                pool_block=self.pool_block,
+                keep_alive=self.keep_alive,
+            )
+
+        self.session.mount('https://', self.transport_adapter)
+
+    def _init_token_manager(self):
+        if self.token_manager is None:
+            # Keyed by realm, apps serving several realms share the store
+            self.token_manager = TokenManager(
+                self.auth_client, refresh_token=self.refresh_token, store=self.token_store,
+                key=str(self.company_id) if self.company_id else None)
+
+    def pool_stats(self):
+        """
+        Connection pool statistics for the transport shared by all requests of this client.
+        :return: dict with requests, connections, hits and misses
+        """
+        if self.transport_adapter is None:
+            return {"requests": 0, "connections": 0, "hits": 0, "misses": 0}
+
+        return self.transport_adapter.stats()
+
     @classmethod
     def get_instance(cls):
         return cls.__instance
@@ -163,6 +211,54 @@ class QuickBooks(object):
 
     def make_request(self, request_type, url, request_body=None, content_type='application/json',
                      params=None, file_path=None):
+        url, headers, params, request_body = self._prepare_request(
+            url, request_body, content_type, params, file_path)
+
+        req = self._send(request_type, url, headers=headers, params=params, data=request_body)
+
+        return self._handle_response(req)
+
+    def _send(self, request_type, url, **kwargs):
+        if self.retry_policy is None:
+            return self._send_once(request_type, url, **kwargs)
+
+        params = self.retry_policy.prepare_params(request_type, kwargs.get('params'))
+        started = time.time()
+        attempt = 0
+
+        while True:
+            try:
+                req = self._send_once(request_type, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = self.retry_policy.next_delay(
+                    attempt, started, request_type, url, params, exception=e)
+                if delay is None:
+                    raise
+            else:
+                delay = self.retry_policy.next_delay(
+                    attempt, started, request_type, url, params, response=req)
+                if delay is None:
+                    return req
+
+            time.sleep(delay)
+            attempt += 1
+
+    def _send_once(self, request_type, url, **kwargs):
+        req = self.process_request(request_type, url, **kwargs)
+
+        if req.status_code == httplib.UNAUTHORIZED and self.token_manager is not None:
+            # The access token expired or was revoked: refresh it and try once more
+            self.token_manager.refresh(
+                stale_access_token=self._sent_access_token(kwargs['headers']))
+            req = self.process_request(request_type, url, **kwargs)
+
+        return req
+
+    @staticmethod
+    def _sent_access_token(headers):
+        return headers.get('Authorization', '')[len('Bearer '):] or None
+
+    def _prepare_request(self, url, request_body, content_type, params, file_path):
         if not params:
             params = {}
 
@@ -179,7 +275,9 @@ class QuickBooks(object):
         }
 
         if file_path:
-            attachment = open(file_path, 'rb')
+            with open(file_path, 'rb') as attachment:
+                binary_data = str(base64.b64encode(attachment.read()).decode('ascii'))
+
             url = url.replace('attachable', 'upload')
             boundary = '-------------PythonMultipartPost'
             headers.update({
@@ -187,12 +285,9 @@ class QuickBooks(object):
                 'Accept-Encoding': 'gzip;q=1.0,deflate;q=0.6,identity;q=0.3',
                 'User-Agent': 'python-quickbooks V3 library',
                 'Accept': 'application/json',
-                'Connection': 'close'
             })
 
-            binary_data = str(base64.b64encode(attachment.read()).decode('ascii'))
-
-            content_type = json.loads(request_body)['ContentType']
+            content_type = codec.loads(request_body)['ContentType']
 
             request_body = textwrap.dedent(
                 """
@@ -216,13 +311,14 @@ class QuickBooks(object):
             # make sure request_body is not unicode (python 2 case)
             request_body = str(request_body)
 
-        req = self.process_request(request_type, url, headers=headers, params=params, data=request_body)
+        return url, headers, params, request_body
 
+    def _handle_response(self, req):
         if req.status_code == httplib.UNAUTHORIZED:
             raise exceptions.AuthorizationException("Application authentication failed", detail=req.text)
 
         try:
-            result = req.json()
+            result = codec.loads(req.content)
         except:
             raise exceptions.QuickbooksException("Error reading json response: {0}".format(req.text), 10000)
 
@@ -244,17 +340,50 @@ class QuickBooks(object):
         if self.session is None:
             raise exceptions.QuickbooksException('No session manager')
 
+        if self.token_manager is not None:
+            self.session.access_token = self.token_manager.get_access_token()
+
         headers.update({'Authorization': 'Bearer ' + self.session.access_token})
 
-        return self.session.request(
-            request_type, url, headers=headers, params=params, data=data)
+        if self.rate_limiter is None:
+            return self.session.request(
+                request_type, url, headers=headers, params=params, data=data)
 
-    def get_single_object(self, qbbo, pk):
-        url = "{0}/company/{1}/{2}/{3}/".format(self.api_url, self.company_id, qbbo.lower(), pk)
-        result = self.get(url, {})
+        with self.rate_limiter:
+            return self.session.request(
+                request_type, url, headers=headers, params=params, data=data)
+
+    def get_single_object(self, qbbo, pk, use_cache=True):
+        """
+        :param qbbo: Entity name
+        :param pk: Id
+        :param use_cache: Read through entity_cache, if the client has one
+        :return: Response with the entity
+        """
+        cache = self.entity_cache if use_cache else None
+
+        if cache is not None:
+            result = cache.get(self, qbbo, pk)
+            if result is not None:
+                return result
+
+        result = self.get(self._single_object_url(qbbo, pk), {})
+
+        if cache is not None:
+            cache.set(self, qbbo, pk, result)
 
         return result
 
+    def _single_object_url(self, qbbo, pk):
+        return "{0}/company/{1}/{2}/{3}/".format(self.api_url, self.company_id, qbbo.lower(), pk)
+
+    def invalidate_cache(self, qbbo, pk):
+        """
+        Removes an entity from entity_cache, called when it is saved, deleted or voided
+        """
+        if self.entity_cache is not None and pk:
+            self.entity_cache.invalidate(self, qbbo, pk)
+
     def handle_exceptions(self, results):
         # Needs to handle multiple errors
         for error in results["Error"]:
@@ -332,6 +461,12 @@ class QuickBooks(object):
         if self.session is None:
             raise exceptions.QuickbooksException('No session')
 
+        url, headers = self._prepare_pdf_request(qbbo, item_id)
+        response = self._send("GET", url, headers=headers)
+
+        return self._handle_pdf_response(response)
+
+    def _prepare_pdf_request(self, qbbo, item_id):
         url = "{0}/company/{1}/{2}/{3}/pdf".format(
             self.api_url, self.company_id, qbbo.lower(), item_id)
 
@@ -341,8 +476,9 @@ class QuickBooks(object):
             'User-Agent': 'python-quickbooks V3 library'
         }
 
-        response = self.process_request("GET", url, headers=headers)
+        return url, headers
 
+    def _handle_pdf_response(self, response):
         if response.status_code != httplib.OK:
 
             if response.status_code == httplib.UNAUTHORIZED:
@@ -350,7 +486,7 @@ class QuickBooks(object):
                 raise exceptions.AuthorizationException("Application authentication failed", detail=response.text)
 
             try:
-                result = response.json()
+                result = codec.loads(response.content)
             except:
                 raise exceptions.QuickbooksException("Error reading json response: {0}".format(response.text), 10000)
 
@@ -0,0 +1,162 @@
+"""
+JSON encoding and decoding shared by the client, the objects, batch and CDC requests.
+
+Responses are decoded with the fastest installed backend: orjson, ujson, simplejson or the
+standard library json module. They all build the same python objects, and documents a
+backend rejects (like NaN values for orjson) are decoded again by the standard library.
+orjson may decode integers over 64 bits as floats, QBO sends none.
+
+Request bodies are encoded with the standard library json module or simplejson, which
+produce the same output. orjson and ujson format floats and non ASCII characters
+differently, so they are only used for decoding. The standard library encoder is only
+accelerated in C for compact output, so indented output (to_json) prefers simplejson.
+"""
+import inspect
+import json
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+from .exceptions import QuickbooksException
+
+DECODERS = {'json': json.loads}
+ENCODERS = {'json': json}
+
+if simplejson is not None:
+    DECODERS['simplejson'] = simplejson.loads
+    ENCODERS['simplejson'] = simplejson
+
+if ujson is not None:
+    DECODERS['ujson'] = ujson.loads
+
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+
+# Fastest first
+DECODER_PREFERENCE = ('orjson', 'ujson', 'simplejson', 'json')
+ENCODER_PREFERENCE = ('json', 'simplejson')
+INDENT_ENCODER_PREFERENCE = ('simplejson', 'json')
+
+COMPACT_SEPARATORS = (',', ':')
+
+_decoder_name = None
+_decode = None
+_encoder_name = None
+_indent_encoder_name = None
+_encoders = {}
+
+
+def set_backend(decoder=None, encoder=None):
+    """
+    Selects the JSON backends. Backends not given are selected automatically.
+    :param decoder: One of orjson, ujson, simplejson or json
+    :param encoder: One of json or simplejson, used for indented output too
+    """
+    global _decoder_name, _decode, _encoder_name, _indent_encoder_name
+
+    if decoder is None:
+        decoder = next(name for name in DECODER_PREFERENCE if name in DECODERS)
+    elif decoder not in DECODERS:
+        raise QuickbooksException(
+            "JSON decoder '{0}' is not installed or not supported".format(decoder))
+
+    if encoder is None:
+        encoder = next(name for name in ENCODER_PREFERENCE if name in ENCODERS)
+        indent_encoder = next(name for name in INDENT_ENCODER_PREFERENCE if name in ENCODERS)
+    elif encoder not in ENCODERS:
+        raise QuickbooksException(
+            "JSON encoder '{0}' is not installed or not supported".format(encoder))
+    else:
+        indent_encoder = encoder
+
+    _decoder_name = decoder
+    _decode = DECODERS[decoder]
+    _encoder_name = encoder
+    _indent_encoder_name = indent_encoder
+    _encoders.clear()
+
+
+def get_backend():
+    """
+    :return: Names of the decoder and encoder in use
+    """
+    return _decoder_name, _encoder_name
+
+
+def loads(data):
+    """
+    :param data: JSON document as bytes or str
+    :return: Decoded document
+    """
+    try:
+        return _decode(data)
+    except ValueError:
+        if _decode is json.loads:
+            raise
+
+    return json.loads(data)
+
+
+def _encoder(module, default, sort_keys, indent):
+    key = (module.__name__, default, sort_keys, indent)
+    encoder = _encoders.get(key)
+
+    if encoder is None:
+        separators = COMPACT_SEPARATORS if indent is None else (',', ': ')
+        encoder = module.JSONEncoder(
+            default=default, sort_keys=sort_keys, indent=indent, separators=separators)
+
+        if _is_module_level(default) and len(_encoders) < 32:
+            _encoders[key] = encoder
+
+    return encoder
+
+
+def _is_module_level(default):
+    """
+    Only encoders of module level default functions are cached: lambdas, closures and bound
+    methods are often created for each call and would fill the cache.
+    """
+    if default is None:
+        return True
+
+    qualname = getattr(default, '__qualname__', '<')
+
+    return inspect.isfunction(default) and '<' not in qualname and '.' not in qualname
+
+
+def dumps(obj, default=None, sort_keys=False, indent=None):
+    """
+    :param obj: Object to encode
+    :param default: Function returning a serializable version of objects the encoder doesn't support
+    :param sort_keys: Sort keys of objects
+    :param indent: Pretty print with this indentation. Output is compact, without whitespace, by
+    default.
+    :return: JSON document as str
+    """
+    module = ENCODERS[_encoder_name if indent is None else _indent_encoder_name]
+
+    try:
+        return _encoder(module, default, sort_keys, indent).encode(obj)
+    except (TypeError, AttributeError):
+        # Values the standard library rejects, like Decimal, are supported by simplejson. default
+        # functions reading __dict__, like ToJsonMixin.json_filter, raise AttributeError for them.
+        if simplejson is None or module is simplejson:
+            raise
+
+    return _encoder(simplejson, default, sort_keys, indent).encode(obj)
+
+
+set_backend()
@@ -1,25 +1,55 @@
 from future.moves.urllib.parse import quote
 
-try: import simplejson as json
-except ImportError: import json
-
+import keyword
 import six
-from .utils import build_where_clause, build_choose_clause
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+from . import codec
+from .utils import build_where_clause, build_choose_clause, build_select_fields, check_field_name
 from .client import QuickBooks
+from .query import QueryManager, MAX_IN_VALUES, MAX_PAGE_SIZE
 from .exceptions import QuickbooksException
 
 
 class ToJsonMixin(object):
     def to_json(self):
-        return json.dumps(self, default=self.json_filter(), sort_keys=True, indent=4)
+        return codec.dumps(self, default=json_filter, sort_keys=True, indent=4)
+
+    def to_compact_json(self, sort_keys=False):
+        """
+        Serializes the object for request bodies: no indentation or whitespace, and keys are
+        only sorted when sort_keys is set.
+        """
+        return codec.dumps(self, default=json_default, sort_keys=bool(sort_keys))
 
     def json_filter(self):
         """
         filter out properties that have names starting with _
         or properties that have a value of None
         """
-        return lambda obj: dict((k, v) for k, v in obj.__dict__.items()
-                                if not k.startswith('_') and getattr(obj, k) is not None)
+        return json_filter
+
+
+def json_filter(obj):
+    """
+    Default function of ToJsonMixin.to_json, a module level function so its encoder is cached
+    """
+    return dict((k, v) for k, v in object_vars(obj).items()
+                if not k.startswith('_') and getattr(obj, k) is not None)
+
+
+def json_default(obj):
+    """
+    Same filtering as ToJsonMixin.json_filter, reading the values from object_vars directly
+    """
+    try:
+        values = object_vars(obj)
+    except AttributeError:
+        raise TypeError("Object of type {0} is not JSON serializable".format(type(obj).__name__))
+
+    return {k: v for k, v in values.items() if v is not None and not k.startswith('_')}
 
 
 class FromJsonMixin(object):
@@ -28,7 +58,581 @@ class FromJsonMixin(object):
 
     @classmethod
     def from_json(cls, json_data):
-        obj = cls()
+        return json_decoder(cls).decode(json_data)
+
+
+def object_vars(obj):
+    """
+    :return: dict of the attributes of obj, including the ones compact classes store in __slots__
+    """
+    if getattr(type(obj), '_lazy_decoding', False):
+        hydrate(obj)
+
+    fields = getattr(type(obj), '_compact_fields', None)
+    if fields is None:
+        return obj.__dict__
+
+    values = {}
+    for name in fields:
+        try:
+            values[name] = getattr(obj, name)
+        except AttributeError:
+            pass
+
+    # Fields the class doesn't define spill over to __dict__
+    values.update(obj.__dict__)
+    return values
+
+
+def compact_class(cls):
+    """
+    Returns a subclass of cls storing the fields set by cls.__init__ and the nested object
+    fields in __slots__, with the nested object classes made compact too. Objects built from
+    it, for example with compact_class(Invoice).where(...) or
+    compact_class(Invoice).from_json(data), take less memory and behave like cls objects.
+    Fields cls doesn't define, like the ones added by newer minor versions, are stored in
+    __dict__.
+
+    Classes setting their own dispatch tables in __init__, like BatchItemResponse, are
+    returned unchanged.
+    :param cls: Class using FromJsonMixin
+    :return: Compact subclass of cls, created on first use
+    """
+    if '_compact_fields' in cls.__dict__:
+        return cls
+
+    compact = cls.__dict__.get('_compact_class')
+    if compact is not None:
+        return compact
+
+    defaults = cls().__dict__
+    if any(name in defaults for name in ('class_dict', 'list_dict', 'detail_dict')):
+        return cls
+
+    detail_dict = getattr(cls, 'detail_dict', {})
+    fields = list(defaults)
+    fields += [key for key in list(cls.class_dict) + list(cls.list_dict) if key not in fields]
+    fields = tuple(key for key in fields if key.isidentifier() and not keyword.iskeyword(key))
+
+    namespace = {
+        '__module__': cls.__module__,
+        '__doc__': cls.__doc__,
+        '__reduce__': _reduce,
+        '_compact_fields': fields,
+    }
+
+    # Attributes set by from_json, stored in __slots__ too so no __dict__ is created
+    internal = ('_loaded_values',) if hasattr(cls, '_loaded_values') else ()
+    if getattr(cls, '_lazy_decoding', False):
+        internal += ('_pending_json',)
+    internal = tuple(name for name in internal if name not in _compact_slots(cls))
+
+    namespace['__slots__'] = fields + internal
+
+    compact = type(cls.__name__, (cls,), namespace)
+    cls._compact_class = compact
+
+    # Set once compact is cached, as classes can refer to each other
+    compact.class_dict = _compact_classes(cls.class_dict)
+    compact.list_dict = _compact_classes(cls.list_dict)
+    compact.detail_dict = _compact_classes(detail_dict)
+
+    return compact
+
+
+def _compact_classes(class_dict):
+    """
+    :return: Copy of a dispatch table with the compact version of its classes
+    """
+    return dict((key, compact_class(sub_cls)) for key, sub_cls in class_dict.items())
+
+
+def _compact_slots(cls):
+    """
+    :return: Names of the __slots__ of cls and its bases
+    """
+    return set(name for klass in cls.__mro__ for name in klass.__dict__.get('__slots__', ()))
+
+
+def lazy_class(cls):
+    """
+    Returns a subclass of cls whose from_json keeps the json of nested objects and lists and
+    only builds them when they are first accessed. Attributes can be read and set as usual,
+    and serializing the object (to_json, to_dict, save) builds the remaining ones first.
+    This saves time and memory when only some fields of many objects are read, for example
+    lazy_class(Invoice).iter_all(...). Nested objects are lazy too, and compact classes can
+    be made lazy: lazy_class(compact_class(Invoice)).
+
+    Classes setting their own dispatch tables in __init__, like BatchItemResponse, are
+    returned unchanged.
+    :param cls: Class using FromJsonMixin
+    :return: Lazy subclass of cls, created on first use
+    """
+    if '_lazy_decoding' in cls.__dict__:
+        return cls
+
+    lazy = cls.__dict__.get('_lazy_class')
+    if lazy is not None:
+        return lazy
+
+    if any(name in cls().__dict__ for name in ('class_dict', 'list_dict', 'detail_dict')):
+        return cls
+
+    detail_dict = getattr(cls, 'detail_dict', {})
+
+    lazy = type(cls.__name__, (cls,), {
+        # Compact classes keep the json of the nested objects in __slots__ too
+        '__slots__': ('_pending_json',) if '_compact_fields' in cls.__dict__ else (),
+        '__module__': cls.__module__,
+        '__doc__': cls.__doc__,
+        '__reduce__': _reduce,
+        '__getattr__': _lazy_getattr,
+        '_lazy_decoding': True,
+    })
+    cls._lazy_class = lazy
+
+    # Set once lazy is cached, as classes can refer to each other
+    lazy.class_dict = dict((key, lazy_class(sub_cls)) for key, sub_cls in cls.class_dict.items())
+    lazy.list_dict = dict((key, lazy_class(sub_cls)) for key, sub_cls in cls.list_dict.items())
+    lazy.detail_dict = dict((key, lazy_class(sub_cls)) for key, sub_cls in detail_dict.items())
+
+    return lazy
+
+
+def partial_class(cls):
+    """
+    Returns a subclass of cls for the results of projected queries (where(..., fields=[...])).
+    Its from_json only sets the fields found in the json, without the defaults of __init__,
+    and reading a field that wasn't selected raises AttributeError. Partial objects can only
+    be saved with a sparse update.
+    :param cls: Class using FromJsonMixin
+    :return: Partial subclass of cls, created on first use
+    """
+    if '_partial' in cls.__dict__:
+        return cls
+
+    partial = cls.__dict__.get('_partial_class')
+    if partial is None:
+        partial = type(cls.__name__, (cls,), {
+            '__slots__': (),
+            '__module__': cls.__module__,
+            '__doc__': cls.__doc__,
+            '__reduce__': _reduce,
+            '__getattr__': _partial_getattr,
+            '__str__': _partial_str,
+            '_partial': True,
+        })
+        cls._partial_class = partial
+
+    return partial
+
+
+# Class attribute set by each function making subclasses, and the function
+_CLASS_FACTORIES = (
+    ('_compact_fields', compact_class),
+    ('_lazy_decoding', lazy_class),
+    ('_partial', partial_class),
+)
+
+
+def _reduce(obj):
+    """
+    __reduce__ of the classes made by compact_class, lazy_class and partial_class, which
+    pickle can't find by name: they are made again from the class they extend
+    """
+    cls = type(obj)
+    factories = []
+    while True:
+        factory = next((f for marker, f in _CLASS_FACTORIES if marker in cls.__dict__), None)
+        if factory is None:
+            break
+        factories.append(factory)
+        cls = cls.__bases__[0]
+
+    slots = {}
+    for name in _compact_slots(type(obj)):
+        value = _raw_value(obj, name)
+        if value is not _UNSET:
+            slots[name] = value
+
+    attributes = _raw_value(obj, '__dict__')
+    if attributes is _UNSET:
+        attributes = None
+
+    return _rebuild, (cls, tuple(factories)), (attributes, slots) if slots else attributes
+
+
+def _rebuild(cls, factories):
+    """
+    :param factories: compact_class, lazy_class and partial_class, as applied to cls
+    :return: Object of the class made by factories, for unpickling
+    """
+    for factory in reversed(factories):
+        cls = factory(cls)
+
+    return cls.__new__(cls)
+
+
+def _partial_getattr(obj, name):
+    """
+    __getattr__ of partial classes
+    """
+    if getattr(type(obj), '_lazy_decoding', False):
+        try:
+            return _lazy_getattr(obj, name)
+        except AttributeError:
+            pass
+
+    raise AttributeError(
+        "'{0}' object has no attribute '{1}', it wasn't selected by the query".format(
+            type(obj).__name__, name))
+
+
+def _partial_str(obj):
+    """
+    __str__ of partial classes, as the fields read by the __str__ of cls may not be selected
+    """
+    try:
+        return super(type(obj), obj).__str__()
+    except AttributeError:
+        return "{0} {1}".format(type(obj).__name__, getattr(obj, 'Id', ''))
+
+
+def _lazy_getattr(obj, name):
+    """
+    __getattr__ of lazy classes, building nested objects from the json kept by from_json
+    """
+    try:
+        pending = object.__getattribute__(obj, '_pending_json')
+    except AttributeError:
+        pending = None
+
+    if not pending or name not in pending:
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(type(obj).__name__, name))
+
+    value = json_decoder(type(obj)).decode_field(name, pending[name])
+
+    # Copied, not changed in place: copies of obj share the dict
+    pending = dict(pending)
+    del pending[name]
+    object.__setattr__(obj, '_pending_json', pending)
+    object.__setattr__(obj, name, value)
+
+    _loaded(obj, {name: value})
+    return value
+
+
+def hydrate(obj):
+    """
+    Builds the nested objects of a lazy object still kept as json. Attributes set since
+    from_json are left as they are.
+    """
+    try:
+        pending = object.__getattribute__(obj, '_pending_json')
+    except AttributeError:
+        return
+
+    object.__delattr__(obj, '_pending_json')
+    if not pending:
+        return
+
+    decoder = json_decoder(type(obj))
+    built = {}
+    for key, value in pending.items():
+        if _raw_value(obj, key) is _UNSET:
+            built[key] = decoder.decode_field(key, value)
+            object.__setattr__(obj, key, built[key])
+
+    _loaded(obj, built)
+
+
+def json_decoder(cls):
+    """
+    :return: JsonDecoder of cls, created on first use
+    """
+    # Looked up in cls.__dict__ so subclasses don't inherit the decoder of their parent
+    decoder = cls.__dict__.get('_json_decoder')
+
+    if decoder is None:
+        decoder = JsonDecoder(cls)
+        cls._json_decoder = decoder
+
+    return decoder
+
+
+def _assignment(key, expression, setter=None):
+    """
+    :param setter: Name of the function used to set attributes, instead of an assignment
+    :return: Python statement setting the attribute key of obj to expression
+    """
+    if setter is None and isinstance(key, str) and key.isidentifier() and \
+            not keyword.iskeyword(key):
+        return "obj.{0} = {1}".format(key, expression)
+
+    return "{0}(obj, {1!r}, {2})".format(setter or "setattr", key, expression)
+
+
+_IMMUTABLE_DEFAULT_TYPES = (type(None), bool, int, float) + six.string_types
+
+
+# Most key tuples kept by a JsonDecoder for its snapshots
+_SNAPSHOT_SHAPES = 256
+
+
+class JsonDecoder(object):
+    """
+    Builds objects of a class from QBO json. The dispatch tables (class_dict, list_dict and
+    detail_dict) are read once, and when the class __init__ only sets immutable defaults and
+    empty lists, new objects copy a snapshot of those defaults instead of running __init__.
+    """
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.class_dict = cls.class_dict
+        self.list_dict = cls.list_dict
+        self.detail_dict = getattr(cls, 'detail_dict', {})
+
+        self.defaults = None
+        self.list_defaults = ()
+        self.tracked_keys = ()
+        self.snapshot_keys = {}
+        self.lazy = getattr(cls, '_lazy_decoding', False)
+        self.decode = self.decode_with_init
+
+        defaults = object_vars(cls())
+
+        if any(name in defaults for name in ('class_dict', 'list_dict', 'detail_dict')):
+            # Objects with their own dispatch tables, like BatchItemResponse, must run __init__
+            return
+
+        if getattr(cls, '_partial', False):
+            # Only the fields found in the json are set
+            defaults = {}
+
+        list_defaults = []
+        for key, value in defaults.items():
+            if isinstance(value, list) and not value:
+                list_defaults.append(key)
+            elif not isinstance(value, _IMMUTABLE_DEFAULT_TYPES):
+                return
+
+        self.defaults = defaults
+        self.list_defaults = tuple(list_defaults)
+        if hasattr(cls, '_loaded_values'):
+            # Fields compared with their value at from_json by UpdateMixin.changed_fields
+            self.tracked_keys = tuple(self.decoded_keys())
+        self.decode = self.generate()
+
+    @staticmethod
+    def sub_decoder(sub_cls):
+        """
+        :return: function building sub_cls objects from json
+        """
+        from_json = sub_cls.from_json
+
+        if getattr(from_json, '__func__', None) is FromJsonMixin.from_json.__func__:
+            return json_decoder(sub_cls).decode
+
+        # from_json is overridden by sub_cls
+        return from_json
+
+    def decode_field(self, key, value):
+        """
+        :return: Value of the attribute key built from its json
+        """
+        if key in self.class_dict:
+            return self.sub_decoder(self.class_dict[key])(value)
+
+        if key in self.list_dict:
+            list_decoder = self.sub_decoder(self.list_dict[key])
+            sub_list = []
+
+            for data in value:
+                if 'DetailType' in data and data['DetailType'] in self.detail_dict:
+                    sub_list.append(self.sub_decoder(self.detail_dict[data['DetailType']])(data))
+                else:
+                    sub_list.append(list_decoder(data))
+
+            return sub_list
+
+        return value
+
+    def generate(self):
+        """
+        :return: function generated for the class, building objects from json. Every attribute
+        is assigned once, from the json or from the __init__ default, and only the nested
+        objects and lists of the class are dispatched.
+        """
+        namespace = {
+            'cls': self.cls,
+            'new': self.cls.__new__,
+            'detail_decoders': {},
+            'snapshot': self.snapshot,
+            'known_keys': frozenset(self.defaults) | frozenset(self.class_dict) |
+            frozenset(self.list_dict),
+        }
+        setter = None
+        if self.cls.__setattr__ is not object.__setattr__:
+            # Bypasses __setattr__ overrides, like the dirty field tracking of UpdateMixin
+            setter = "set_attribute"
+            namespace[setter] = object.__setattr__
+
+        lines = [
+            "def decode(json_data):",
+            "    obj = new(cls)",
+            "    get = json_data.get",
+        ]
+        if self.lazy:
+            lines.append("    pending = {}")
+
+        for detail_type, sub_cls in self.detail_dict.items():
+            namespace['detail_decoders'][detail_type] = self.lazy_decoder(
+                namespace['detail_decoders'], detail_type, sub_cls)
+
+        for index, key in enumerate(self.decoded_keys()):
+            lines += self.key_lines(namespace, index, key, setter)
+
+        lines += self.closing_lines(setter)
+
+        source = "\n".join(lines)
+        exec(compile(source, "<{0} decoder>".format(self.cls.__name__), "exec"), namespace)
+        return namespace['decode']
+
+    def decoded_keys(self):
+        """
+        :return: Attributes set by the generated function: the __init__ defaults, then the
+        nested objects and lists
+        """
+        keys = list(self.defaults)
+        keys += [key for key in self.class_dict if key not in self.defaults]
+        keys += [key for key in self.list_dict
+                 if key not in self.defaults and key not in self.class_dict]
+
+        return keys
+
+    def key_lines(self, namespace, index, key, setter):
+        """
+        :return: Lines of the generated function setting the attribute key
+        """
+        default = "default_{0}".format(index)
+        namespace[default] = self.defaults.get(key)
+
+        if key in self.list_defaults:
+            # Every object gets its own list
+            default = "[]"
+        elif key not in self.defaults:
+            default = None
+
+        value = self.sub_value(namespace, index, key)
+
+        if value is None:
+            if default == "[]":
+                value = "json_data[{0!r}] if {0!r} in json_data else []".format(key)
+            else:
+                value = "get({0!r}, {1})".format(key, default)
+
+            return ["    " + _assignment(key, value, setter)]
+
+        lines = ["    value = get({0!r})".format(key)]
+        if self.lazy:
+            # Built on first access by lazy classes
+            lines.append("    if value is not None:")
+            lines.append("        pending[{0!r}] = value".format(key))
+            if default is not None:
+                lines.append("    else:")
+                lines.append("        " + _assignment(key, default, setter))
+        elif default is None:
+            lines.append("    if value is not None:")
+            lines.append("        " + _assignment(key, value, setter))
+        else:
+            lines.append("    " + _assignment(
+                key, "{0} if value is not None else {1}".format(value, default), setter))
+
+        return lines
+
+    def sub_value(self, namespace, index, key):
+        """
+        :return: Expression building the nested object or list key from its json, None for
+        plain attributes
+        """
+        if key in self.class_dict:
+            name = "class_{0}".format(index)
+            namespace[name] = self.lazy_decoder(namespace, name, self.class_dict[key])
+            return "{0}(value)".format(name)
+
+        if key in self.list_dict:
+            name = "list_{0}".format(index)
+            namespace[name] = self.lazy_decoder(namespace, name, self.list_dict[key])
+
+            if self.detail_dict:
+                return "[detail_decoders.get(data.get('DetailType'), {0})(data) " \
+                       "for data in value]".format(name)
+            return "[{0}(data) for data in value]".format(name)
+
+        return None
+
+    def closing_lines(self, setter):
+        """
+        :return: Lines of the generated function setting the fields unknown to the class and
+        the internal attributes
+        """
+        # Fields missing from the class, like the ones added by newer minor versions
+        lines = [
+            "    if not known_keys.issuperset(json_data):",
+            "        for key in json_data:",
+            "            if key not in known_keys:",
+            "                {0}(obj, key, json_data[key])".format(setter or "setattr"),
+        ]
+        if self.lazy:
+            lines.append("    if pending:")
+            lines.append("        " + _assignment('_pending_json', "pending", setter))
+        if self.tracked_keys:
+            # Changes are tracked from here
+            lines.append("    " + _assignment('_loaded_values', "snapshot(obj, json_data)", setter))
+        lines.append("    return obj")
+
+        return lines
+
+    def snapshot(self, obj, json_data):
+        """
+        :return: Values compared by UpdateMixin.changed_fields: a tuple of keys, then the values
+        of these attributes of obj (_UNSET for lazy fields not built yet). Only the keys of
+        json_data and the list defaults are kept, the other attributes have their default value
+        """
+        shape = tuple(json_data)
+        keys = self.snapshot_keys.get(shape)
+        if keys is None:
+            keys = shape + tuple(key for key in self.list_defaults if key not in json_data)
+            if len(self.snapshot_keys) < _SNAPSHOT_SHAPES:
+                # One tuple for all the objects loaded from the same keys
+                self.snapshot_keys[shape] = keys
+
+        return (keys,) + tuple(_raw_value(obj, key) for key in keys)
+
+    def loaded_value(self, loaded, key):
+        """
+        :param loaded: dict of the snapshot values by key
+        :return: Value of attribute key after from_json, _UNSET if it wasn't set
+        """
+        if key in loaded:
+            return loaded[key]
+
+        return self.defaults.get(key, _UNSET)
+
+    def lazy_decoder(self, table, name, sub_cls):
+        """
+        Sub decoders are resolved on first use, as classes can refer to each other.
+        :return: function replacing table[name] with the decoder of sub_cls and decoding with it
+        """
+        def decode(json_data):
+            decoder = self.sub_decoder(sub_cls)
+            table[name] = decoder
+            return decoder(json_data)
+
+        return decode
+
+    def decode_with_init(self, json_data):
+        obj = self.cls()
         for key in json_data:
             if key in obj.class_dict:
                 sub_obj = obj.class_dict[key]()
@@ -72,11 +676,11 @@ def to_dict(obj, classkey=None):
     elif hasattr(obj, "__dict__"):
         if six.PY2:
             data = dict([(key, to_dict(value, classkey))
-                        for key, value in obj.__dict__.iteritems()
+                        for key, value in object_vars(obj).iteritems()
                         if not callable(value) and not key.startswith('_')])
         else:
             data = dict([(key, to_dict(value, classkey))
-                        for key, value in obj.__dict__.items()
+                        for key, value in object_vars(obj).items()
                         if not callable(value) and not key.startswith('_')])
 
         if classkey is not None and hasattr(obj, "__class__"):
@@ -91,21 +695,51 @@ class ToDictMixin(object):
         return to_dict(self)
 
 
+def _json_object_name(obj):
+    """
+    Name of the key holding the entity in QBO responses
+    """
+    if obj.qbo_json_object_name != '':
+        return obj.qbo_json_object_name
+    else:
+        return obj.qbo_object_name
+
+
+def _async_client(qb):
+    if qb is None or not qb.is_async:
+        raise QuickbooksException("An AsyncQuickBooks client must be passed in as qb")
+
+    return qb
+
+
 class ReadMixin(object):
     qbo_object_name = ""
     qbo_json_object_name = ""
 
     @classmethod
-    def get(cls, id, qb=None):
+    def get(cls, id, qb=None, use_cache=True):
+        """
+        :param id:
+        :param qb:
+        :param use_cache: Read through the entity_cache of the client, if it has one
+        """
         if not qb:
             qb = QuickBooks()
 
-        json_data = qb.get_single_object(cls.qbo_object_name, pk=id)
+        json_data = qb.get_single_object(cls.qbo_object_name, pk=id, use_cache=use_cache)
 
-        if cls.qbo_json_object_name != '':
-            return cls.from_json(json_data[cls.qbo_json_object_name])
-        else:
-            return cls.from_json(json_data[cls.qbo_object_name])
+        return cls.from_json(json_data[_json_object_name(cls)])
+
+    @classmethod
+    async def get_async(cls, id, qb=None):
+        """
+        Awaitable version of get
+        :param id:
+        :param qb: AsyncQuickBooks client
+        """
+        json_data = await _async_client(qb).get_single_object(cls.qbo_object_name, pk=id)
+
+        return cls.from_json(json_data[_json_object_name(cls)])
 
 
 class SendMixin(object):
@@ -139,30 +773,206 @@ class VoidMixin(object):
 
         endpoint = self.qbo_object_name.lower()
         url = "{0}/company/{1}/{2}".format(qb.api_url, qb.company_id, endpoint)
-        results = qb.post(url, json.dumps(data), params={'operation': 'void'})
+
+        try:
+            results = qb.post(url, codec.dumps(data), params={'operation': 'void'})
+        finally:
+            qb.invalidate_cache(self.qbo_object_name, self.Id)
 
         return results
 
 
+# Always part of sparse updates
+SPARSE_UPDATE_KEYS = ('Id', 'SyncToken', 'sparse')
+
+
+class _Marker(object):
+    """
+    Snapshot value kept by copy.deepcopy and pickle, so it's still compared by identity
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return self.name
+
+
+# Snapshot values of the attributes not set, and of the attributes marked by mark_dirty
+_UNSET = _Marker('_UNSET')
+_MODIFIED = _Marker('_MODIFIED')
+
+
+def _raw_value(obj, name):
+    """
+    :return: Attribute name of obj, without building lazy fields, or _UNSET
+    """
+    try:
+        return object.__getattribute__(obj, name)
+    except AttributeError:
+        return _UNSET
+
+
+def _changed(value, loaded):
+    """
+    :return: Whether value replaced loaded. Equal values, like the strings of an unpickled
+    object and the defaults of its decoder, aren't changes.
+    """
+    return value is not loaded and value != loaded
+
+
+def _loaded(obj, values):
+    """
+    Replaces values in the snapshot of an object built by from_json, after building lazy
+    fields or marking fields as modified
+    :param values: dict of the snapshot values by attribute name
+    """
+    loaded_values = _raw_value(obj, '_loaded_values')
+    if loaded_values is None or loaded_values is _UNSET or not values:
+        return
+
+    keys = loaded_values[0]
+    loaded_values = list(loaded_values)
+    for name, value in values.items():
+        if name in keys:
+            loaded_values[keys.index(name) + 1] = value
+        else:
+            keys += (name,)
+            loaded_values.append(value)
+
+    loaded_values[0] = keys
+    object.__setattr__(obj, '_loaded_values', tuple(loaded_values))
+
+
 class UpdateMixin(object):
     qbo_object_name = ""
     qbo_json_object_name = ""
 
-    def save(self, qb=None):
+    # Values of the attributes at from_json (see JsonDecoder.snapshot), None for objects not
+    # built by from_json
+    _loaded_values = None
+
+    def mark_dirty(self, *names):
+        """
+        Marks attributes changed in place, like lines appended to Line, as modified
+        :param names: Attribute names
+        """
+        for name in names:
+            # Lazy fields are built first, so building them doesn't reset the mark
+            getattr(self, name)
+
+        _loaded(self, dict((name, _MODIFIED) for name in names))
+
+    def changed_fields(self):
+        """
+        :return: Set of the attributes replaced since from_json, or None if the object wasn't
+        built by from_json
+        """
+        loaded_values = _raw_value(self, '_loaded_values')
+        if loaded_values is None or loaded_values is _UNSET:
+            return None
+
+        decoder = json_decoder(type(self))
+        loaded = dict(zip(loaded_values[0], loaded_values[1:]))
+        keys = set(decoder.tracked_keys).union(loaded)
+        keys.update(key for key in getattr(self, '__dict__', {}) if not key.startswith('_'))
+
+        changed = set(key for key in keys
+                      if _changed(_raw_value(self, key), decoder.loaded_value(loaded, key)))
+        return changed - set(SPARSE_UPDATE_KEYS)
+
+    def sparse_update_data(self):
+        """
+        Data of a sparse update: Id, SyncToken and the attributes modified since from_json,
+        or every attribute for objects not built by from_json.
+        :return: dict of the fields to send
+        """
+        changed_fields = self.changed_fields()
+
+        data = {
+            'Id': self.Id,
+            'SyncToken': self.SyncToken,
+            'sparse': True,
+        }
+
+        for name, value in object_vars(self).items():
+            if name.startswith('_') or name in data:
+                continue
+
+            if changed_fields is None:
+                if value is not None:
+                    data[name] = value
+            elif name in changed_fields:
+                # Changed fields set to None are sent to clear them
+                data[name] = value
+
+        return data
+
+    def _update_json(self, sparse):
+        # The sparse attribute only sets the flag of a full update: changes made in place, like
+        # appending a line, aren't tracked and would be lost if it sent the changed fields only
+        if sparse:
+            return codec.dumps(self.sparse_update_data(), default=json_default)
+
+        if getattr(self, '_partial', False):
+            # A full update would clear the fields that weren't selected
+            raise QuickbooksException(
+                "Cannot save partial {0} objects with a full update, use save(sparse=True)".format(
+                    self.qbo_object_name))
+
+        return self.to_compact_json()
+
+    def save(self, qb=None, sparse=False):
+        """
+        :param qb: QuickBooks client
+        :param sparse: Send a sparse update with only the attributes modified since from_json
+        (see changed_fields). Otherwise, the whole object is sent.
+        """
         if not qb:
             qb = QuickBooks()
 
         if self.Id and int(self.Id) > 0:
-            json_data = qb.update_object(self.qbo_object_name, self.to_json())
+            try:
+                json_data = qb.update_object(self.qbo_object_name, self._update_json(sparse))
+            finally:
+                qb.invalidate_cache(self.qbo_object_name, self.Id)
         else:
-            json_data = qb.create_object(self.qbo_object_name, self.to_json())
+            json_data = qb.create_object(self.qbo_object_name, self.to_compact_json())
+
+        return self._saved_object(json_data)
+
+    async def save_async(self, qb=None, sparse=False):
+        """
+        Awaitable version of save
+        :param qb: AsyncQuickBooks client
+        """
+        qb = _async_client(qb)
 
-        if self.qbo_json_object_name != '':
-            obj = type(self).from_json(json_data[self.qbo_json_object_name])
+        if self.Id and int(self.Id) > 0:
+            try:
+                json_data = await qb.update_object(self.qbo_object_name, self._update_json(sparse))
+            finally:
+                qb.invalidate_cache(self.qbo_object_name, self.Id)
         else:
-            obj = type(self).from_json(json_data[self.qbo_object_name])
+            json_data = await qb.create_object(self.qbo_object_name, self.to_compact_json())
+
+        return self._saved_object(json_data)
+
+    def _saved_object(self, json_data):
+        obj = type(self).from_json(json_data[_json_object_name(self)])
 
         self.Id = obj.Id
+        changed = self.changed_fields()
+        if changed is not None:
+            # The saved values become the ones compared
+            changed.add('Id')
+            _loaded(self, dict((name, _raw_value(self, name)) for name in changed))
+
         return obj
 
 
@@ -180,58 +990,247 @@ class DeleteMixin(object):
             'Id': self.Id,
             'SyncToken': self.SyncToken,
         }
-        return qb.delete_object(self.qbo_object_name, json.dumps(data))
+
+        try:
+            return qb.delete_object(self.qbo_object_name, codec.dumps(data))
+        finally:
+            qb.invalidate_cache(self.qbo_object_name, self.Id)
+
+
+# QBO rejects more than 10 concurrent requests per realm
+MAX_CONCURRENT_REQUESTS = 10
+
+
+def _choice_key(value):
+    """
+    :return: Key matching a choice of ListMixin.choose with the field of an object, like 1 with "1"
+    or "1" with a Ref whose value is "1"
+    """
+    # Refs, like CustomerRef, are matched by value
+    value = getattr(value, 'value', value)
+
+    return six.text_type(value)
 
 
 class ListMixin(object):
     qbo_object_name = ""
     qbo_json_object_name = ""
 
+    # Query builder, see quickbooks.query
+    objects = QueryManager()
+
     @classmethod
-    def all(cls, order_by="", start_position="", max_results=100, qb=None):
+    def all(cls, order_by="", start_position="", max_results=100, qb=None, fields=None):
         """
         :param start_position:
         :param max_results: The max number of entities that can be returned in a response is 1000.
         :param qb:
+        :param fields: Names of the fields to select (see where)
         :return: Returns list
         """
         return cls.where("", order_by=order_by, start_position=start_position,
-                         max_results=max_results, qb=qb)
+                         max_results=max_results, qb=qb, fields=fields)
 
     @classmethod
-    def filter(cls, order_by="", start_position="", max_results="", qb=None, **kwargs):
+    def filter(cls, order_by="", start_position="", max_results="", qb=None, fields=None, **kwargs):
         """
         :param order_by:
         :param start_position:
         :param max_results:
         :param qb:
+        :param fields: Names of the fields to select (see where)
         :param kwargs: field names and values to filter the query
         :return: Filtered list
         """
         return cls.where(build_where_clause(**kwargs),
                          start_position=start_position, max_results=max_results, order_by=order_by,
-                         qb=qb)
+                         qb=qb, fields=fields)
 
     @classmethod
-    def choose(cls, choices, field="Id", qb=None):
+    def choose(cls, choices, field="Id", qb=None, chunk_size=MAX_IN_VALUES, max_workers=4,
+               as_dict=False):
         """
-        :param choices:
+        Choices are split into chunks of chunk_size, queried concurrently by up to max_workers
+        threads, each chunk paginated until all its objects are read.
+        :param choices: Values of field
         :param field:
         :param qb:
-        :return: Filtered list
+        :param chunk_size: Number of choices per query
+        :param max_workers: Number of chunks queried concurrently (QBO allows at most 10
+        concurrent requests)
+        :param as_dict: Return a dict of the objects keyed by choice
+        :return: Filtered list in the order of choices. Objects not matching a choice exactly
+        (like names matched ignoring case) come last. With as_dict, dict of the first object
+        found for each choice.
         """
-        return cls.where(build_choose_clause(choices, field), qb=qb)
+        if not qb:
+            qb = QuickBooks()
+
+        check_field_name(field)
+
+        # Duplicates removed, order kept
+        choices = list(OrderedDict((choice, None) for choice in choices))
+        chunks = [choices[index:index + chunk_size] for index in range(0, len(choices), chunk_size)]
+
+        def fetch(chunk):
+            return list(cls.iter_where(
+                build_choose_clause(chunk, field), page_size=MAX_PAGE_SIZE, qb=qb))
+
+        workers = min(max_workers, MAX_CONCURRENT_REQUESTS, len(chunks))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(fetch, chunks))
+        else:
+            results = [fetch(chunk) for chunk in chunks]
+
+        objects_by_value = OrderedDict()
+        for obj in chain.from_iterable(results):
+            objects_by_value.setdefault(_choice_key(getattr(obj, field, None)), []).append(obj)
+
+        if as_dict:
+            return dict((choice, objects_by_value[_choice_key(choice)][0]) for choice in choices
+                        if _choice_key(choice) in objects_by_value)
+
+        obj_list = []
+        for choice in choices:
+            obj_list += objects_by_value.pop(_choice_key(choice), [])
+
+        for remaining in objects_by_value.values():
+            obj_list += remaining
+
+        return obj_list
 
     @classmethod
-    def where(cls, where_clause="", order_by="", start_position="", max_results="", qb=None):
+    def where(cls, where_clause="", order_by="", start_position="", max_results="", qb=None,
+              fields=None):
         """
         :param where_clause: QBO SQL where clause (DO NOT include 'WHERE')
         :param order_by:
         :param start_position:
         :param max_results:
         :param qb:
+        :param fields: Names of the fields to select, Id and SyncToken are always selected.
+        Objects are then built by partial_class(cls) and only have these fields.
         :return: Returns list filtered by input where_clause
         """
+        select = cls._build_select(where_clause, order_by, start_position, max_results, fields)
+
+        return cls._result_class(fields).query(select, qb=qb)
+
+    @classmethod
+    def iter_all(cls, order_by="", page_size=1000, prefetch=0, qb=None, fields=None):
+        """
+        :param order_by:
+        :param page_size: Number of entities requested per page (max 1000).
+        :param prefetch: Number of pages to request concurrently (see iter_where).
+        :param qb:
+        :param fields: Names of the fields to select (see where)
+        :return: Generator yielding every object, one page fetched at a time
+        """
+        return cls.iter_where("", order_by=order_by, page_size=page_size, prefetch=prefetch, qb=qb,
+                              fields=fields)
+
+    @classmethod
+    def iter_where(cls, where_clause="", order_by="", page_size=1000, prefetch=0, qb=None,
+                   fields=None):
+        """
+        Walks the result set using STARTPOSITION/MAXRESULTS, requesting the next page only
+        once the current one has been consumed. At most one page is held in memory.
+
+        With prefetch set above 1, the total is read first using count() and up to that many
+        pages are requested concurrently; objects are still yielded in order. QBO allows at
+        most 10 concurrent requests per realm, so larger values are capped.
+
+        :param where_clause: QBO SQL where clause (DO NOT include 'WHERE')
+        :param order_by:
+        :param page_size: Number of entities requested per page (max 1000).
+        :param prefetch: Number of pages to request concurrently.
+        :param qb:
+        :param fields: Names of the fields to select (see where)
+        :return: Generator yielding objects filtered by input where_clause
+        """
+        if not qb:
+            qb = QuickBooks()
+
+        from_json = cls._result_class(fields).from_json
+
+        for item_json in cls._iter_pages(where_clause, order_by, page_size, prefetch, qb, fields):
+            yield from_json(item_json)
+
+    @classmethod
+    def _iter_pages(cls, where_clause, order_by, page_size, prefetch, qb, fields=None):
+        """
+        Yields the json of the objects of every page, used by iter_where
+        """
+        start_position = 1
+
+        if prefetch > 1:
+            item_count = 0
+
+            pages = cls._prefetch_pages(where_clause, order_by, page_size, prefetch, qb, fields)
+
+            for item_list in pages:
+                item_count = len(item_list)
+                for item_json in item_list:
+                    yield item_json
+
+                start_position += page_size
+
+            if item_count < page_size:
+                return
+
+        while True:
+            item_list = cls._fetch_page(
+                where_clause, order_by, start_position, page_size, qb, fields)
+            for item_json in item_list:
+                yield item_json
+
+            if len(item_list) < page_size:
+                break
+
+            start_position += page_size
+
+    @classmethod
+    def _prefetch_pages(cls, where_clause, order_by, page_size, prefetch, qb, fields=None):
+        """
+        Yields the raw item lists of the pages counted by count(), in order, keeping up to
+        prefetch requests in flight.
+        """
+        total = cls.count(where_clause, qb=qb) or 0
+        start_positions = iter(range(1, total + 1, page_size))
+        window = min(prefetch, MAX_CONCURRENT_REQUESTS)
+
+        with ThreadPoolExecutor(max_workers=window) as executor:
+            pending = deque(
+                executor.submit(
+                    cls._fetch_page, where_clause, order_by, start, page_size, qb, fields)
+                for start in islice(start_positions, window))
+
+            try:
+                while pending:
+                    item_list = pending.popleft().result()
+
+                    for start in islice(start_positions, 1):
+                        pending.append(executor.submit(
+                            cls._fetch_page, where_clause, order_by, start, page_size, qb, fields))
+
+                    yield item_list
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    @classmethod
+    def _fetch_page(cls, where_clause, order_by, start_position, page_size, qb, fields=None):
+        select = cls._build_select(where_clause, order_by, start_position, page_size, fields)
+        json_data = qb.query(select)
+
+        return json_data["QueryResponse"].get(_json_object_name(cls), [])
+
+    @classmethod
+    def _build_select(cls, where_clause="", order_by="", start_position="", max_results="",
+                      fields=None):
+        select_fields = build_select_fields(fields) if fields else "*"
+
         if where_clause:
             where_clause = "WHERE " + where_clause
 
@@ -244,10 +1243,15 @@ class ListMixin(object):
         if max_results:
             max_results = " MAXRESULTS " + str(max_results)
 
-        select = "SELECT * FROM {0} {1}{2}{3}{4}".format(
-            cls.qbo_object_name, where_clause, order_by, start_position, max_results)
+        return "SELECT {0} FROM {1} {2}{3}{4}{5}".format(
+            select_fields, cls.qbo_object_name, where_clause, order_by, start_position, max_results)
 
-        return cls.query(select, qb=qb)
+    @classmethod
+    def _result_class(cls, fields):
+        """
+        :return: Class of the objects built from the results of a query selecting fields
+        """
+        return partial_class(cls) if fields else cls
 
     @classmethod
     def query(cls, select, qb=None):
@@ -261,18 +1265,7 @@ class ListMixin(object):
 
         json_data = qb.query(select)
 
-        obj_list = []
-
-        if cls.qbo_json_object_name != '':
-            object_name = cls.qbo_json_object_name
-        else:
-            object_name = cls.qbo_object_name
-
-        if object_name in json_data["QueryResponse"]:
-            for item_json in json_data["QueryResponse"][object_name]:
-                obj_list.append(cls.from_json(item_json))
-
-        return obj_list
+        return cls._query_response_to_list(json_data)
 
     @classmethod
     def count(cls, where_clause="", qb=None):
@@ -284,14 +1277,61 @@ class ListMixin(object):
         if not qb:
             qb = QuickBooks()
 
+        json_data = qb.query(cls._build_count_select(where_clause))
+
+        return cls._query_response_to_count(json_data)
+
+    @classmethod
+    async def where_async(cls, where_clause="", order_by="", start_position="", max_results="",
+                          qb=None, fields=None):
+        """
+        Awaitable version of where
+        :param qb: AsyncQuickBooks client
+        """
+        select = cls._build_select(where_clause, order_by, start_position, max_results, fields)
+
+        return await cls._result_class(fields).query_async(select, qb=qb)
+
+    @classmethod
+    async def query_async(cls, select, qb=None):
+        """
+        Awaitable version of query
+        :param qb: AsyncQuickBooks client
+        """
+        json_data = await _async_client(qb).query(select)
+
+        return cls._query_response_to_list(json_data)
+
+    @classmethod
+    async def count_async(cls, where_clause="", qb=None):
+        """
+        Awaitable version of count
+        :param qb: AsyncQuickBooks client
+        """
+        json_data = await _async_client(qb).query(cls._build_count_select(where_clause))
+
+        return cls._query_response_to_count(json_data)
+
+    @classmethod
+    def _build_count_select(cls, where_clause=""):
         if where_clause:
             where_clause = "WHERE " + where_clause
 
-        select = "SELECT COUNT(*) FROM {0} {1}".format(
-            cls.qbo_object_name, where_clause)
+        return "SELECT COUNT(*) FROM {0} {1}".format(cls.qbo_object_name, where_clause)
 
-        json_data = qb.query(select)
+    @classmethod
+    def _query_response_to_list(cls, json_data):
+        obj_list = []
+        object_name = _json_object_name(cls)
+
+        if object_name in json_data["QueryResponse"]:
+            for item_json in json_data["QueryResponse"][object_name]:
+                obj_list.append(cls.from_json(item_json))
 
+        return obj_list
+
+    @classmethod
+    def _query_response_to_count(cls, json_data):
         if "totalCount" in json_data["QueryResponse"]:
             return json_data["QueryResponse"]["totalCount"]
         else:
@@ -56,9 +56,14 @@ class Attachable(DeleteMixin, QuickbooksManagedObject, QuickbooksTransactionEnti
             qb = QuickBooks()
 
         if self.Id and int(self.Id) > 0:
-            json_data = qb.update_object(self.qbo_object_name, self.to_json(), _file_path=self._FilePath)
+            try:
+                json_data = qb.update_object(
+                    self.qbo_object_name, self.to_compact_json(), _file_path=self._FilePath)
+            finally:
+                qb.invalidate_cache(self.qbo_object_name, self.Id)
         else:
-            json_data = qb.create_object(self.qbo_object_name, self.to_json(), _file_path=self._FilePath)
+            json_data = qb.create_object(
+                self.qbo_object_name, self.to_compact_json(), _file_path=self._FilePath)
 
         if self.FileName:
             obj = type(self).from_json(json_data['AttachableResponse'][0]['Attachable'])
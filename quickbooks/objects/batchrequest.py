@@ -6,6 +6,7 @@ class BatchOperation(object):
     CREATE = "create"
     UPDATE = "update"
     DELETE = "delete"
+    QUERY = "query"
 
 
 @python_2_unicode_compatible
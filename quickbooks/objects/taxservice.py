@@ -55,9 +55,12 @@ class TaxService(QuickbooksBaseObject, UpdateMixin):
             qb = QuickBooks()
 
         if self.TaxCodeId and self.TaxCodeId > 0:
-            json_data = qb.update_object(self.qbo_object_name, self.to_json())
+            try:
+                json_data = qb.update_object(self.qbo_object_name, self.to_compact_json())
+            finally:
+                qb.invalidate_cache(self.qbo_object_name, self.TaxCodeId)
         else:
-            json_data = qb.create_object(self.qbo_object_name, self.to_json())
+            json_data = qb.create_object(self.qbo_object_name, self.to_compact_json())
 
         obj = type(self).from_json(json_data)
         self.TaxCodeId = obj.Id
@@ -0,0 +1,294 @@
+"""
+Query builder for the QBO query language, available on every queryable object as objects:
+
+    invoices = Invoice.objects.filter(TxnDate__gte=date(2020, 1, 1), TotalAmt__gt=0) \\
+        .order_by('-TxnDate').limit(100).using(client)
+
+    for invoice in invoices:
+        ...
+
+Query sets are immutable, each method returns a new one. The statement is compiled on first
+use and kept by the query set, so a query set can be run repeatedly without being compiled again.
+"""
+import datetime
+import itertools
+from collections import OrderedDict
+from decimal import Decimal
+
+import six
+
+from .client import QuickBooks
+from .exceptions import QuickbooksException
+from .helpers import qb_date_format, qb_datetime_format
+from .utils import check_field_name, escape_string
+
+# Lookup suffixes and their QBO operators
+OPERATORS = {
+    'exact': '=',
+    'lt': '<',
+    'gt': '>',
+    'lte': '<=',
+    'gte': '>=',
+    'like': 'LIKE',
+    'in': 'IN',
+}
+
+# The max number of entities that can be returned in a response is 1000
+MAX_PAGE_SIZE = 1000
+
+# IN lists longer than this are split into several queries
+MAX_IN_VALUES = 250
+
+
+def quote_value(value):
+    """
+    :param value: str, bool, number, date or datetime
+    :return: value formatted for a QBO query
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, six.integer_types + (float, Decimal)):
+        return str(value)
+
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            return "'{0}'".format(value.isoformat())
+        return "'{0}'".format(qb_datetime_format(value))
+
+    if isinstance(value, datetime.date):
+        return "'{0}'".format(qb_date_format(value))
+
+    if isinstance(value, six.string_types):
+        return "'{0}'".format(escape_string(value))
+
+    raise QuickbooksException("Unsupported query value {0!r}".format(value))
+
+
+class QuerySet(object):
+    """
+    Query on the objects of a class using ListMixin. Results are fetched when the query set
+    is iterated, one page at a time.
+    """
+    max_in_values = MAX_IN_VALUES
+
+    def __init__(self, cls, qb=None):
+        self.cls = cls
+        self._qb = qb
+        self._conditions = ()
+        self._order_by = ()
+        self._limit = None
+        self._offset = 0
+        self._fields = None
+        self._compiled = None
+
+    def _clone(self, **attributes):
+        query_set = type(self)(self.cls, self._qb)
+        query_set._conditions = self._conditions
+        query_set._order_by = self._order_by
+        query_set._limit = self._limit
+        query_set._offset = self._offset
+        query_set._fields = self._fields
+
+        for name, value in attributes.items():
+            setattr(query_set, name, value)
+
+        return query_set
+
+    def filter(self, **lookups):
+        """
+        Conditions are joined by AND.
+        :param lookups: field__operator=value, where operator is one of exact (the default), lt, gt,
+        lte, gte, like or in. Values of in lookups are lists. Fields of nested objects are
+        separated by __ too: MetaData__LastUpdatedTime__gte is MetaData.LastUpdatedTime >=.
+        :return: New QuerySet
+        """
+        conditions = []
+
+        for lookup, value in sorted(lookups.items()):
+            parts = lookup.split('__')
+            operator = 'exact'
+            if len(parts) > 1 and parts[-1] in OPERATORS:
+                operator = parts.pop()
+            elif len(parts) > 1 and parts[-1][:1].islower():
+                # Field names start with a capital letter
+                raise QuickbooksException("Unknown lookup {0}".format(lookup))
+
+            field = '.'.join(parts)
+            check_field_name(field)
+
+            if operator == 'in':
+                if isinstance(value, six.string_types):
+                    raise QuickbooksException("Values of {0} must be a list".format(lookup))
+
+                # Duplicates removed, order kept
+                value = tuple(OrderedDict((quote_value(item), None) for item in value))
+            else:
+                value = quote_value(value)
+
+            conditions.append((field, OPERATORS[operator], value))
+
+        return self._clone(_conditions=self._conditions + tuple(conditions))
+
+    def order_by(self, *fields):
+        """
+        :param fields: Field names, descending when starting with '-'
+        :return: New QuerySet, replacing the previous ordering
+        """
+        order_by = []
+
+        for field in fields:
+            if field.startswith('-'):
+                check_field_name(field[1:])
+                order_by.append(field[1:] + " DESC")
+            else:
+                check_field_name(field)
+                order_by.append(field)
+
+        return self._clone(_order_by=tuple(order_by))
+
+    def limit(self, count):
+        """
+        :param count: Max number of objects returned
+        :return: New QuerySet
+        """
+        if count is not None and int(count) < 1:
+            raise QuickbooksException("limit must be at least 1")
+
+        return self._clone(_limit=count if count is None else int(count))
+
+    def offset(self, count):
+        """
+        :param count: Number of objects skipped
+        :return: New QuerySet
+        """
+        if int(count) < 0:
+            raise QuickbooksException("offset can't be negative")
+
+        return self._clone(_offset=int(count))
+
+    def only(self, *fields):
+        """
+        Selects only some fields (see ListMixin.where)
+        :param fields: Field names, Id and SyncToken are always selected
+        :return: New QuerySet
+        """
+        for field in fields:
+            check_field_name(field)
+
+        return self._clone(_fields=tuple(fields) or None)
+
+    def using(self, qb):
+        """
+        :param qb: QuickBooks client running the queries
+        :return: New QuerySet
+        """
+        return self._clone(_qb=qb)
+
+    def compile(self):
+        """
+        :return: Tuple of the where clauses to query, several when an IN list is split, and
+        the order by clause. Compiled once per query set.
+        """
+        if self._compiled is None:
+            conditions = []
+
+            for field, operator, value in self._conditions:
+                if operator != 'IN':
+                    conditions.append(["{0} {1} {2}".format(field, operator, value)])
+                    continue
+
+                chunks = [value[index:index + self.max_in_values]
+                          for index in range(0, len(value), self.max_in_values)]
+                conditions.append(
+                    ["{0} IN ({1})".format(field, ", ".join(chunk)) for chunk in chunks])
+
+            # One query per combination of the IN list parts, none if an IN list is empty
+            where_clauses = tuple(" AND ".join(parts) for parts in itertools.product(*conditions))
+            self._compiled = (where_clauses, ", ".join(self._order_by))
+
+        return self._compiled
+
+    def statements(self):
+        """
+        :return: List of the select statements of the query, empty if an IN list is empty
+        """
+        where_clauses, order_by = self.compile()
+        start_position = self._offset + 1 if self._offset else ""
+
+        return [self.cls._build_select(
+            where_clause, order_by, start_position, self._limit or "", self._fields)
+            for where_clause in where_clauses]
+
+    def __str__(self):
+        return "; ".join(self.statements())
+
+    def __iter__(self):
+        where_clauses, order_by = self.compile()
+
+        if len(where_clauses) > 1 and (self._limit or self._offset):
+            raise QuickbooksException(
+                "limit and offset can't be used when an IN list is split into several queries")
+
+        if len(where_clauses) > 1 and order_by:
+            # The results of each query are ordered, not the concatenated results
+            raise QuickbooksException(
+                "order_by can't be used when an IN list is split into several queries")
+
+        qb = self._qb or QuickBooks()
+        from_json = self.cls._result_class(self._fields).from_json
+
+        for where_clause in where_clauses:
+            start_position = self._offset + 1
+            remaining = self._limit
+
+            while True:
+                page_size = MAX_PAGE_SIZE if remaining is None else min(remaining, MAX_PAGE_SIZE)
+                item_list = self.cls._fetch_page(
+                    where_clause, order_by, start_position, page_size, qb, self._fields)
+
+                for item_json in item_list:
+                    yield from_json(item_json)
+
+                if remaining is not None:
+                    remaining -= len(item_list)
+
+                if len(item_list) < page_size or remaining == 0:
+                    break
+
+                start_position += page_size
+
+    def all(self):
+        """
+        :return: List of the objects matching the query
+        """
+        return list(self)
+
+    def first(self):
+        """
+        :return: First object matching the query, None if there is none
+        """
+        where_clauses, _ = self.compile()
+
+        for obj in self.limit(1) if len(where_clauses) == 1 else self:
+            return obj
+
+        return None
+
+    def count(self):
+        """
+        :return: Number of objects matching the query, ignoring limit and offset
+        """
+        where_clauses, _ = self.compile()
+        qb = self._qb or QuickBooks()
+
+        return sum(self.cls.count(where_clause, qb=qb) or 0 for where_clause in where_clauses)
+
+
+class QueryManager(object):
+    """
+    Descriptor returning a new QuerySet on the class it is read from, like Invoice.objects
+    """
+
+    def __get__(self, instance, owner):
+        return QuerySet(owner)
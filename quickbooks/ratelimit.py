@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Token bucket limiting the request rate (requests_per_minute, allowing bursts of up to
+    burst requests) and the number of requests in flight (max_concurrent). The defaults match
+    the QBO limits of 500 requests per minute and 10 concurrent requests per realm.
+
+    Thread-safe; use acquire/release (or the limiter as a context manager) from threads and
+    acquire_async/release from asyncio code. Limiters shared by every client of a realm are
+    returned by RateLimiter.for_realm.
+    """
+    _realm_limiters = {}
+    _realm_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute=500, max_concurrent=10, burst=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max_concurrent
+        self.max_concurrent = max_concurrent
+
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+        self._waiting = 0
+        self._requests = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    @classmethod
+    def for_realm(cls, company_id, **kwargs):
+        """
+        :param company_id:
+        :param kwargs: RateLimiter arguments, used when the realm's limiter is created
+        :return: RateLimiter shared by every caller using the same company_id
+        """
+        with cls._realm_lock:
+            limiter = cls._realm_limiters.get(str(company_id))
+            if limiter is None:
+                limiter = cls(**kwargs)
+                cls._realm_limiters[str(company_id)] = limiter
+
+        return limiter
+
+    def _try_acquire(self):
+        """
+        Must be called holding the condition lock.
+        :return: 0 if a request may be sent, otherwise the number of seconds to wait for a token
+        or None when waiting for a request in flight to complete
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        if self._in_flight >= self.max_concurrent:
+            return None
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._in_flight += 1
+            return 0
+
+        return (1 - self._tokens) / self.rate
+
+    def _record(self, wait):
+        self._requests += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        self._last_wait = wait
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent. Every acquire must be followed by a release.
+        """
+        started = time.monotonic()
+
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    wait = self._try_acquire()
+                    if wait == 0:
+                        break
+                    self._condition.wait(wait)
+            finally:
+                self._waiting -= 1
+
+            self._record(time.monotonic() - started)
+
+    async def acquire_async(self):
+        """
+        Awaitable version of acquire, never blocking the event loop.
+        """
+        started = time.monotonic()
+
+        with self._condition:
+            self._waiting += 1
+
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_acquire()
+                if wait == 0:
+                    break
+                await asyncio.sleep(wait if wait is not None else 0.01)
+        finally:
+            with self._condition:
+                self._waiting -= 1
+                self._record(time.monotonic() - started)
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def stats(self):
+        """
+        :return: dict with queue_depth (callers waiting), in_flight, requests (acquired so far),
+        and last, average and max wait in seconds
+        """
+        with self._condition:
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "requests": self._requests,
+                "last_wait": self._last_wait,
+                "average_wait": self._total_wait / self._requests if self._requests else 0.0,
+                "max_wait": self._max_wait,
+            }
@@ -0,0 +1,198 @@
+import random
+import time
+import uuid
+from email.utils import parsedate_tz, mktime_tz
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is sent again and how long to wait before doing so.
+
+    Throttled requests (HTTP 429) were rejected before being processed and are always retried.
+    Server errors and connection failures are only retried for idempotent requests: GET,
+    queries, and POSTs carrying a requestid (QBO ignores a repeated requestid). With
+    use_request_ids, a requestid is added to every POST so creates and updates can be
+    retried safely.
+
+    Delays grow exponentially (backoff_factor * 2 ** attempt, capped at max_backoff) with
+    full jitter, unless the response has a Retry-After header. No retry is made once
+    max_retries is reached or when it would end after max_elapsed seconds.
+
+    Hooks are called before each retry with keyword arguments request_type, url, attempt,
+    delay, status_code and exception.
+    """
+    IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, max_retries=5, backoff_factor=0.5, max_backoff=60, jitter=True,
+                 max_elapsed=300, retry_statuses=(429, 500, 502, 503, 504),
+                 throttle_statuses=(429,), use_request_ids=False, hooks=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.retry_statuses = retry_statuses
+        self.throttle_statuses = throttle_statuses
+        self.use_request_ids = use_request_ids
+        self.hooks = list(hooks or [])
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def prepare_params(self, request_type, params):
+        """
+        Adds a requestid to POST requests when use_request_ids is set
+        """
+        if self.use_request_ids and request_type == "POST" and params is not None \
+                and "requestid" not in params:
+            params["requestid"] = uuid.uuid4().hex
+
+        return params
+
+    def is_idempotent(self, request_type, url, params=None):
+        if request_type in self.IDEMPOTENT_METHODS:
+            return True
+
+        if params and "requestid" in params:
+            return True
+
+        return url.split("?")[0].endswith("/query")
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+
+        delay = min(self.backoff_factor * (2 ** attempt), self.max_backoff)
+
+        if self.jitter:
+            delay = random.uniform(0, delay)
+
+        return delay
+
+    def next_delay(self, attempt, started, request_type, url, params=None, response=None,
+                   exception=None):
+        """
+        :param attempt: Number of retries already made
+        :param started: time.time() of the first attempt
+        :param response: Response received, if any
+        :param exception: Connection error raised, if any
+        :return: Seconds to wait before retrying, or None if the request must not be retried
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        status_code = None
+        retry_after = None
+
+        if response is not None:
+            status_code = response.status_code
+
+            if status_code not in self.retry_statuses:
+                return None
+            if status_code not in self.throttle_statuses and \
+                    not self.is_idempotent(request_type, url, params):
+                return None
+
+            retry_after = parse_retry_after(getattr(response, "headers", None))
+
+        elif exception is None or not self.is_idempotent(request_type, url, params):
+            return None
+
+        delay = self.backoff(attempt, retry_after)
+
+        if time.time() + delay - started > self.max_elapsed:
+            return None
+
+        for hook in self.hooks:
+            hook(request_type=request_type, url=url, attempt=attempt + 1, delay=delay,
+                 status_code=status_code, exception=exception)
+
+        return delay
+
+
+class BatchRetryPolicy(RetryPolicy):
+    """
+    Decides which faulted items of a batch request BatchManager sends again, and how long it
+    waits before doing so (see RetryPolicy.backoff).
+
+    Faults are classified from the codes of their errors: stale objects (SyncToken changed by
+    someone else) are sent again at once with the current SyncToken, throttled and transient
+    (SystemFault) items after a delay. Other faults, like validation errors, are permanent.
+    Creates are only sent again when throttled (see is_retriable).
+    """
+    STALE = "stale"
+    THROTTLED = "throttled"
+    TRANSIENT = "transient"
+    PERMANENT = "permanent"
+
+    def __init__(self, max_retries=5, stale_codes=("5010",), throttle_codes=("3001",),
+                 transient_codes=("10000",), transient_fault_types=("SystemFault",), **kwargs):
+        """
+        :param max_retries: Number of times faulted items are sent again
+        :param stale_codes: Error codes of stale objects (5010, Stale Object Error)
+        :param throttle_codes: Error codes of throttled requests (3001, ThrottleExceeded)
+        :param transient_codes: Error codes of transient errors
+        :param transient_fault_types: Fault types of transient errors
+        :param kwargs: see RetryPolicy
+        """
+        super(BatchRetryPolicy, self).__init__(max_retries=max_retries, **kwargs)
+        self.stale_codes = tuple(str(code) for code in stale_codes)
+        self.throttle_codes = tuple(str(code) for code in throttle_codes)
+        self.transient_codes = tuple(str(code) for code in transient_codes)
+        self.transient_fault_types = transient_fault_types
+
+    def classify(self, fault):
+        """
+        :param fault: Fault of a batch item
+        :return: STALE, THROTTLED, TRANSIENT or PERMANENT
+        """
+        codes = [str(error.code) for error in fault.Error]
+
+        if any(code in self.throttle_codes for code in codes):
+            return self.THROTTLED
+
+        if any(code in self.stale_codes for code in codes):
+            return self.STALE
+
+        if fault.type in self.transient_fault_types or \
+                any(code in self.transient_codes for code in codes):
+            return self.TRANSIENT
+
+        return self.PERMANENT
+
+    def is_retriable(self, kind, operation):
+        """
+        Creates with a transient fault may have been processed by QBO, sending them again could
+        create duplicates: like non idempotent requests, only throttled creates are sent again.
+        :param kind: Kind of the fault, see classify
+        :param operation: create, update or delete
+        :return: True if the item is sent again
+        """
+        if kind == self.PERMANENT:
+            return False
+
+        return operation != "create" or kind == self.THROTTLED
+
+
+def parse_retry_after(headers):
+    """
+    :param headers: Response headers
+    :return: Seconds to wait according to the Retry-After header, or None
+    """
+    if not headers:
+        return None
+
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+
+    parsed_date = parsedate_tz(value)
+    if parsed_date is None:
+        return None
+
+    return max(mktime_tz(parsed_date) - time.time(), 0)
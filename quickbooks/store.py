@@ -0,0 +1,322 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from dateutil.parser import isoparse
+
+from . import codec
+from .cdc import fetch_changes
+from .client import QuickBooks
+from .helpers import qb_datetime_utc_offset_format
+
+# QBO only returns changes made in the last 30 days
+CDC_LOOKBACK = timedelta(days=30)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entities ("
+    " entity TEXT NOT NULL, id TEXT NOT NULL, sync_token INTEGER, doc_number TEXT, name TEXT,"
+    " last_updated TEXT, data TEXT NOT NULL, PRIMARY KEY (entity, id))",
+    "CREATE INDEX IF NOT EXISTS entities_doc_number ON entities (entity, doc_number)",
+    "CREATE INDEX IF NOT EXISTS entities_name ON entities (entity, name)",
+    "CREATE TABLE IF NOT EXISTS custom_fields ("
+    " entity TEXT NOT NULL, id TEXT NOT NULL, name TEXT NOT NULL, value TEXT)",
+    "CREATE INDEX IF NOT EXISTS custom_fields_value ON custom_fields (entity, name, value)",
+    "CREATE INDEX IF NOT EXISTS custom_fields_id ON custom_fields (entity, id)",
+    "CREATE TABLE IF NOT EXISTS sync_state (entity TEXT PRIMARY KEY, changed_since TEXT NOT NULL)",
+)
+
+
+class LocalStore(object):
+    """
+    Local copy of QBO entities kept in SQLite. load reads every entity of a class with
+    iter_all, then sync applies the changes returned by change data capture, deletes included,
+    made since the high-water mark saved by the previous load or sync. Entities are read back by
+    Id, DocNumber, name or custom field value without requests to QBO.
+
+    The high-water mark is moved back by overlap seconds, so changes made while a load or sync
+    was running are applied again by the next sync; older versions (lower SyncToken) never
+    replace newer ones. Thread-safe.
+    """
+
+    def __init__(self, path=":memory:", overlap=300, timeout=60):
+        """
+        :param path: SQLite database file, kept in memory by default
+        :param overlap: Seconds the high-water mark is moved back
+        :param timeout: Seconds to wait for other connections to the database
+        """
+        self.path = path
+        self.overlap = timedelta(seconds=overlap)
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False)
+
+        with self._lock:
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _execute(self, statement, parameters=()):
+        with self._lock:
+            return self._connection.execute(statement, parameters).fetchall()
+
+    def load(self, cls, qb=None, page_size=1000, prefetch=0):
+        """
+        Replaces the stored entities of cls with every entity read from QBO. Each page is stored
+        as it is read, stored entities missing from QBO are removed at the end.
+        :param cls: Class of the entities, like Invoice
+        :param qb:
+        :param page_size: see ListMixin.iter_all
+        :param prefetch: see ListMixin.iter_all
+        :return: Number of entities loaded
+        """
+        if qb is None:
+            qb = QuickBooks()
+
+        entity = cls.qbo_object_name
+        changed_since = self._high_water_mark(datetime.now(timezone.utc))
+        loaded_ids = set()
+        page = []
+
+        for item_json in cls._iter_pages("", "", page_size, prefetch, qb):
+            page.append(item_json)
+
+            if len(page) == page_size:
+                self._save_page(entity, page, loaded_ids)
+                page = []
+
+        self._save_page(entity, page, loaded_ids)
+
+        with self._transaction():
+            self._delete_missing(entity, loaded_ids)
+            self._set_changed_since(entity, changed_since)
+
+        return len(loaded_ids)
+
+    def _save_page(self, entity, item_list, loaded_ids):
+        with self._transaction():
+            for item_json in item_list:
+                self._save(entity, item_json)
+                loaded_ids.add(str(item_json["Id"]))
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            else:
+                self._connection.execute("COMMIT")
+
+    def sync(self, classes, qb=None):
+        """
+        Applies the changes made since the last load or sync of each class, with one change data
+        capture request. Classes never loaded, or last synced before the 30 days covered by
+        change data capture, are loaded. When more than 1000 entities of a class changed, the
+        response misses some deletes: the Ids of every entity of the class are then read to
+        remove the deleted ones.
+        :param classes: Classes of the entities
+        :param qb:
+        :return: dict of the number of changes applied (or entities loaded) by entity name
+        """
+        if qb is None:
+            qb = QuickBooks()
+
+        started = datetime.now(timezone.utc)
+        applied = {}
+        cdc_classes = []
+
+        for cls in classes:
+            changed_since = self.changed_since(cls)
+
+            if changed_since is None or changed_since < started - CDC_LOOKBACK:
+                applied[cls.qbo_object_name] = self.load(cls, qb=qb)
+            else:
+                cdc_classes.append(cls)
+
+        if not cdc_classes:
+            return applied
+
+        changed_since = min(self.changed_since(cls) for cls in cdc_classes)
+        response_time, changes, truncated = fetch_changes(
+            cdc_classes, qb_datetime_utc_offset_format(changed_since, "+00:00"), qb=qb)
+
+        if response_time:
+            # QBO time, unaffected by the local clock
+            started = isoparse(response_time).astimezone(timezone.utc)
+
+        applied.update(self._apply_changes(changes))
+
+        for cls in cdc_classes:
+            if cls.qbo_object_name in truncated:
+                # Deletes beyond the first 1000 changes are missing from the response
+                applied[cls.qbo_object_name] += self._remove_deleted(cls, qb)
+
+        with self._transaction():
+            for cls in cdc_classes:
+                self._set_changed_since(cls.qbo_object_name, self._high_water_mark(started))
+
+        return applied
+
+    def _apply_changes(self, changes):
+        """
+        :param changes: dict of the entities changed by entity name, as returned by fetch_changes
+        :return: dict of the number of changes applied by entity name
+        """
+        applied = {}
+
+        with self._transaction():
+            for entity, item_list in changes.items():
+                for item_json in item_list:
+                    if item_json.get("status") == "Deleted":
+                        self._delete(entity, str(item_json["Id"]))
+                    else:
+                        self._save(entity, item_json)
+
+                applied[entity] = len(item_list)
+
+        return applied
+
+    def _remove_deleted(self, cls, qb):
+        """
+        Removes the stored entities of cls missing from QBO, reading the Ids of every entity
+        :return: Number of entities removed
+        """
+        item_jsons = cls._iter_pages("", "", 1000, 0, qb, fields=("Id",))
+        current_ids = set(str(item_json["Id"]) for item_json in item_jsons)
+
+        with self._transaction():
+            return self._delete_missing(cls.qbo_object_name, current_ids)
+
+    def _delete_missing(self, entity, current_ids):
+        """
+        :return: Number of stored entities deleted, missing from current_ids
+        """
+        stored_ids = [row[0] for row in self._connection.execute(
+            "SELECT id FROM entities WHERE entity = ?", (entity,))]
+        deleted_ids = [entity_id for entity_id in stored_ids if entity_id not in current_ids]
+
+        for entity_id in deleted_ids:
+            self._delete(entity, entity_id)
+
+        return len(deleted_ids)
+
+    def _high_water_mark(self, now):
+        return now - self.overlap
+
+    def _set_changed_since(self, entity, changed_since):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO sync_state (entity, changed_since) VALUES (?, ?)",
+            (entity, changed_since.isoformat()))
+
+    def _save(self, entity, item_json):
+        entity_id = str(item_json["Id"])
+        sync_token = _int_or_none(item_json.get("SyncToken"))
+
+        row = self._connection.execute(
+            "SELECT sync_token FROM entities WHERE entity = ? AND id = ?",
+            (entity, entity_id)).fetchone()
+        if row and row[0] is not None and sync_token is not None and row[0] > sync_token:
+            return
+
+        self._connection.execute(
+            "INSERT OR REPLACE INTO entities "
+            "(entity, id, sync_token, doc_number, name, last_updated, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entity, entity_id, sync_token, item_json.get("DocNumber"),
+             item_json.get("DisplayName", item_json.get("Name")),
+             (item_json.get("MetaData") or {}).get("LastUpdatedTime"), codec.dumps(item_json)))
+
+        self._connection.execute(
+            "DELETE FROM custom_fields WHERE entity = ? AND id = ?", (entity, entity_id))
+        self._connection.executemany(
+            "INSERT INTO custom_fields (entity, id, name, value) VALUES (?, ?, ?, ?)",
+            [(entity, entity_id, field["Name"], _custom_field_value(field))
+             for field in item_json.get("CustomField") or [] if field.get("Name")])
+
+    def _delete(self, entity, entity_id):
+        self._connection.execute(
+            "DELETE FROM entities WHERE entity = ? AND id = ?", (entity, entity_id))
+        self._connection.execute(
+            "DELETE FROM custom_fields WHERE entity = ? AND id = ?", (entity, entity_id))
+
+    def changed_since(self, cls):
+        """
+        :return: High-water mark of cls as an aware datetime, None if cls was never loaded
+        """
+        rows = self._execute(
+            "SELECT changed_since FROM sync_state WHERE entity = ?", (cls.qbo_object_name,))
+
+        return isoparse(rows[0][0]) if rows else None
+
+    def _objects(self, cls, where, parameters):
+        rows = self._execute(
+            "SELECT data FROM entities WHERE entity = ? AND " + where + " ORDER BY id",
+            (cls.qbo_object_name,) + parameters)
+
+        return [cls.from_json(codec.loads(row[0])) for row in rows]
+
+    def get(self, cls, id):
+        """
+        :return: Stored entity of cls with this Id, or None
+        """
+        objects = self._objects(cls, "id = ?", (str(id),))
+
+        return objects[0] if objects else None
+
+    def find_by_doc_number(self, cls, doc_number):
+        """
+        :return: List of the stored entities of cls with this DocNumber
+        """
+        return self._objects(cls, "doc_number = ?", (doc_number,))
+
+    def find_by_name(self, cls, name):
+        """
+        :return: List of the stored entities of cls with this DisplayName, or Name for entities
+        without one
+        """
+        return self._objects(cls, "name = ?", (name,))
+
+    def find_by_custom_field(self, cls, name, value):
+        """
+        :return: List of the stored entities of cls with this value in the custom field named name
+        """
+        return self._objects(
+            cls, "id IN (SELECT id FROM custom_fields WHERE entity = ? AND name = ? AND value = ?)",
+            (cls.qbo_object_name, name, str(value)))
+
+    def all(self, cls):
+        """
+        :return: List of every stored entity of cls
+        """
+        return self._objects(cls, "1", ())
+
+    def count(self, cls):
+        """
+        :return: Number of stored entities of cls
+        """
+        rows = self._execute(
+            "SELECT COUNT(*) FROM entities WHERE entity = ?", (cls.qbo_object_name,))
+
+        return rows[0][0]
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _custom_field_value(field):
+    for key in ("StringValue", "NumberValue", "DateValue", "BooleanValue"):
+        if field.get(key) is not None:
+            return str(field[key])
+
+    return None
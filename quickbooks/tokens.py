@@ -0,0 +1,333 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class TokenStore(object):
+    """
+    Persists OAuth2 tokens so they can be shared between processes. Subclasses implement
+    load and save; lock must serialize refreshes of the same key across every process
+    using the store.
+    """
+
+    def load(self, key):
+        """
+        :param key:
+        :return: dict with access_token, refresh_token and expires_at, or None
+        """
+        raise NotImplementedError
+
+    def save(self, key, token):
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, key):
+        yield
+
+
+class MemoryTokenStore(TokenStore):
+    """
+    Keeps tokens in memory, shared by every client of the current process.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def load(self, key):
+        token = self._tokens.get(key)
+        return dict(token) if token else None
+
+    def save(self, key, token):
+        self._tokens[key] = dict(token)
+
+    @contextmanager
+    def lock(self, key):
+        with self._guard:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            yield
+
+
+class FileTokenStore(TokenStore):
+    """
+    Keeps tokens as JSON files in a directory. Refreshes are serialized between processes
+    with an exclusive lock on a companion .lock file (POSIX only).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._thread_lock = threading.Lock()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, "{0}.json".format(key))
+
+    def load(self, key):
+        try:
+            with open(self._path(key)) as token_file:
+                return json.load(token_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, key, token):
+        # Write to a temporary file first so readers never see a partially written token
+        path = self._path(key)
+        temp_path = "{0}.{1}.tmp".format(path, os.getpid())
+
+        with open(temp_path, "w") as token_file:
+            json.dump(token, token_file)
+
+        os.replace(temp_path, path)
+
+    @contextmanager
+    def lock(self, key):
+        with self._thread_lock:
+            with open(self._path(key) + ".lock", "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SQLiteTokenStore(TokenStore):
+    """
+    Keeps tokens in a SQLite database. Refreshes are serialized between processes with an
+    immediate (write) transaction held for the duration of the refresh.
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+        connection = self._connect()
+        try:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tokens (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    @contextmanager
+    def _connection(self):
+        # Inside lock() the locking connection must be reused, any other one would wait for it
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            yield connection
+            return
+
+        connection = self._connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def load(self, key):
+        with self._connection() as connection:
+            row = connection.execute("SELECT data FROM tokens WHERE key = ?", (key,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def save(self, key, token):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO tokens (key, data) VALUES (?, ?)", (key, json.dumps(token)))
+
+    @contextmanager
+    def lock(self, key):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        self._local.connection = connection
+
+        try:
+            yield
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+        finally:
+            self._local.connection = None
+            connection.close()
+
+
+class RedisTokenStore(TokenStore):
+    """
+    Keeps tokens in Redis, or any client implementing the get, set and lock methods of
+    redis-py (e.g. fakeredis as a local stand-in).
+    """
+
+    def __init__(self, client, prefix="quickbooks:token:", lock_timeout=60):
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+
+    def load(self, key):
+        data = self.client.get(self.prefix + key)
+
+        if data is None:
+            return None
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+
+        return json.loads(data)
+
+    def save(self, key, token):
+        self.client.set(self.prefix + key, json.dumps(token))
+
+    @contextmanager
+    def lock(self, key):
+        with self.client.lock(self.prefix + key + ":lock", timeout=self.lock_timeout):
+            yield
+
+
+class TokenManager(object):
+    """
+    Keeps the OAuth2 access token of an AuthClient valid. Tokens are refreshed ahead of
+    their expiry (refresh_margin seconds), and can be persisted and shared between processes
+    through a TokenStore. Refreshes are serialized with the store lock; a process waiting for
+    the lock picks up the token refreshed by another one instead of refreshing again.
+    """
+
+    def __init__(self, auth_client, refresh_token=None, store=None, key=None, refresh_margin=300):
+        self.auth_client = auth_client
+        self.store = store
+        self.key = key or str(getattr(auth_client, "realm_id", None) or auth_client.client_id)
+        self.refresh_margin = refresh_margin
+
+        self.access_token = auth_client.access_token
+        self.refresh_token = refresh_token or getattr(auth_client, "refresh_token", None)
+        self.expires_at = None
+
+        self._lock = threading.Lock()
+        self._background_thread = None
+        self._stop_event = threading.Event()
+
+        if self.store is not None:
+            stored = self.store.load(self.key)
+            if stored:
+                self._set_token(stored)
+
+    def _set_token(self, token):
+        self.access_token = token["access_token"]
+        self.refresh_token = token.get("refresh_token") or self.refresh_token
+        self.expires_at = token.get("expires_at")
+
+        self.auth_client.access_token = self.access_token
+        self.auth_client.refresh_token = self.refresh_token
+
+    def _token_dict(self):
+        return {
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "expires_at": self.expires_at,
+        }
+
+    def needs_refresh(self):
+        """
+        :return: True if there is no access token or it expires within refresh_margin seconds.
+        A token without a known expiry is used until the API rejects it.
+        """
+        if self.access_token is None:
+            return True
+        if self.expires_at is None:
+            return False
+
+        return self.expires_at - time.time() <= self.refresh_margin
+
+    def get_access_token(self):
+        """
+        :return: Valid access token, refreshed first if it is about to expire
+        """
+        if self.needs_refresh():
+            self.refresh(stale_access_token=self.access_token)
+
+        return self.access_token
+
+    def refresh(self, stale_access_token=None):
+        """
+        Refreshes the access token, unless another thread or process already did.
+        :param stale_access_token: Token expired or rejected by the API. When the current token
+        differs and is still valid, it was already replaced and no refresh is made.
+        :return: Access token
+        """
+        with self._lock:
+            if stale_access_token is not None and stale_access_token != self.access_token \
+                    and not self.needs_refresh():
+                return self.access_token
+
+            if self.store is None:
+                self._refresh()
+                return self.access_token
+
+            with self.store.lock(self.key):
+                stored = self.store.load(self.key)
+
+                if stored and stored["access_token"] not in (self.access_token, stale_access_token):
+                    self._set_token(stored)
+
+                    if not self.needs_refresh():
+                        return self.access_token
+
+                self._refresh()
+                self.store.save(self.key, self._token_dict())
+
+            return self.access_token
+
+    def _refresh(self):
+        self.auth_client.refresh(refresh_token=self.refresh_token)
+
+        expires_in = getattr(self.auth_client, "expires_in", None)
+
+        self._set_token({
+            "access_token": self.auth_client.access_token,
+            "refresh_token": self.auth_client.refresh_token,
+            "expires_at": time.time() + int(expires_in) if expires_in else None,
+        })
+
+    def start_background_refresh(self, interval=60):
+        """
+        Starts a daemon thread checking the token every interval seconds and refreshing it
+        ahead of its expiry, so requests never wait on a refresh.
+        """
+        if self._background_thread is not None and self._background_thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._background_thread = threading.Thread(
+            target=self._background_refresh, args=(interval,), name="quickbooks-token-refresh")
+        self._background_thread.daemon = True
+        self._background_thread.start()
+
+    def stop_background_refresh(self):
+        self._stop_event.set()
+
+        if self._background_thread is not None:
+            self._background_thread.join()
+            self._background_thread = None
+
+    def _background_refresh(self, interval):
+        while not self._stop_event.wait(interval):
+            try:
+                self.get_access_token()
+            except Exception:
+                # The next request retries the refresh and reports the error
+                pass
@@ -0,0 +1,91 @@
+import socket
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+
+def keep_alive_socket_options(idle=60, interval=15, count=4):
+    """
+    Socket options enabling TCP keep-alive probes on pooled connections, so idle
+    connections to the QBO API are not silently dropped by NAT gateways or load balancers.
+    :param idle: Seconds of inactivity before the first probe is sent
+    :param interval: Seconds between probes
+    :param count: Number of failed probes before the connection is dropped
+    :return: List of socket option tuples
+    """
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval))
+    if hasattr(socket, "TCP_KEEPCNT"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count))
+
+    return options
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter keeping a pool of persistent (keep-alive) connections per host, so the TCP
+    and TLS handshakes are paid once per connection instead of once per request.
+    Tracks how many requests were served by an already open connection (hits) and how many
+    had to open a new one (misses).
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ["_keep_alive"]
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True):
+        self._keep_alive = keep_alive
+        self._stats_lock = threading.Lock()
+        self._closed_requests = 0
+        self._closed_connections = 0
+
+        super(PooledHTTPAdapter, self).__init__(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+
+    def __setstate__(self, state):
+        self._stats_lock = threading.Lock()
+        self._closed_requests = 0
+        self._closed_connections = 0
+
+        super(PooledHTTPAdapter, self).__setstate__(state)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self._keep_alive:
+            pool_kwargs.setdefault("socket_options", keep_alive_socket_options())
+
+        super(PooledHTTPAdapter, self).init_poolmanager(
+            connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pools.dispose_func = self._dispose_pool
+
+    def _dispose_pool(self, pool):
+        # Keep the counters of pools evicted from the pool manager
+        with self._stats_lock:
+            self._closed_requests += pool.num_requests
+            self._closed_connections += pool.num_connections
+
+        pool.close()
+
+    def stats(self):
+        """
+        :return: dict with the number of requests sent, connections opened, pool hits
+        (requests sent over a reused connection) and misses (requests needing a new connection)
+        """
+        with self._stats_lock:
+            request_count = self._closed_requests
+            connections = self._closed_connections
+
+            for key in self.poolmanager.pools.keys():
+                pool = self.poolmanager.pools.get(key)
+                if pool is not None:
+                    request_count += pool.num_requests
+                    connections += pool.num_connections
+
+        return {
+            "requests": request_count,
+            "connections": connections,
+            "hits": max(request_count - connections, 0),
+            "misses": connections,
+        }
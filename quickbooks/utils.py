@@ -1,6 +1,26 @@
 import six
 import sys
 
+from .exceptions import QuickbooksException
+
+
+def escape_string(value):
+    """
+    :param value: String put between single quotes in a query
+    :return: value with backslashes and single quotes escaped
+    """
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def check_field_name(field):
+    """
+    Raises QuickbooksException if field isn't a field name, like DocNumber or
+    MetaData.LastUpdatedTime
+    """
+    if not isinstance(field, six.string_types) or \
+            not all(part.isidentifier() for part in field.split('.')):
+        raise QuickbooksException("Invalid field name '{0}'".format(field))
+
 
 def build_where_clause(**kwargs):
     where_clause = ""
@@ -12,9 +32,9 @@ def build_where_clause(**kwargs):
             if isinstance(value, six.text_type) and sys.version_info[0] == 2:
                 # If using python 2, encode unicode as string.
                 encoded_value = value.encode('utf-8')
-                where.append("{0} = '{1}'".format(key, encoded_value.replace(r"'", r"\'")))
+                where.append("{0} = '{1}'".format(key, escape_string(encoded_value)))
             elif isinstance(value, six.string_types):
-                where.append("{0} = '{1}'".format(key, value.replace(r"'", r"\'")))
+                where.append("{0} = '{1}'".format(key, escape_string(value)))
             else:
                 where.append("{0} = {1}".format(key, value))
 
@@ -33,9 +53,9 @@ def build_choose_clause(choices, field):
             if isinstance(choice, six.text_type) and sys.version_info[0] == 2:
                 # If using python 2, encode unicode as string.
                 encoded_choice = choice.encode('utf-8')
-                where.append("'{0}'".format(encoded_choice.replace(r"'", r"\'")))
+                where.append("'{0}'".format(escape_string(encoded_choice)))
             elif isinstance(choice, six.string_types):
-                where.append("'{0}'".format(choice.replace(r"'", r"\'")))
+                where.append("'{0}'".format(escape_string(choice)))
             else:
                 where.append("{0}".format(choice))
 
@@ -43,3 +63,23 @@ def build_choose_clause(choices, field):
         where_clause = "{0} in ({1})".format(field, where_clause)
 
     return where_clause
+
+
+# Always selected, objects can't be saved without them
+REQUIRED_SELECT_FIELDS = ('Id', 'SyncToken')
+
+
+def build_select_fields(fields):
+    """
+    :param fields: Names of the fields to select, Id and SyncToken are added
+    :return: Select list of a projected query, like "Id, SyncToken, DocNumber"
+    """
+    select_fields = list(REQUIRED_SELECT_FIELDS)
+
+    for field in fields:
+        check_field_name(field)
+
+        if field not in select_fields:
+            select_fields.append(field)
+
+    return ", ".join(select_fields)
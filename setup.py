@@ -37,10 +37,15 @@ setup(
         'requests>=2.19.1',
         'simplejson>=3.17.0',
         'six>=1.14.0',
-        'python-dateutil',
+        'python-dateutil>=2.7.0',
         'pycparser==2.18'
     ],
 
+    extras_require={
+        'async': ['aiohttp>=3.7.3'],
+        'orjson': ['orjson>=3.0'],
+    },
+
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',
@@ -0,0 +1,213 @@
+import asyncio
+import unittest
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from quickbooks import client
+from quickbooks.cache import EntityCache
+from quickbooks.exceptions import QuickbooksException, ValidationException
+from quickbooks.objects.department import Department
+from quickbooks.retry import RetryPolicy
+
+if aiohttp is not None:
+    from quickbooks.async_client import AsyncQuickBooks, AsyncResponse
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class MockAuthClient(object):
+    def __init__(self):
+        self.client_id = "client_id"
+        self.client_secret = "client_secret"
+        self.access_token = "access_token"
+        self.environment = client.Environments.SANDBOX
+
+
+class MockAiohttpResponse(object):
+    def __init__(self, status, content, headers=None):
+        self.status = status
+        self.charset = "utf-8"
+        self.headers = headers or {}
+        self._content = content
+
+    async def read(self):
+        return self._content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class MockAiohttpSession(object):
+    closed = False
+
+    def __init__(self, status=200, content=b'{"QueryResponse": {}}'):
+        self.calls = []
+        self.response = MockAiohttpResponse(status, content)
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        return self.response
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncQuickBooksTest(unittest.TestCase):
+    def setUp(self):
+        self.http_session = MockAiohttpSession()
+        self.qb_client = AsyncQuickBooks(
+            auth_client=MockAuthClient(),
+            company_id="1234",
+            minorversion=54,
+            http_session=self.http_session,
+        )
+
+    def test_not_global(self):
+        client.QuickBooks.enable_global()
+        try:
+            global_client = client.QuickBooks()
+            self.assertIsNot(AsyncQuickBooks(company_id="1"), global_client)
+            self.assertNotEqual(global_client.company_id, "1")
+        finally:
+            client.QuickBooks.disable_global()
+
+    def test_process_request(self):
+        response = run(self.qb_client.process_request(
+            "POST", "https://example.com", headers={}, params={"minorversion": 54}, data="select"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"QueryResponse": {}})
+
+        method, url, kwargs = self.http_session.calls[0]
+        self.assertEqual(kwargs["headers"]["Authorization"], "Bearer access_token")
+        self.assertEqual(kwargs["params"], {"minorversion": "54"})
+        self.assertEqual(kwargs["data"], "select")
+
+    def test_query(self):
+        result = run(self.qb_client.query("SELECT * FROM Department"))
+
+        self.assertEqual(result, {"QueryResponse": {}})
+        method, url, kwargs = self.http_session.calls[0]
+        self.assertEqual(method, "POST")
+        self.assertEqual(url, "https://sandbox-quickbooks.api.intuit.com/v3/company/1234/query")
+
+    def test_make_request_fault(self):
+        self.http_session.response = MockAiohttpResponse(
+            400, b'{"Fault": {"Error": [{"Message": "message", "code": "2030"}]}}')
+
+        self.assertRaises(
+            ValidationException, run, self.qb_client.get_single_object("Department", 1))
+
+    def test_download_pdf(self):
+        self.http_session.response = MockAiohttpResponse(200, b"pdf content")
+
+        self.assertEqual(run(self.qb_client.download_pdf("Invoice", 1)), b"pdf content")
+
+    def test_retry_throttled_request(self):
+        throttled = MockAiohttpResponse(429, b'{}', headers={"Retry-After": "0"})
+        responses = [throttled, self.http_session.response]
+        self.http_session.request = lambda method, url, **kwargs: responses.pop(0)
+        self.qb_client.retry_policy = RetryPolicy()
+
+        self.assertEqual(run(self.qb_client.create_object("Customer", "{}")), {"QueryResponse": {}})
+        self.assertEqual(responses, [])
+
+    def test_close_shared_session(self):
+        run(self.qb_client.close())
+        self.assertFalse(self.http_session.closed)
+
+    def test_response_text(self):
+        self.assertEqual(AsyncResponse(200, b'{"a": 1}').text, '{"a": 1}')
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncMixinsTest(unittest.TestCase):
+    def setUp(self):
+        self.qb_client = AsyncQuickBooks(auth_client=MockAuthClient(), company_id="1234")
+
+    def test_requires_async_client(self):
+        self.assertRaises(QuickbooksException, run, Department.get_async(1, qb=client.QuickBooks()))
+
+    def test_get_async(self):
+        async def get_single_object(qbbo, pk):
+            return {"Department": {"Id": str(pk), "Name": "Sales"}}
+
+        with patch.object(self.qb_client, 'get_single_object', side_effect=get_single_object):
+            department = run(Department.get_async(7, qb=self.qb_client))
+
+        self.assertEqual(department.Id, "7")
+        self.assertEqual(department.Name, "Sales")
+
+    def test_where_async(self):
+        async def query(select):
+            self.assertEqual(
+                select, "SELECT * FROM Department WHERE Active=True STARTPOSITION 1 MAXRESULTS 10")
+            return {"QueryResponse": {"Department": [{"Id": "1"}, {"Id": "2"}]}}
+
+        with patch.object(self.qb_client, 'query', side_effect=query):
+            departments = run(Department.where_async(
+                "Active=True", start_position=1, max_results=10, qb=self.qb_client))
+
+        self.assertEqual([d.Id for d in departments], ["1", "2"])
+
+    def test_count_async(self):
+        async def query(select):
+            self.assertEqual(select, "SELECT COUNT(*) FROM Department WHERE Active=True")
+            return {"QueryResponse": {"totalCount": 5}}
+
+        with patch.object(self.qb_client, 'query', side_effect=query):
+            self.assertEqual(run(Department.count_async("Active=True", qb=self.qb_client)), 5)
+
+    def test_save_async(self):
+        async def create_object(qbbo, request_body):
+            return {"Department": {"Id": "9", "Name": "New"}}
+
+        department = Department()
+        with patch.object(self.qb_client, 'create_object', side_effect=create_object):
+            saved = run(department.save_async(qb=self.qb_client))
+
+        self.assertEqual(saved.Id, "9")
+        self.assertEqual(department.Id, "9")
+
+    def test_get_async_skips_entity_cache(self):
+        cache = EntityCache()
+        qb = AsyncQuickBooks(auth_client=MockAuthClient(), company_id="1234", entity_cache=cache)
+        cache.set(qb, "Department", 7, {"Department": {"Id": "7", "Name": "Cached"}})
+
+        async def get(url, params):
+            self.assertTrue(url.endswith("/company/1234/department/7/"))
+            return {"Department": {"Id": "7", "Name": "Sales"}}
+
+        with patch.object(qb, 'get', side_effect=get):
+            department = run(Department.get_async(7, qb=qb))
+
+        self.assertEqual(department.Name, "Sales")
+
+    def test_save_async_invalidates_cache(self):
+        cache = EntityCache()
+        qb = AsyncQuickBooks(auth_client=MockAuthClient(), company_id="1234", entity_cache=cache)
+        cache.set(qb, "Department", 7, {"Department": {"Id": "7", "Name": "Cached"}})
+
+        async def update_object(qbbo, request_body):
+            return {"Department": {"Id": "7", "Name": "Sales"}}
+
+        department = Department.from_json({"Id": "7", "SyncToken": "0", "Name": "Sales"})
+        with patch.object(qb, 'update_object', side_effect=update_object):
+            run(department.save_async(qb=qb))
+
+        self.assertEqual(cache.get(qb, "Department", 7), None)
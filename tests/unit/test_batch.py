@@ -1,3 +1,6 @@
+import json
+import threading
+import time
 import unittest
 try:
     from mock import patch
@@ -5,7 +8,11 @@ except ImportError:
     from unittest.mock import patch
 from quickbooks import batch, client
 from quickbooks.objects.customer import Customer
+from quickbooks.objects.invoice import Invoice
+from quickbooks.objects.item import Item
 from quickbooks.exceptions import QuickbooksException
+from quickbooks.mixins import partial_class
+from quickbooks.retry import BatchRetryPolicy
 
 
 class BatchTests(unittest.TestCase):
@@ -43,6 +50,199 @@ class BatchTests(unittest.TestCase):
         batch.batch_delete(self.obj_list)
         self.assertTrue(process_batch.called)
 
+    def test_save_chunks(self):
+        # Equal objects are distinct items of the batch
+        obj_list = [Customer() for _ in range(65)]
+        batch_mgr = batch.BatchManager("create", max_request_items=30)
+
+        def process_batch(obj_list, qb=None):
+            response = batch.BatchResponse()
+            response.original_list = obj_list
+            return response
+
+        with patch.object(batch_mgr, 'process_batch', side_effect=process_batch) as mock:
+            results = batch_mgr.save(obj_list)
+
+        self.assertEqual([len(call[0][0]) for call in mock.call_args_list], [30, 30, 5])
+        self.assertEqual([id(obj) for obj in results.original_list], [id(obj) for obj in obj_list])
+
+    def test_save_concurrent(self):
+        obj_list = [Customer.from_json({"Id": str(i), "SyncToken": "0", "DisplayName": str(i)})
+                    for i in range(100)]
+        lock = threading.Lock()
+        in_flight = []
+        max_in_flight = []
+
+        def batch_operation(request_body):
+            items = json.loads(request_body)["BatchItemRequest"]
+
+            with lock:
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+
+            # Later batches answer first
+            time.sleep(0.05 if items[0]["Customer"]["Id"] == "0" else 0.01)
+
+            with lock:
+                in_flight.pop()
+
+            return {"BatchItemResponse": [
+                {"bId": item["bId"], "Customer": item["Customer"]} for item in items]}
+
+        with patch.object(self.qb, 'batch_operation', side_effect=batch_operation) as mock:
+            results = batch.batch_update(obj_list, qb=self.qb, max_workers=3)
+
+        self.assertEqual(mock.call_count, 4)
+        self.assertEqual(max(max_in_flight), 3)
+        self.assertEqual([obj.Id for obj in results.successes], [str(i) for i in range(100)])
+        self.assertEqual([id(obj) for obj in results.original_list], [id(obj) for obj in obj_list])
+
+    def test_save_concurrent_error(self):
+        obj_list = [Customer() for _ in range(100)]
+
+        error = QuickbooksException("Unavailable")
+        with patch.object(self.qb, 'batch_operation', side_effect=error) as mock:
+            self.assertRaises(
+                QuickbooksException, batch.batch_create, obj_list, qb=self.qb, max_workers=2)
+
+        self.assertLessEqual(mock.call_count, 2)
+
+    def test_max_workers(self):
+        self.assertEqual(batch.BatchManager("create", max_workers=50)._max_workers, 10)
+        self.assertEqual(batch.BatchManager("create", max_workers=0)._max_workers, 1)
+
+    def echo(self, request_body):
+        items = json.loads(request_body)["BatchItemRequest"]
+        return {"BatchItemResponse": [
+            {"bId": item["bId"], "Customer": item["Customer"]} for item in items]}
+
+    def test_iter_save(self):
+        read = []
+
+        def customers():
+            for i in range(65):
+                read.append(i)
+                yield Customer.from_json({"Id": str(i), "SyncToken": "0", "DisplayName": str(i)})
+
+        with patch.object(self.qb, 'batch_operation', side_effect=self.echo):
+            results = batch.batch_update_iter(customers(), qb=self.qb)
+
+            first = next(results)
+            # Only the objects of the first request have been read
+            self.assertEqual(len(read), 30)
+            self.assertEqual([obj.Id for obj in first.successes], [str(i) for i in range(30)])
+
+            self.assertEqual([len(result.successes) for result in results], [30, 5])
+
+    def test_save_callback(self):
+        obj_list = [Customer.from_json({"Id": str(i), "DisplayName": str(i)}) for i in range(40)]
+        chunks = []
+
+        with patch.object(self.qb, 'batch_operation', side_effect=self.echo):
+            results = batch.BatchManager("create").save(
+                obj_list, qb=self.qb, callback=lambda result: chunks.append(len(result.successes)))
+
+        self.assertEqual(chunks, [30, 10])
+        self.assertEqual(len(results.successes), 40)
+
+    def fault(self, code):
+        return {"type": "ValidationFault", "Error": [{"Message": "Error", "code": code}]}
+
+    def test_retry_faults(self):
+        obj_list = [Customer.from_json({"Id": str(i), "SyncToken": "0", "DisplayName": str(i)})
+                    for i in range(1, 6)]
+        requests = []
+
+        def batch_operation(request_body):
+            items = json.loads(request_body)["BatchItemRequest"]
+            requests.append([item["Customer"]["Id"] for item in items])
+            responses = []
+
+            for item in items:
+                customer = item["Customer"]
+                code = {"2": "5010", "3": "3001", "4": "6240", "5": "5010"}.get(customer["Id"])
+
+                if len(requests) > 1 and customer["Id"] in ("2", "3"):
+                    code = None if customer["SyncToken"] == "7" or customer["Id"] == "3" else "5010"
+
+                if code:
+                    responses.append({"bId": item["bId"], "Fault": self.fault(code)})
+                else:
+                    responses.append({"bId": item["bId"], "Customer": customer})
+
+            # QBO doesn't keep the order of the requests
+            return {"BatchItemResponse": list(reversed(responses))}
+
+        def query(select):
+            # Customer 5 was deleted
+            return {"QueryResponse": {"Customer": [{"Id": "2", "SyncToken": "7"}]}}
+
+        with patch.object(self.qb, 'batch_operation', side_effect=batch_operation):
+            with patch.object(self.qb, 'query', side_effect=query) as mock_query:
+                with patch('quickbooks.batch.time.sleep') as sleep:
+                    results = batch.batch_update(
+                        obj_list, qb=self.qb, retry_policy=BatchRetryPolicy(jitter=False))
+
+        self.assertEqual(requests, [["1", "2", "3", "4", "5"], ["2", "3"]])
+        self.assertEqual(mock_query.call_count, 1)
+        self.assertIn("Id in ('2', '5')", mock_query.call_args[0][0])
+        sleep.assert_called_once_with(0.5)
+
+        self.assertEqual([obj.Id for obj in results.successes], ["1", "2", "3"])
+        self.assertEqual([fault.original_object.Id for fault in results.faults], ["4", "5"])
+        self.assertEqual([item.get_object().Id for item in results.batch_responses],
+                         ["1", "2", "3", "4", "5"])
+        self.assertEqual(obj_list[1].SyncToken, "7")
+
+    def test_retry_max_retries(self):
+        obj_list = [Customer.from_json({"Id": "1", "SyncToken": "0"})]
+
+        def batch_operation(request_body):
+            items = json.loads(request_body)["BatchItemRequest"]
+            return {"BatchItemResponse": [
+                {"bId": item["bId"], "Fault": self.fault("3001")} for item in items]}
+
+        with patch.object(self.qb, 'batch_operation', side_effect=batch_operation) as mock:
+            with patch('quickbooks.batch.time.sleep'):
+                results = batch.batch_update(
+                    obj_list, qb=self.qb, retry_policy=BatchRetryPolicy(max_retries=2))
+
+        self.assertEqual(mock.call_count, 3)
+        self.assertEqual(len(results.faults), 1)
+        self.assertEqual(results.successes, [])
+
+    def test_retry_create_transient(self):
+        obj_list = [Customer.from_json({"DisplayName": "1"})]
+
+        def batch_operation(request_body):
+            items = json.loads(request_body)["BatchItemRequest"]
+            fault = {"type": "SystemFault", "Error": [{"Message": "Error", "code": "10000"}]}
+            return {"BatchItemResponse": [{"bId": item["bId"], "Fault": fault} for item in items]}
+
+        with patch.object(self.qb, 'batch_operation', side_effect=batch_operation) as mock:
+            with patch('quickbooks.batch.time.sleep'):
+                results = batch.batch_create(obj_list, qb=self.qb, retry_policy=BatchRetryPolicy())
+
+        # QBO may have created the customer, sending it again could create a duplicate
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(len(results.faults), 1)
+
+    def test_retry_missing_response(self):
+        obj_list = [Customer.from_json({"Id": "1", "SyncToken": "0"}),
+                    Customer.from_json({"Id": "2", "SyncToken": "0"})]
+
+        def batch_operation(request_body):
+            item = json.loads(request_body)["BatchItemRequest"][0]
+            return {"BatchItemResponse": [{"bId": item["bId"], "Fault": self.fault("3001")}]}
+
+        with patch.object(self.qb, 'batch_operation', side_effect=batch_operation):
+            with patch('quickbooks.batch.time.sleep'):
+                results = batch.batch_update(
+                    obj_list, qb=self.qb, retry_policy=BatchRetryPolicy(max_retries=1))
+
+        self.assertEqual([item.get_object().Id for item in results.batch_responses], ["1"])
+        self.assertEqual(len(results.faults), 1)
+
     def test_list_to_batch_request(self):
         batch_mgr = batch.BatchManager("create")
 
@@ -74,3 +274,129 @@ class BatchTests(unittest.TestCase):
 
         self.assertEquals(len(results.faults), 1)
         self.assertEquals(len(results.successes), 1)
+
+    def test_list_to_batch_request_sparse(self):
+        batch_mgr = batch.BatchManager("update", sparse=True)
+
+        customer = Customer.from_json({"Id": "1", "SyncToken": "0", "DisplayName": "Name"})
+        customer.DisplayName = "New name"
+
+        batch_request = batch_mgr.list_to_batch_request([customer])
+        batch_item = batch_request.BatchItemRequest[0]
+
+        self.assertEqual(batch_item.Customer,
+                         {"Id": "1", "SyncToken": "0", "sparse": True, "DisplayName": "New name"})
+        self.assertEqual(batch_item.get_object(), customer)
+        self.assertIn(
+            '"Customer":{"Id":"1","SyncToken":"0","sparse":true,"DisplayName":"New name"}',
+            batch_request.to_compact_json())
+
+    def test_list_to_batch_request_sparse_attribute(self):
+        customer = Customer.from_json({"Id": "1", "SyncToken": "0", "DisplayName": "Name"})
+        customer.sparse = True
+
+        batch_request = batch.BatchManager("update").list_to_batch_request([customer])
+        batch_item = batch_request.BatchItemRequest[0]
+
+        # The whole object, with the sparse flag
+        self.assertIs(batch_item.Customer, customer)
+
+    def test_list_to_batch_request_partial(self):
+        customer = partial_class(Customer).from_json(
+            {"Id": "1", "SyncToken": "0", "DisplayName": "Name"})
+
+        self.assertRaises(QuickbooksException,
+                          batch.BatchManager("update").list_to_batch_request, [customer])
+        batch.BatchManager("update", sparse=True).list_to_batch_request([customer])
+
+
+class BatchBuilderTests(unittest.TestCase):
+    def setUp(self):
+        self.qb = client.QuickBooks(company_id="company_id")
+
+    def respond(self, request_body):
+        responses = []
+
+        for item in json.loads(request_body)["BatchItemRequest"]:
+            if "Query" in item:
+                ids = ["1", "2"] if "Active = true" in item["Query"] else ["3"]
+                items = [{"Id": id} for id in ids]
+                responses.append({"bId": item["bId"], "QueryResponse": {"Item": items}})
+            elif item["operation"] == "delete":
+                deleted = {"Id": item["Customer"]["Id"], "status": "Deleted"}
+                responses.append({"bId": item["bId"], "Customer": deleted})
+            elif "Invoice" in item:
+                responses.append({"bId": item["bId"], "Invoice": dict(item["Invoice"], Id="10")})
+            else:
+                error = {"Message": "Stale Object Error", "code": "5010"}
+                responses.append(
+                    {"bId": item["bId"], "Fault": {"type": "ValidationFault", "Error": [error]}})
+
+        # QBO doesn't keep the order of the requests
+        return {"BatchItemResponse": list(reversed(responses))}
+
+    def test_mixed_batch(self):
+        builder = batch.BatchBuilder()
+        invoice = Invoice()
+        invoice.DocNumber = "1001"
+        customer = Customer.from_json({"Id": "5", "SyncToken": "0", "DisplayName": "Name"})
+        customer.DisplayName = "New name"
+        deleted = Customer.from_json({"Id": "6", "SyncToken": "0"})
+
+        created = builder.create(invoice)
+        updated = builder.update(customer, sparse=True)
+        items = builder.query(Item, "Active = true", max_results=1000)
+        removed = builder.delete(deleted)
+
+        with patch.object(self.qb, 'batch_operation', side_effect=self.respond) as batch_operation:
+            results = builder.send(qb=self.qb)
+
+        self.assertEqual(batch_operation.call_count, 1)
+        request = json.loads(batch_operation.call_args[0][0])["BatchItemRequest"]
+        self.assertEqual([item.get("operation") for item in request],
+                         ["create", "update", None, "delete"])
+        self.assertEqual(request[1]["Customer"],
+                         {"Id": "5", "SyncToken": "0", "sparse": True, "DisplayName": "New name"})
+        self.assertEqual(request[2]["Query"],
+                         "SELECT * FROM Item WHERE Active = true MAXRESULTS 1000")
+
+        self.assertEqual(results, [created, updated, items, removed])
+        self.assertIsInstance(created.result, Invoice)
+        self.assertEqual(created.result.Id, "10")
+        self.assertTrue(updated.failed)
+        self.assertEqual(updated.fault.Error[0].code, "5010")
+        self.assertIs(updated.fault.original_object, customer)
+        self.assertEqual([item.Id for item in items.result], ["1", "2"])
+        self.assertIsInstance(items.result[0], Item)
+        self.assertEqual(removed.result.status, "Deleted")
+
+    def test_packing(self):
+        builder = batch.BatchBuilder(max_request_items=30)
+        query_set = Item.objects.filter(Id__in=[str(i) for i in range(300)])
+
+        for _ in range(40):
+            builder.create(Invoice())
+        split = builder.query(query_set)
+
+        self.assertEqual(len(builder), 42)
+
+        with patch.object(self.qb, 'batch_operation', side_effect=self.respond) as batch_operation:
+            builder.send(qb=self.qb)
+
+        sizes = [len(json.loads(call[0][0])["BatchItemRequest"])
+                 for call in batch_operation.call_args_list]
+        self.assertEqual(sizes, [30, 12])
+        # Results of the two statements, in order
+        self.assertEqual([item.Id for item in split.result], ["3", "3"])
+        self.assertEqual(len(split.original), 2)
+
+    def test_invalidate_cache(self):
+        builder = batch.BatchBuilder()
+        builder.delete(Customer.from_json({"Id": "6", "SyncToken": "0"}))
+        builder.create(Invoice())
+
+        with patch.object(self.qb, 'batch_operation', side_effect=self.respond):
+            with patch.object(self.qb, 'invalidate_cache') as invalidate_cache:
+                builder.send(qb=self.qb)
+
+        invalidate_cache.assert_called_once_with("Customer", "6")
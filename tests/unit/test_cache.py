@@ -0,0 +1,184 @@
+import unittest
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from quickbooks import client
+from quickbooks.cache import EntityCache, MemoryCache, RedisCache, REFERENCE_TTL
+from quickbooks.objects.attachable import Attachable
+from quickbooks.objects.customer import Customer
+from quickbooks.objects.taxservice import TaxService
+from quickbooks.objects.term import Term
+
+
+class MemoryCacheTest(unittest.TestCase):
+    def test_get_set(self):
+        cache = MemoryCache()
+        cache.set("key", "value", 60)
+
+        self.assertEqual(cache.get("key"), "value")
+        self.assertEqual(cache.get("missing"), None)
+
+    def test_expired(self):
+        cache = MemoryCache()
+
+        with patch('quickbooks.cache.time.monotonic', return_value=100):
+            cache.set("key", "value", 60)
+        with patch('quickbooks.cache.time.monotonic', return_value=161):
+            self.assertEqual(cache.get("key"), None)
+
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_evicted(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", "1", 60)
+        cache.set("b", "2", 60)
+        cache.get("a")
+        cache.set("c", "3", 60)
+
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("c"), "3")
+
+    def test_delete_clear(self):
+        cache = MemoryCache()
+        cache.set("a", "1", 60)
+        cache.set("b", "2", 60)
+        cache.delete("a")
+
+        self.assertEqual(cache.get("a"), None)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class FakeRedis(object):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8")
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, pattern):
+        return [key for key in list(self.data) if key.startswith(pattern.rstrip("*"))]
+
+
+class RedisCacheTest(unittest.TestCase):
+    def test_get_set(self):
+        redis = FakeRedis()
+        cache = RedisCache(redis)
+        cache.set("key", "value", 60)
+
+        self.assertEqual(redis.data, {"quickbooks:cache:key": b"value"})
+        self.assertEqual(cache.get("key"), "value")
+
+        cache.clear()
+        self.assertEqual(cache.get("key"), None)
+
+
+class EntityCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = EntityCache()
+        self.qb = client.QuickBooks(company_id="1234", entity_cache=self.cache)
+
+    def customer_response(self, sync_token="0"):
+        return {"Customer": {"Id": "5", "SyncToken": sync_token, "DisplayName": "Customer"},
+                "time": "now"}
+
+    def test_read_through(self):
+        with patch.object(self.qb, 'get', return_value=self.customer_response()) as get:
+            first = Customer.get(5, qb=self.qb)
+            second = Customer.get(5, qb=self.qb)
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(second.DisplayName, "Customer")
+        self.assertIsNot(first, second)
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "stale": 0})
+
+    def test_cached_json_not_shared(self):
+        with patch.object(self.qb, 'get', return_value=self.customer_response()):
+            Customer.get(5, qb=self.qb).DisplayName = "Changed"
+
+            self.assertEqual(Customer.get(5, qb=self.qb).DisplayName, "Customer")
+
+    def test_keyed_by_realm(self):
+        other_qb = client.QuickBooks(company_id="5678", entity_cache=self.cache)
+
+        with patch.object(self.qb, 'get', return_value=self.customer_response()):
+            Customer.get(5, qb=self.qb)
+
+        self.assertEqual(self.cache.get(other_qb, "Customer", 5), None)
+        self.assertNotEqual(self.cache.get(self.qb, "Customer", 5), None)
+
+    def test_use_cache_false(self):
+        with patch.object(self.qb, 'get', return_value=self.customer_response()) as get:
+            Customer.get(5, qb=self.qb)
+            Customer.get(5, qb=self.qb, use_cache=False)
+
+        self.assertEqual(get.call_count, 2)
+
+    def test_ttls(self):
+        cache = EntityCache(ttl=60, ttls={"Customer": 0})
+
+        self.assertEqual(cache.ttl_for("Invoice"), 60)
+        self.assertEqual(cache.ttl_for("Term"), REFERENCE_TTL)
+
+        cache.set(self.qb, "Customer", 5, self.customer_response())
+        self.assertEqual(cache.get(self.qb, "Customer", 5), None)
+
+    def test_invalidated_on_save(self):
+        with patch.object(self.qb, 'get', return_value=self.customer_response()) as get:
+            customer = Customer.get(5, qb=self.qb)
+
+            with patch.object(self.qb, 'update_object', return_value=self.customer_response("1")):
+                customer.save(qb=self.qb)
+
+            Customer.get(5, qb=self.qb)
+            self.assertEqual(get.call_count, 2)
+
+    def test_invalidated_on_overridden_save(self):
+        attachable = Attachable()
+        attachable.Id = "7"
+        tax_service = TaxService()
+        tax_service.TaxCodeId = 8
+
+        with patch.object(self.qb, 'invalidate_cache') as invalidate_cache:
+            with patch.object(self.qb, 'update_object', side_effect=Exception("failed")):
+                self.assertRaises(Exception, attachable.save, qb=self.qb)
+                self.assertRaises(Exception, tax_service.save, qb=self.qb)
+
+        self.assertEqual([call[0] for call in invalidate_cache.call_args_list],
+                         [("Attachable", "7"), ("TaxService/Taxcode", 8)])
+
+    def test_validate_sync_token(self):
+        self.cache.validate_sync_token = True
+        sync_token = {"QueryResponse": {"Customer": [{"Id": "5", "SyncToken": "0"}]}}
+
+        with patch.object(self.qb, 'get', return_value=self.customer_response()) as get:
+            with patch.object(self.qb, 'query', return_value=sync_token) as query:
+                Customer.get(5, qb=self.qb)
+                Customer.get(5, qb=self.qb)
+
+                query.assert_called_once_with("SELECT Id, SyncToken FROM Customer WHERE Id = '5'")
+                self.assertEqual(get.call_count, 1)
+
+                sync_token["QueryResponse"]["Customer"][0]["SyncToken"] = "1"
+                Customer.get(5, qb=self.qb)
+
+            self.assertEqual(get.call_count, 2)
+            self.assertEqual(self.cache.stats()["stale"], 1)
+
+    def test_reference_data(self):
+        term = {"Term": {"Id": "3", "Name": "Net 30"}}
+        with patch.object(self.qb, 'get', return_value=term) as get:
+            for _ in range(3):
+                Term.get(3, qb=self.qb)
+
+        self.assertEqual(get.call_count, 1)
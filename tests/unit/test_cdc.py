@@ -3,10 +3,14 @@ try:
 	from mock import patch
 except ImportError:
 	from unittest.mock import patch
-from quickbooks.cdc import change_data_capture
+from quickbooks.cdc import change_data_capture, fetch_changes, merge_changes, iter_changes, \
+	ChangeFeed, ChangeOperation, TruncatedChangesWarning
 from quickbooks.objects import Invoice, Customer
 from quickbooks import QuickBooks
-from datetime import datetime
+import re
+import warnings
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import isoparse
 
 class ChangeDataCaptureTest(unittest.TestCase):
 
@@ -107,3 +111,183 @@ class ChangeDataCaptureTest(unittest.TestCase):
 
 		self.assertFalse(hasattr(cdc_response, 'Customer'))
 		self.assertFalse(hasattr(cdc_response, 'Invoice'))
+
+
+class TruncatedChangeDataCaptureTest(unittest.TestCase):
+	def setUp(self):
+		self.qb_client = QuickBooks(company_id="company_id")
+
+		# 2500 invoices updated a minute apart from 2020-01-01T00:00:00Z, invoice 3 deleted
+		start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+		self.invoices = [self.invoice(i, start + timedelta(minutes=i)) for i in range(2500)]
+		self.deleted = {
+			"Id": "3", "status": "Deleted",
+			"MetaData": {"LastUpdatedTime": "2020-01-05T00:00:00+00:00"},
+		}
+
+	def invoice(self, id, last_updated):
+		meta_data = {"LastUpdatedTime": last_updated.isoformat()}
+		return {"Id": str(id), "SyncToken": "0", "MetaData": meta_data}
+
+	def cdc(self, entities, changed_since):
+		invoices = self.invoices[:999] + [self.deleted]
+		return {
+			"CDCResponse": [{"QueryResponse": [{"Invoice": invoices}]}],
+			"time": "2020-01-03T00:00:00+00:00",
+		}
+
+	def query(self, select):
+		start, end = re.findall(r"LastUpdatedTime [<>]=? '([^']+)'", select)
+		start, end = isoparse(start), isoparse(end)
+		matching = [
+			item for item in self.invoices
+			if start <= isoparse(item["MetaData"]["LastUpdatedTime"]) < end]
+
+		if select.startswith("SELECT COUNT(*)"):
+			return {"QueryResponse": {"totalCount": len(matching)}}
+
+		position = int(re.search(r"STARTPOSITION (\d+)", select).group(1))
+		page_size = int(re.search(r"MAXRESULTS (\d+)", select).group(1))
+		return {"QueryResponse": {"Invoice": matching[position - 1:position - 1 + page_size]}}
+
+	def test_fetch_changes_truncated(self):
+		with patch.object(self.qb_client, 'change_data_capture', side_effect=self.cdc):
+			with patch.object(self.qb_client, 'query', side_effect=self.query) as query:
+				time, changes, truncated = fetch_changes(
+					[Invoice], "2020-01-01T00:00:00+00:00", qb=self.qb_client, max_workers=2)
+
+		invoices = changes["Invoice"]
+		self.assertEqual(truncated, ["Invoice"])
+		self.assertEqual(len(invoices), 2500)
+		self.assertEqual(len(set(invoice["Id"] for invoice in invoices)), 2500)
+		self.assertEqual([invoice for invoice in invoices if invoice["Id"] == "3"], [self.deleted])
+
+		counts = [call[0][0] for call in query.call_args_list if call[0][0].startswith("SELECT COUNT(*)")]
+		# 2 days holding 2500 invoices: 1 window, then halves (1440, 1060), then quarters
+		self.assertEqual(len(counts), 7)
+
+	def test_change_data_capture_truncated(self):
+		with patch.object(self.qb_client, 'change_data_capture', side_effect=self.cdc):
+			with patch.object(self.qb_client, 'query', side_effect=self.query):
+				with warnings.catch_warnings(record=True) as caught:
+					warnings.simplefilter("always")
+					cdc_response = change_data_capture([Invoice], "2020-01-01T00:00:00+00:00", qb=self.qb_client)
+
+		self.assertEqual(len(cdc_response.Invoice), 2500)
+		self.assertEqual(cdc_response.truncated, ["Invoice"])
+		self.assertEqual([warning.category for warning in caught], [TruncatedChangesWarning])
+
+	def test_iter_changes_truncated(self):
+		with patch.object(self.qb_client, 'change_data_capture', side_effect=self.cdc):
+			with patch.object(self.qb_client, 'query', side_effect=self.query):
+				with self.assertWarns(TruncatedChangesWarning):
+					events = list(iter_changes([Invoice], "2020-01-01T00:00:00+00:00", qb=self.qb_client))
+
+		self.assertEqual(len(events), 2500)
+
+	def test_not_truncated(self):
+		response = {
+			"CDCResponse": [{"QueryResponse": [{"Invoice": self.invoices[:10]}]}],
+			"time": "2020-01-03",
+		}
+
+		with patch.object(self.qb_client, 'change_data_capture', return_value=response):
+			with patch.object(self.qb_client, 'query') as query:
+				time, changes, truncated = fetch_changes(
+					[Invoice], "2020-01-01T00:00:00+00:00", qb=self.qb_client)
+
+		self.assertEqual(len(changes["Invoice"]), 10)
+		self.assertEqual(truncated, [])
+		self.assertFalse(query.called)
+
+	def test_merge_changes(self):
+		old = {"Id": "1", "SyncToken": "0", "MetaData": {"LastUpdatedTime": "2020-01-01T00:00:00-08:00"}}
+		new = {"Id": "1", "SyncToken": "1", "MetaData": {"LastUpdatedTime": "2020-01-01T09:00:00+00:00"}}
+		other = {"Id": "2", "MetaData": {"LastUpdatedTime": "2020-01-01T00:00:00+00:00"}}
+
+		self.assertEqual(merge_changes([new, other], [old]), [new, other])
+		self.assertEqual(merge_changes([old], [new]), [new])
+
+
+class ChangeEventsTest(unittest.TestCase):
+	def setUp(self):
+		self.qb_client = QuickBooks(company_id="company_id")
+
+		self.response = {
+			"CDCResponse": [{"QueryResponse": [
+				{"Invoice": [
+					{"Id": "1", "SyncToken": "2", "MetaData": {"LastUpdatedTime": "2020-01-01T10:00:00+00:00"}},
+					{"Id": "2", "status": "Deleted", "MetaData": {"LastUpdatedTime": "2020-01-01T08:00:00+00:00"}},
+				]},
+				{"Customer": [
+					{"Id": "5", "SyncToken": "0", "DisplayName": "New",
+					 "MetaData": {"LastUpdatedTime": "2020-01-01T09:00:00+00:00"}},
+				]},
+			]}],
+			"time": "2020-01-01T12:00:00+00:00"
+		}
+
+	def test_iter_changes(self):
+		with patch.object(self.qb_client, 'change_data_capture', return_value=self.response):
+			events = list(iter_changes([Invoice, Customer], "2020-01-01T00:00:00+00:00", qb=self.qb_client))
+
+		self.assertEqual([(event.entity_type, event.operation, event.object.Id) for event in events], [
+			("Invoice", ChangeOperation.DELETE, "2"),
+			("Customer", ChangeOperation.CREATE, "5"),
+			("Invoice", ChangeOperation.UPDATE, "1"),
+		])
+		self.assertIsInstance(events[0].object, Invoice)
+		self.assertEqual(events[0].object.status, "Deleted")
+		self.assertEqual(events[1].object.DisplayName, "New")
+
+	def test_feed_poll(self):
+		feed = ChangeFeed([Invoice, Customer], "2020-01-01T00:00:00+00:00", qb=self.qb_client)
+
+		with patch.object(self.qb_client, 'change_data_capture', return_value=self.response) as cdc:
+			events = feed.poll()
+			next(events)
+			# since is only moved once every event is consumed
+			self.assertEqual(feed.since, "2020-01-01T00:00:00+00:00")
+
+			self.assertEqual(len(list(events)), 2)
+			self.assertEqual(feed.since, "2020-01-01T12:00:00+00:00")
+
+			list(feed.poll())
+
+		self.assertEqual(cdc.call_args[0][1], "2020-01-01T12:00:00+00:00")
+
+	def test_feed_start(self):
+		feed = ChangeFeed(
+			[Invoice, Customer], "2020-01-01T00:00:00+00:00", qb=self.qb_client, interval=60)
+		events = []
+		errors = []
+
+		def callback(event):
+			events.append(event)
+			if len(events) == 3:
+				feed._stop_event.set()
+
+		with patch.object(self.qb_client, 'change_data_capture', return_value=self.response):
+			feed.start(callback, on_error=errors.append)
+			feed._thread.join(5)
+			feed.stop()
+
+		self.assertEqual(len(events), 3)
+		self.assertEqual(errors, [])
+		self.assertIsNone(feed._thread)
+
+	def test_feed_error(self):
+		feed = ChangeFeed([Invoice], "2020-01-01T00:00:00+00:00", qb=self.qb_client, interval=60)
+		errors = []
+
+		def fail(*args):
+			feed._stop_event.set()
+			raise Exception("Unavailable")
+
+		with patch.object(self.qb_client, 'change_data_capture', side_effect=fail):
+			feed.start(lambda event: None, on_error=errors.append)
+			feed._thread.join(5)
+			feed.stop()
+
+		self.assertEqual([str(error) for error in errors], ["Unavailable"])
+		self.assertEqual(feed.since, "2020-01-01T00:00:00+00:00")
@@ -245,8 +245,9 @@ class MockResponse(object):
     def json(self):
         return "{}"
 
+    @property
     def content(self):
-        return ''
+        return b'{}'
 
 
 class MockUnauthorizedResponse(object):
@@ -0,0 +1,92 @@
+import math
+import unittest
+from decimal import Decimal
+
+from quickbooks import codec
+from quickbooks.exceptions import QuickbooksException
+from quickbooks.mixins import json_default
+from quickbooks.objects import Department
+
+
+class CodecTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = codec.get_backend()
+
+    def tearDown(self):
+        codec.set_backend(*self.backend)
+
+    def test_loads_every_decoder(self):
+        document = (b'{"QueryResponse": {"Invoice": '
+                    b'[{"Id": "1", "TotalAmt": 10.5, "Name": "caf\\u00e9"}]}}')
+        expected = {"QueryResponse": {"Invoice": [{"Id": "1", "TotalAmt": 10.5, "Name": u"café"}]}}
+
+        for name in codec.DECODERS:
+            codec.set_backend(decoder=name)
+            self.assertEqual(codec.loads(document), expected, name)
+            self.assertEqual(codec.loads(document.decode("utf-8")), expected, name)
+
+    def test_loads_falls_back_to_json(self):
+        for name in codec.DECODERS:
+            codec.set_backend(decoder=name)
+            self.assertTrue(math.isnan(codec.loads('{"Amount": NaN}')["Amount"]), name)
+
+    def test_loads_invalid(self):
+        self.assertRaises(ValueError, codec.loads, b"not json")
+
+    def test_dumps_identical_output(self):
+        document = {"b": [1, 2.5, None, True], "a": u"café", "c": {"d": 1e16}}
+
+        outputs = set()
+        for name in codec.ENCODERS:
+            codec.set_backend(encoder=name)
+            outputs.add((codec.dumps(document), codec.dumps(document, sort_keys=True, indent=4)))
+
+        self.assertEqual(len(outputs), 1)
+        compact, pretty = outputs.pop()
+        self.assertEqual(compact, '{"b":[1,2.5,null,true],"a":"caf\\u00e9","c":{"d":1e+16}}')
+        self.assertTrue(pretty.startswith('{\n    "a": "caf\\u00e9",\n'))
+
+    def test_dumps_decimal(self):
+        if codec.simplejson is None:
+            self.skipTest("simplejson is not installed")
+
+        codec.set_backend(encoder="json")
+        self.assertEqual(codec.dumps({"Amount": Decimal("10.10")}), '{"Amount":10.10}')
+
+    def test_dumps_default(self):
+        class Obj(object):
+            def __init__(self):
+                self.Id = "1"
+
+        self.assertEqual(codec.dumps([Obj()], default=lambda obj: obj.__dict__), '[{"Id":"1"}]')
+
+    def test_unknown_backend(self):
+        self.assertRaises(QuickbooksException, codec.set_backend, decoder="unknown")
+        self.assertRaises(QuickbooksException, codec.set_backend, encoder="orjson")
+
+    def test_automatic_selection(self):
+        codec.set_backend()
+
+        decoder, encoder = codec.get_backend()
+        available = [name for name in codec.DECODER_PREFERENCE if name in codec.DECODERS]
+        self.assertEqual(decoder, available[0])
+        self.assertEqual(encoder, "json")
+
+    def test_indent_encoder(self):
+        codec.set_backend()
+        expected = "simplejson" if codec.simplejson is not None else "json"
+        self.assertEqual(codec._indent_encoder_name, expected)
+
+        codec.set_backend(encoder="json")
+        self.assertEqual(codec._indent_encoder_name, "json")
+
+    def test_encoder_cache(self):
+        codec.set_backend()
+        for _ in range(40):
+            Department().to_json()
+            codec.dumps({}, default=lambda obj: obj)
+        Department().to_compact_json()
+
+        defaults = [key[1] for key in codec._encoders]
+        self.assertEqual(len(defaults), 2)
+        self.assertIn(json_default, defaults)
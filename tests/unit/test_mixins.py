@@ -1,5 +1,9 @@
 
+import copy
+import json as json_module
 import os
+import pickle
+from decimal import Decimal
 
 import unittest
 from future.moves.urllib.parse import quote
@@ -15,12 +19,15 @@ except ImportError:
 
 from quickbooks import client
 
-from quickbooks.objects.base import PhoneNumber, QuickbooksBaseObject
+from quickbooks.objects.base import PhoneNumber, QuickbooksBaseObject, Ref
+from quickbooks.objects.batchrequest import BatchItemResponse, Fault
 from quickbooks.objects.department import Department
+from quickbooks.objects.detailline import SalesItemLine
 from quickbooks.objects.customer import Customer
 from quickbooks.objects.journalentry import JournalEntry, JournalEntryLine
 from quickbooks.objects.salesreceipt import SalesReceipt
-from quickbooks.mixins import ObjectListMixin
+from quickbooks.exceptions import QuickbooksException
+from quickbooks.mixins import ObjectListMixin, compact_class, lazy_class, partial_class
 
 
 class ToJsonMixinTest(unittest.TestCase):
@@ -32,6 +39,38 @@ class ToJsonMixinTest(unittest.TestCase):
 
         self.assertEquals(json, '{\n    "FreeFormNumber": "555-555-5555"\n}')
 
+    def test_to_compact_json(self):
+        phone = PhoneNumber()
+        phone.FreeFormNumber = "555-555-5555"
+        phone._private = "private"
+
+        self.assertEquals(phone.to_compact_json(), '{"FreeFormNumber":"555-555-5555"}')
+
+    def test_to_compact_json_sort_keys(self):
+        ref = Ref()
+        ref.value = "1"
+        ref.name = "Name"
+        ref.type = "Customer"
+
+        self.assertEquals(ref.to_compact_json(sort_keys=True),
+                          '{"name":"Name","type":"Customer","value":"1"}')
+
+    def test_to_compact_json_same_content(self):
+        entry = JournalEntry()
+        entry.DocNumber = "123"
+        line = JournalEntryLine()
+        line.Amount = 25.54
+        entry.Line.append(line)
+
+        self.assertEquals(json_module.loads(entry.to_compact_json()),
+                          json_module.loads(entry.to_json()))
+
+    def test_to_compact_json_decimal(self):
+        line = JournalEntryLine()
+        line.Amount = Decimal("25.10")
+
+        self.assertIn('"Amount":25.10', line.to_compact_json())
+
 
 class FromJsonMixinTest(unittest.TestCase):
     def setUp(self):
@@ -75,6 +114,217 @@ class FromJsonMixinTest(unittest.TestCase):
         self.assertEquals(new_obj.DocNumber, "123")
         self.assertEquals(new_obj.TotalAmt, 100)
 
+    def test_from_json_keeps_defaults(self):
+        new_obj = JournalEntry.from_json(self.json_data)
+
+        self.assertEquals(new_obj.Adjustment, JournalEntry().Adjustment)
+        self.assertEquals(new_obj.TxnTaxDetail, None)
+        self.assertEquals(new_obj.Line[0].LinkedTxn, [])
+        self.assertEquals(new_obj.Line[0].JournalEntryLineDetail.TaxApplicableOn, "Sales")
+
+    def test_from_json_lists_not_shared(self):
+        first = JournalEntry.from_json({})
+        second = JournalEntry.from_json({})
+
+        first.Line.append(JournalEntryLine())
+        self.assertEquals(second.Line, [])
+
+    def test_from_json_null_object(self):
+        new_obj = JournalEntry.from_json({'CurrencyRef': None})
+
+        self.assertEquals(new_obj.CurrencyRef, None)
+
+    def test_from_json_instance_dispatch_tables(self):
+        item = BatchItemResponse.from_json({
+            'bId': '1',
+            'Fault': {'type': 'ValidationFault', 'Error': [{'Message': 'Invalid', 'code': '2050'}]},
+        })
+
+        self.assertEquals(item.bId, '1')
+        self.assertEquals(type(item.Fault), Fault)
+        self.assertEquals(item.Fault.Error[0].Message, 'Invalid')
+
+    def test_from_json_overridden_from_json(self):
+        class UpperRef(Ref):
+            @classmethod
+            def from_json(cls, json_data):
+                obj = super(UpperRef, cls).from_json(json_data)
+                obj.name = obj.name.upper()
+                return obj
+
+        class Owner(QuickbooksBaseObject):
+            class_dict = {'OwnerRef': UpperRef}
+
+        new_obj = Owner.from_json({'OwnerRef': {'value': '1', 'name': 'sales'}})
+
+        self.assertEquals(type(new_obj.OwnerRef), UpperRef)
+        self.assertEquals(new_obj.OwnerRef.name, 'SALES')
+
+    def test_decoder_not_inherited(self):
+        class SubEntry(JournalEntry):
+            pass
+
+        JournalEntry.from_json(self.json_data)
+
+        self.assertEquals(type(SubEntry.from_json(self.json_data)), SubEntry)
+
+
+class CompactClassTest(unittest.TestCase):
+    def setUp(self):
+        self.json_data = {
+            'DocNumber': '123',
+            'CurrencyRef': {'value': 'USD'},
+            'Line': [
+                {
+                    "Id": "0",
+                    "Amount": 25.54,
+                    "DetailType": "JournalEntryLineDetail",
+                    "JournalEntryLineDetail": {
+                        "PostingType": "Debit",
+                    }
+                },
+            ],
+        }
+
+    def test_compact_class(self):
+        compact = compact_class(JournalEntry)
+
+        self.assertTrue(issubclass(compact, JournalEntry))
+        self.assertEquals(compact.__name__, "JournalEntry")
+        self.assertIn("DocNumber", compact.__slots__)
+        self.assertIs(compact_class(JournalEntry), compact)
+        self.assertIs(compact_class(compact), compact)
+
+    def test_no_dict(self):
+        for cls in (compact_class(JournalEntry), lazy_class(compact_class(JournalEntry)),
+                    compact_class(lazy_class(JournalEntry))):
+            entry = cls.from_json(self.json_data)
+            self.assertEqual(entry.__dict__, {}, cls.__mro__)
+
+            self.assertEqual(entry.changed_fields(), set())
+            entry.DocNumber = '124'
+            self.assertEqual(entry.changed_fields(), {'DocNumber'})
+            self.assertEqual(entry.CurrencyRef.value, 'USD')
+            self.assertEqual(entry.__dict__, {})
+
+            self.assertEqual(cls().changed_fields(), None)
+
+    def test_from_json(self):
+        entry = compact_class(JournalEntry).from_json(self.json_data)
+
+        self.assertIsInstance(entry.Line[0], JournalEntryLine)
+        self.assertIs(type(entry.Line[0]), compact_class(JournalEntryLine))
+        self.assertIs(type(entry.CurrencyRef), compact_class(Ref))
+        self.assertEquals(entry.to_json(), JournalEntry.from_json(self.json_data).to_json())
+        self.assertEquals(entry.to_dict(), JournalEntry.from_json(self.json_data).to_dict())
+
+    def test_unknown_fields(self):
+        self.json_data['NewField'] = 'value'
+        entry = compact_class(JournalEntry).from_json(self.json_data)
+        entry.Other = 1
+
+        self.assertEquals(entry.NewField, 'value')
+        self.assertIn('"NewField":"value"', entry.to_compact_json())
+        self.assertIn('"Other":1', entry.to_compact_json())
+
+    def test_instance_dispatch_tables(self):
+        self.assertIs(compact_class(BatchItemResponse), BatchItemResponse)
+
+    def test_pickle(self):
+        entry = compact_class(JournalEntry).from_json(self.json_data)
+        entry.DocNumber = '124'
+        entry_copy = pickle.loads(pickle.dumps(entry))
+
+        self.assertIs(type(entry_copy), compact_class(JournalEntry))
+        self.assertIs(type(entry_copy.Line[0]), compact_class(JournalEntryLine))
+        self.assertEquals(entry_copy.to_dict(), entry.to_dict())
+        self.assertEquals(entry_copy.changed_fields(), {'DocNumber'})
+
+
+class LazyClassTest(unittest.TestCase):
+    def setUp(self):
+        self.json_data = {
+            'DocNumber': '123',
+            'CurrencyRef': {'value': 'USD'},
+            'Line': [
+                {
+                    "Id": "0",
+                    "Amount": 25.54,
+                    "DetailType": "JournalEntryLineDetail",
+                    "JournalEntryLineDetail": {
+                        "PostingType": "Debit",
+                    }
+                },
+            ],
+        }
+
+    def test_lazy_class(self):
+        lazy = lazy_class(JournalEntry)
+
+        self.assertTrue(issubclass(lazy, JournalEntry))
+        self.assertIs(lazy_class(JournalEntry), lazy)
+        self.assertIs(lazy_class(lazy), lazy)
+        self.assertIs(lazy_class(BatchItemResponse), BatchItemResponse)
+
+    def test_nested_built_on_access(self):
+        entry = lazy_class(JournalEntry).from_json(self.json_data)
+
+        self.assertEquals(entry._pending_json,
+                          {'CurrencyRef': {'value': 'USD'}, 'Line': self.json_data['Line']})
+        self.assertEquals(entry.DocNumber, '123')
+        self.assertEquals(entry.TxnTaxDetail, None)
+
+        self.assertEquals(entry.CurrencyRef.value, 'USD')
+        self.assertIs(type(entry.CurrencyRef), lazy_class(Ref))
+        self.assertNotIn('CurrencyRef', entry._pending_json)
+
+        self.assertEquals(entry.Line[0].JournalEntryLineDetail.PostingType, 'Debit')
+        self.assertIsInstance(entry.Line[0], JournalEntryLine)
+
+    def test_missing_attribute(self):
+        entry = lazy_class(JournalEntry).from_json(self.json_data)
+
+        self.assertFalse(hasattr(entry, 'Missing'))
+
+    def test_to_json_after_changes(self):
+        entry = lazy_class(JournalEntry).from_json(self.json_data)
+        expected = JournalEntry.from_json(self.json_data)
+
+        currency = Ref()
+        currency.value = 'EUR'
+        entry.CurrencyRef = currency
+        expected.CurrencyRef = currency
+
+        self.assertEquals(entry.to_json(), expected.to_json())
+        self.assertFalse(hasattr(entry, '_pending_json'))
+
+    def test_copy(self):
+        for cls in (lazy_class(JournalEntry), lazy_class(compact_class(JournalEntry))):
+            entry = cls.from_json(self.json_data)
+            entry_copy = copy.copy(entry)
+
+            self.assertEquals(entry_copy.CurrencyRef.value, 'USD')
+            self.assertEquals(entry.CurrencyRef.value, 'USD')
+            self.assertEquals(entry.to_dict(), JournalEntry.from_json(self.json_data).to_dict())
+
+    def test_pickle(self):
+        for cls in (lazy_class(JournalEntry), lazy_class(compact_class(JournalEntry)),
+                    partial_class(lazy_class(JournalEntry))):
+            entry = cls.from_json(self.json_data)
+            entry_copy = pickle.loads(pickle.dumps(entry))
+
+            self.assertIs(type(entry_copy), cls)
+            self.assertEquals(entry_copy.CurrencyRef.value, 'USD')
+            self.assertIs(type(entry_copy.CurrencyRef), type(entry.CurrencyRef))
+            self.assertEquals(entry_copy.to_dict(), entry.to_dict())
+            self.assertEquals(entry_copy.changed_fields(), set())
+
+    def test_compact_lazy(self):
+        entry = lazy_class(compact_class(JournalEntry)).from_json(self.json_data)
+
+        self.assertEquals(entry.CurrencyRef.value, 'USD')
+        self.assertEquals(entry.to_dict(), JournalEntry.from_json(self.json_data).to_dict())
+
 
 class ToDictMixinTest(unittest.TestCase):
     def test_to_dict(self):
@@ -137,7 +387,8 @@ class ListMixinTest(QuickbooksUnitTestCase):
     @patch('quickbooks.mixins.ListMixin.where')
     def test_all(self, where):
         Department.all()
-        where.assert_called_once_with('', order_by='', max_results=100, start_position='', qb=None)
+        where.assert_called_once_with(
+            '', order_by='', max_results=100, start_position='', qb=None, fields=None)
 
     def test_all_with_qb(self):
         with patch.object(self.qb_client, 'query') as query:
@@ -148,7 +399,7 @@ class ListMixinTest(QuickbooksUnitTestCase):
     def test_filter(self, where):
         Department.filter(max_results=25, start_position='1', Active=True)
         where.assert_called_once_with("Active = True", max_results=25, start_position='1',
-                                      order_by='', qb=None)
+                                      order_by='', qb=None, fields=None)
 
     def test_filter_with_qb(self):
         with patch.object(self.qb_client, 'query') as query:
@@ -184,10 +435,12 @@ class ListMixinTest(QuickbooksUnitTestCase):
             Department.query(select, qb=self.qb_client)
             self.assertTrue(query.called)
 
-    @patch('quickbooks.mixins.ListMixin.where')
-    def test_choose(self, where):
-        Department.choose(['name1', 'name2'], field="Name")
-        where.assert_called_once_with("Name in ('name1', 'name2')", qb=None)
+    @patch('quickbooks.mixins.ListMixin.iter_where')
+    def test_choose(self, iter_where):
+        iter_where.return_value = iter([])
+        Department.choose(['name1', 'name2'], field="Name", qb=self.qb_client)
+        iter_where.assert_called_once_with(
+            "Name in ('name1', 'name2')", page_size=1000, qb=self.qb_client)
 
     def test_choose_with_qb(self):
         with patch.object(self.qb_client, 'query') as query:
@@ -210,11 +463,176 @@ class ListMixinTest(QuickbooksUnitTestCase):
             self.assertTrue(query.called)
 
 
+class FieldProjectionTest(unittest.TestCase):
+    def setUp(self):
+        self.qb = client.QuickBooks(company_id="company_id")
+
+    def test_where_fields(self):
+        with patch.object(self.qb, 'query') as query:
+            query.return_value = {"QueryResponse": {"Invoice": [
+                {"Id": "1", "SyncToken": "0", "DocNumber": "1001", "CustomerRef": {"value": "2"}}]}}
+
+            invoices = Invoice.where(
+                "TotalAmt > '0'", fields=["DocNumber", "CustomerRef"], qb=self.qb)
+
+        query.assert_called_once_with(
+            "SELECT Id, SyncToken, DocNumber, CustomerRef FROM Invoice WHERE TotalAmt > '0'")
+        self.assertTrue(isinstance(invoices[0], Invoice))
+        self.assertTrue(invoices[0]._partial)
+        self.assertEqual(invoices[0].DocNumber, "1001")
+        self.assertEqual(invoices[0].CustomerRef.value, "2")
+        self.assertRaises(AttributeError, getattr, invoices[0], "Balance")
+        self.assertEqual(str(invoices[0]), "Invoice 1")
+
+    def test_where_invalid_fields(self):
+        self.assertRaises(QuickbooksException, Invoice.where, fields=["DocNumber FROM Bill --"])
+
+    def test_iter_where_fields(self):
+        with patch.object(self.qb, 'query') as query:
+            query.return_value = {"QueryResponse": {"Invoice": [{"Id": "1", "SyncToken": "0"}]}}
+
+            invoices = list(Invoice.iter_where("", fields=["Id"], page_size=10, qb=self.qb))
+
+        query.assert_called_once_with(
+            "SELECT Id, SyncToken FROM Invoice  STARTPOSITION 1 MAXRESULTS 10")
+        self.assertTrue(invoices[0]._partial)
+
+
+class ChooseTest(unittest.TestCase):
+    def setUp(self):
+        self.qb_client = client.QuickBooks(company_id="COMPANY_ID")
+
+    def query(self, select):
+        # Answers choose queries on Id with the chosen Departments but 99, in descending order
+        ids = select[select.index("(") + 1:select.index(")")].split(", ")
+        ids = sorted((int(value.strip("'")) for value in ids if value != "'99'"), reverse=True)
+        start = int(select.split("STARTPOSITION ")[1].split()[0])
+        page_size = int(select.split("MAXRESULTS ")[1])
+
+        page = ids[start - 1:start - 1 + page_size]
+        return {"QueryResponse": {"Department": [
+            {"Id": str(i), "Name": "D{0}".format(i)} for i in page]}}
+
+    def test_choose_chunks_in_order(self):
+        with patch.object(self.qb_client, 'query', side_effect=self.query) as query:
+            departments = Department.choose(
+                list(range(1, 26)) + [1], qb=self.qb_client, chunk_size=10)
+
+        self.assertEqual(query.call_count, 3)
+        self.assertEqual([department.Id for department in departments],
+                         [str(i) for i in range(1, 26)])
+
+    def test_choose_paginates(self):
+        with patch.object(self.qb_client, 'query', side_effect=self.query) as query:
+            departments = Department.choose(
+                range(1, 1501), qb=self.qb_client, chunk_size=1500, max_workers=1)
+
+        self.assertEqual(query.call_count, 2)
+        self.assertEqual(len(departments), 1500)
+
+    def test_choose_as_dict(self):
+        with patch.object(self.qb_client, 'query', side_effect=self.query):
+            departments = Department.choose(["3", "1", "99"], qb=self.qb_client, as_dict=True)
+
+        self.assertEqual(sorted(departments), ["1", "3"])
+        self.assertEqual(departments["3"].Name, "D3")
+
+    def test_choose_ref_field(self):
+        with patch.object(self.qb_client, 'query') as query:
+            query.return_value = {"QueryResponse": {"Invoice": [
+                {"Id": "1", "CustomerRef": {"value": "20"}},
+                {"Id": "2", "CustomerRef": {"value": "10"}},
+                {"Id": "3", "CustomerRef": {"value": "20"}},
+            ]}}
+
+            invoices = Invoice.choose(["10", "20"], field="CustomerRef", qb=self.qb_client)
+
+        self.assertEqual([invoice.Id for invoice in invoices], ["2", "1", "3"])
+
+    def test_choose_empty(self):
+        with patch.object(self.qb_client, 'query') as query:
+            self.assertEqual(Department.choose([], qb=self.qb_client), [])
+            self.assertFalse(query.called)
+
+
+class IterListMixinTest(unittest.TestCase):
+    def setUp(self):
+        self.qb_client = client.QuickBooks(company_id="COMPANY_ID")
+
+    def query_response(self, ids):
+        departments = [{"Id": str(i), "Name": "D{0}".format(i)} for i in ids]
+        return {"QueryResponse": {"Department": departments}}
+
+    def test_iter_where_pages(self):
+        with patch.object(self.qb_client, 'query') as query:
+            query.side_effect = [self.query_response([1, 2]), self.query_response([3])]
+
+            departments = Department.iter_where("Active=True", page_size=2, qb=self.qb_client)
+            self.assertFalse(query.called)
+
+            self.assertEqual([d.Id for d in departments], ["1", "2", "3"])
+            self.assertEqual(query.call_count, 2)
+            query.assert_any_call(
+                "SELECT * FROM Department WHERE Active=True STARTPOSITION 1 MAXRESULTS 2")
+            query.assert_any_call(
+                "SELECT * FROM Department WHERE Active=True STARTPOSITION 3 MAXRESULTS 2")
+
+    def test_iter_where_lazy(self):
+        with patch.object(self.qb_client, 'query') as query:
+            query.side_effect = [self.query_response([1, 2]), self.query_response([])]
+
+            departments = Department.iter_where(page_size=2, qb=self.qb_client)
+            self.assertEqual(next(departments).Id, "1")
+            self.assertEqual(query.call_count, 1)
+
+            self.assertEqual([d.Id for d in departments], ["2"])
+            self.assertEqual(query.call_count, 2)
+
+    def test_iter_where_prefetch(self):
+        pages = {
+            "1": self.query_response([1, 2]),
+            "3": self.query_response([3, 4]),
+            "5": self.query_response([5]),
+        }
+
+        def query(select):
+            if "COUNT(*)" in select:
+                return {"QueryResponse": {"totalCount": 5}}
+            return pages[select.split("STARTPOSITION ")[1].split(" ")[0]]
+
+        with patch.object(self.qb_client, 'query', side_effect=query) as query_mock:
+            departments = Department.iter_where(page_size=2, prefetch=3, qb=self.qb_client)
+
+            self.assertEqual([d.Id for d in departments], ["1", "2", "3", "4", "5"])
+            self.assertEqual(query_mock.call_count, 4)
+
+    def test_iter_where_prefetch_full_last_page(self):
+        def query(select):
+            if "COUNT(*)" in select:
+                return {"QueryResponse": {"totalCount": 2}}
+            if "STARTPOSITION 1 " in select:
+                return self.query_response([1, 2])
+            return self.query_response([3])
+
+        with patch.object(self.qb_client, 'query', side_effect=query):
+            departments = Department.iter_where(page_size=2, prefetch=4, qb=self.qb_client)
+
+            self.assertEqual([d.Id for d in departments], ["1", "2", "3"])
+
+    def test_iter_all(self):
+        with patch.object(self.qb_client, 'query') as query:
+            query.return_value = {"QueryResponse": {}}
+
+            self.assertEqual(list(Department.iter_all(order_by="Name", qb=self.qb_client)), [])
+            query.assert_called_once_with(
+                "SELECT * FROM Department  ORDERBY Name STARTPOSITION 1 MAXRESULTS 1000")
+
+
 class ReadMixinTest(QuickbooksUnitTestCase):
     @patch('quickbooks.mixins.QuickBooks.get_single_object')
     def test_get(self, get_single_object):
         Department.get(1)
-        get_single_object.assert_called_once_with("Department", pk=1)
+        get_single_object.assert_called_once_with("Department", pk=1, use_cache=True)
 
     def test_get_with_qb(self):
         with patch.object(self.qb_client, 'get_single_object') as get_single_object:
@@ -227,7 +645,7 @@ class UpdateMixinTest(QuickbooksUnitTestCase):
     def test_save_create(self, create_object):
         department = Department()
         department.save(qb=self.qb_client)
-        create_object.assert_called_once_with("Department", department.to_json())
+        create_object.assert_called_once_with("Department", department.to_compact_json())
 
     def test_save_create_with_qb(self):
         with patch.object(self.qb_client, 'create_object') as create_object:
@@ -239,7 +657,7 @@ class UpdateMixinTest(QuickbooksUnitTestCase):
     def test_save_update(self, update_object):
         department = Department()
         department.Id = 1
-        json = department.to_json()
+        json = department.to_compact_json()
 
         department.save(qb=self.qb_client)
         update_object.assert_called_once_with("Department", json)
@@ -254,6 +672,149 @@ class UpdateMixinTest(QuickbooksUnitTestCase):
             self.assertTrue(update_object.called)
 
 
+class SparseUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.invoice_json = {
+            "Id": "5",
+            "SyncToken": "2",
+            "DocNumber": "1001",
+            "PrivateNote": "note",
+            "CustomerRef": {"value": "1", "name": "Customer"},
+            "Line": [{"Id": "1", "Amount": 10, "DetailType": "SalesItemLineDetail",
+                      "SalesItemLineDetail": {"ItemRef": {"value": "3"}}}],
+        }
+
+    def test_no_changes_after_from_json(self):
+        for cls in (Invoice, compact_class(Invoice), lazy_class(Invoice)):
+            invoice = cls.from_json(self.invoice_json)
+            self.assertEqual(invoice.CustomerRef.value, "1")
+            self.assertEqual(len(invoice.Line), 1)
+            self.assertEqual(invoice.changed_fields(), set())
+
+    def test_changed_fields(self):
+        invoice = Invoice.from_json(self.invoice_json)
+        invoice.DocNumber = "1002"
+        invoice.PrivateNote = None
+        invoice.SyncToken = "3"
+
+        self.assertEqual(invoice.changed_fields(), {"DocNumber", "PrivateNote"})
+
+    def test_changed_fields_compact_lazy(self):
+        for cls in (compact_class(Invoice), lazy_class(Invoice),
+                    lazy_class(compact_class(Invoice))):
+            invoice = cls.from_json(self.invoice_json)
+            self.assertEqual(invoice.CustomerRef.value, "1")
+            invoice.DocNumber = "1002"
+
+            self.assertEqual(invoice.changed_fields(), {"DocNumber"})
+
+    def test_untracked_object(self):
+        invoice = Invoice()
+        invoice.DocNumber = "1002"
+
+        self.assertEqual(invoice.changed_fields(), None)
+
+    def test_copy(self):
+        for cls in (Invoice, compact_class(Invoice)):
+            invoice = cls.from_json(self.invoice_json)
+            invoice_copy = copy.copy(invoice)
+            invoice_copy.DocNumber = "1002"
+            invoice_deepcopy = copy.deepcopy(invoice)
+            invoice_deepcopy.mark_dirty("Line")
+
+            self.assertEqual(invoice.changed_fields(), set())
+            self.assertEqual(invoice_copy.changed_fields(), {"DocNumber"})
+            self.assertEqual(invoice_deepcopy.changed_fields(), {"Line"})
+            self.assertEqual(copy.deepcopy(cls()).changed_fields(), None)
+
+    def test_mark_dirty(self):
+        invoice = Invoice.from_json(self.invoice_json)
+        invoice.Line[0].Amount = 20
+        invoice.mark_dirty("Line")
+
+        self.assertEqual(invoice.changed_fields(), {"Line"})
+
+    def test_sparse_update_data(self):
+        invoice = Invoice.from_json(self.invoice_json)
+        invoice.DocNumber = "1002"
+        invoice.PrivateNote = None
+
+        data = json_module.loads(invoice._update_json(sparse=True))
+        self.assertEqual(data, {"Id": "5", "SyncToken": "2", "sparse": True,
+                                "DocNumber": "1002", "PrivateNote": None})
+
+    def test_sparse_update_data_untracked(self):
+        department = Department()
+        department.Id = "1"
+        department.Name = "Sales"
+
+        data = department.sparse_update_data()
+        self.assertEqual(data["sparse"], True)
+        self.assertEqual(data["Name"], "Sales")
+        self.assertNotIn("ParentRef", data)
+
+    def test_save_sparse(self):
+        qb = client.QuickBooks(company_id="company_id")
+        invoice = Invoice.from_json(self.invoice_json)
+        invoice.DocNumber = "1002"
+
+        with patch.object(qb, 'update_object') as update_object:
+            update_object.return_value = {"Invoice": dict(self.invoice_json, SyncToken="3")}
+            invoice.save(qb=qb, sparse=True)
+
+        name, json = update_object.call_args[0]
+        self.assertEqual(name, "Invoice")
+        self.assertEqual(json_module.loads(json),
+                         {"Id": "5", "SyncToken": "2", "sparse": True, "DocNumber": "1002"})
+        self.assertEqual(invoice.changed_fields(), set())
+
+    def test_save_sparse_attribute(self):
+        qb = client.QuickBooks(company_id="company_id")
+        invoice = Invoice.from_json(self.invoice_json)
+        invoice.sparse = True
+        # Changed in place, not tracked
+        invoice.Line.append(SalesItemLine())
+
+        with patch.object(qb, 'update_object') as update_object:
+            update_object.return_value = {"Invoice": self.invoice_json}
+            invoice.save(qb=qb)
+
+        # The whole object, with the sparse flag
+        sent = json_module.loads(update_object.call_args[0][1])
+        self.assertEqual(sent["sparse"], True)
+        self.assertEqual(sent["DocNumber"], "1001")
+        self.assertEqual(len(sent["Line"]), 2)
+
+    def test_save_partial(self):
+        qb = client.QuickBooks(company_id="company_id")
+        invoice = partial_class(Invoice).from_json(
+            {"Id": "5", "SyncToken": "2", "DocNumber": "1001"})
+        invoice.DocNumber = "1002"
+
+        with patch.object(qb, 'update_object') as update_object:
+            self.assertRaises(QuickbooksException, invoice.save, qb=qb)
+            self.assertFalse(update_object.called)
+
+            update_object.return_value = {"Invoice": self.invoice_json}
+            invoice.save(qb=qb, sparse=True)
+
+        self.assertEqual(json_module.loads(update_object.call_args[0][1]),
+                         {"Id": "5", "SyncToken": "2", "sparse": True, "DocNumber": "1002"})
+
+    def test_save_full_by_default(self):
+        qb = client.QuickBooks(company_id="company_id")
+        invoice = Invoice.from_json(self.invoice_json)
+        invoice.DocNumber = "1002"
+
+        with patch.object(qb, 'update_object') as update_object:
+            update_object.return_value = {"Invoice": self.invoice_json}
+            invoice.save(qb=qb)
+
+        data = json_module.loads(update_object.call_args[0][1])
+        self.assertEqual(data["CustomerRef"]["value"], "1")
+        self.assertEqual(data["DocNumber"], "1002")
+
+
 class DownloadPdfTest(QuickbooksUnitTestCase):
     @patch('quickbooks.client.QuickBooks.download_pdf')
     def test_download_invoice(self, download_pdf):
@@ -0,0 +1,154 @@
+import unittest
+from datetime import date, datetime
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from quickbooks import client
+from quickbooks.exceptions import QuickbooksException
+from quickbooks.objects.invoice import Invoice
+from quickbooks.query import QuerySet, quote_value
+
+
+class QuoteValueTest(unittest.TestCase):
+    def test_quote_value(self):
+        self.assertEqual(quote_value(True), "true")
+        self.assertEqual(quote_value(10), "10")
+        self.assertEqual(quote_value(10.5), "10.5")
+        self.assertEqual(quote_value(date(2020, 1, 2)), "'2020-01-02'")
+        self.assertEqual(quote_value(datetime(2020, 1, 2, 3, 4, 5)), "'2020-01-02T03:04:05'")
+
+    def test_quote_value_escaped(self):
+        self.assertEqual(quote_value("Someone's"), "'Someone\\'s'")
+        self.assertEqual(quote_value("back\\' OR Id > '0"), "'back\\\\\\' OR Id > \\'0'")
+
+    def test_quote_value_unsupported(self):
+        self.assertRaises(QuickbooksException, quote_value, None)
+        self.assertRaises(QuickbooksException, quote_value, object())
+
+
+class QuerySetTest(unittest.TestCase):
+    def setUp(self):
+        self.qb = client.QuickBooks(company_id="company_id")
+
+    def query_response(self, ids):
+        return {"QueryResponse": {"Invoice": [{"Id": str(i), "SyncToken": "0"} for i in ids]}}
+
+    def test_objects(self):
+        self.assertIsInstance(Invoice.objects, QuerySet)
+        self.assertIs(Invoice.objects.cls, Invoice)
+        self.assertEqual(str(Invoice.objects), "SELECT * FROM Invoice ")
+
+    def test_filter(self):
+        query_set = Invoice.objects.filter(TxnDate__gte=date(2020, 1, 1), TotalAmt__gt=0).filter(
+            DocNumber__like="10%", CustomerRef__in=["1", "2", "1"], Balance__lte=5, Deposit__lt=1,
+            PrivateNote="x")
+
+        self.assertEqual(str(query_set),
+                         "SELECT * FROM Invoice WHERE TotalAmt > 0 AND TxnDate >= '2020-01-01' "
+                         "AND Balance <= 5 AND CustomerRef IN ('1', '2') AND Deposit < 1 "
+                         "AND DocNumber LIKE '10%' AND PrivateNote = 'x'")
+
+    def test_filter_nested_field(self):
+        query_set = Invoice.objects.filter(MetaData__LastUpdatedTime__gte="2020-01-01",
+                                           MetaData__CreateTime="2019-01-01")
+
+        self.assertEqual(str(query_set),
+                         "SELECT * FROM Invoice WHERE MetaData.CreateTime = '2019-01-01' "
+                         "AND MetaData.LastUpdatedTime >= '2020-01-01'")
+
+    def test_filter_invalid(self):
+        self.assertRaises(QuickbooksException, Invoice.objects.filter, TotalAmt__between=1)
+        self.assertRaises(QuickbooksException, Invoice.objects.filter, MetaData__=1)
+        self.assertRaises(QuickbooksException, Invoice.objects.filter, Id__in="1")
+        self.assertRaises(QuickbooksException, Invoice.objects.order_by, "TxnDate; DROP")
+        self.assertRaises(QuickbooksException, Invoice.objects.only, "Id FROM Bill")
+        self.assertRaises(QuickbooksException, Invoice.objects.limit, 0)
+
+    def test_order_by_limit_offset_only(self):
+        query_set = Invoice.objects.order_by("-TxnDate", "DocNumber").limit(10).offset(20)
+        query_set = query_set.only("DocNumber")
+
+        self.assertEqual(str(query_set),
+                         "SELECT Id, SyncToken, DocNumber FROM Invoice  "
+                         "ORDERBY TxnDate DESC, DocNumber STARTPOSITION 21 MAXRESULTS 10")
+
+    def test_immutable(self):
+        query_set = Invoice.objects.filter(Id="1")
+        query_set.order_by("TxnDate").limit(5)
+
+        self.assertEqual(str(query_set), "SELECT * FROM Invoice WHERE Id = '1'")
+
+    def test_compiled_once(self):
+        query_set = Invoice.objects.filter(Id="1")
+
+        self.assertIs(query_set.compile(), query_set.compile())
+
+    def test_iterate_pages(self):
+        with patch.object(self.qb, 'query') as query:
+            query.side_effect = [self.query_response(range(1000)), self.query_response([1000])]
+
+            invoices = Invoice.objects.filter(TotalAmt__gt=0).using(self.qb).all()
+
+        self.assertEqual(len(invoices), 1001)
+        self.assertEqual(
+            query.call_args_list[1][0][0],
+            "SELECT * FROM Invoice WHERE TotalAmt > 0 STARTPOSITION 1001 MAXRESULTS 1000")
+
+    def test_iterate_limit(self):
+        with patch.object(self.qb, 'query') as query:
+            query.return_value = self.query_response([1, 2])
+
+            invoices = list(Invoice.objects.limit(2).offset(4).using(self.qb))
+
+        query.assert_called_once_with("SELECT * FROM Invoice  STARTPOSITION 5 MAXRESULTS 2")
+        self.assertEqual([invoice.Id for invoice in invoices], ["1", "2"])
+
+    def test_only_partial(self):
+        with patch.object(self.qb, 'query') as query:
+            query.return_value = self.query_response([1])
+
+            invoice = Invoice.objects.only("DocNumber").using(self.qb).first()
+
+        self.assertTrue(invoice._partial)
+
+    def test_in_split(self):
+        query_set = Invoice.objects.filter(Id__in=range(600)).using(self.qb)
+
+        self.assertEqual(len(query_set.statements()), 3)
+        self.assertIn("Id IN (500, ", query_set.statements()[2])
+
+        with patch.object(self.qb, 'query') as query:
+            query.side_effect = [self.query_response([i]) for i in (1, 2, 3)]
+
+            self.assertEqual([invoice.Id for invoice in query_set], ["1", "2", "3"])
+
+        self.assertRaises(QuickbooksException, list, query_set.limit(5))
+
+    def test_in_split_order_by(self):
+        query_set = Invoice.objects.filter(Id__in=range(600)).order_by('-TxnDate').using(self.qb)
+
+        with patch.object(self.qb, 'query') as query:
+            self.assertRaises(QuickbooksException, list, query_set)
+            self.assertFalse(query.called)
+
+        # Not split, ordered by QBO
+        with patch.object(self.qb, 'query', return_value=self.query_response([2, 1])):
+            ids = [invoice.Id for invoice in
+                   Invoice.objects.filter(Id__in=range(10)).order_by('-TxnDate').using(self.qb)]
+        self.assertEqual(ids, ["2", "1"])
+
+    def test_in_empty(self):
+        with patch.object(self.qb, 'query') as query:
+            self.assertEqual(Invoice.objects.filter(Id__in=[]).using(self.qb).all(), [])
+            self.assertEqual(Invoice.objects.filter(Id__in=[]).using(self.qb).count(), 0)
+            self.assertFalse(query.called)
+
+    def test_count(self):
+        with patch.object(self.qb, 'query') as query:
+            query.return_value = {"QueryResponse": {"totalCount": 7}}
+
+            self.assertEqual(Invoice.objects.filter(Id__in=range(300)).using(self.qb).count(), 14)
+            self.assertEqual(query.call_count, 2)
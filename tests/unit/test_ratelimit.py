@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from quickbooks import client
+from quickbooks.ratelimit import RateLimiter
+
+
+class MockResponse(object):
+    status_code = 200
+    text = ""
+    content = b'{"QueryResponse": {}}'
+
+
+class MockSession(object):
+    access_token = "access_token"
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.in_flight = []
+
+    def request(self, request_type, url, **kwargs):
+        self.in_flight.append(self.limiter.stats()["in_flight"])
+        return MockResponse()
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(requests_per_minute=600, max_concurrent=10, burst=2)
+
+        started = time.monotonic()
+        for _ in range(3):
+            with limiter:
+                pass
+
+        # The third request waits for a token at 10 requests per second
+        self.assertTrue(time.monotonic() - started >= 0.08)
+        self.assertEqual(limiter.stats()["requests"], 3)
+        self.assertTrue(limiter.stats()["max_wait"] >= 0.08)
+
+    def test_max_concurrent(self):
+        limiter = RateLimiter(requests_per_minute=60000, max_concurrent=2)
+        limiter.acquire()
+        limiter.acquire()
+
+        acquired = threading.Event()
+
+        def acquire():
+            limiter.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+
+        self.assertFalse(acquired.wait(0.05))
+        self.assertEqual(limiter.stats()["queue_depth"], 1)
+        self.assertEqual(limiter.stats()["in_flight"], 2)
+
+        limiter.release()
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+        self.assertEqual(limiter.stats()["queue_depth"], 0)
+
+    def test_acquire_async(self):
+        limiter = RateLimiter(requests_per_minute=60000, max_concurrent=1)
+        active = []
+
+        async def request():
+            await limiter.acquire_async()
+            try:
+                active.append(limiter.stats()["in_flight"])
+                await asyncio.sleep(0.01)
+            finally:
+                limiter.release()
+
+        async def main():
+            await asyncio.gather(*[request() for _ in range(3)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(main())
+        finally:
+            loop.close()
+
+        self.assertEqual(active, [1, 1, 1])
+        self.assertEqual(limiter.stats()["requests"], 3)
+
+    def test_for_realm(self):
+        limiter = RateLimiter.for_realm("realm_1", requests_per_minute=100)
+
+        self.assertIs(RateLimiter.for_realm("realm_1"), limiter)
+        self.assertIsNot(RateLimiter.for_realm("realm_2"), limiter)
+        self.assertAlmostEqual(limiter.rate, 100 / 60.0)
+
+
+class ClientRateLimitTest(unittest.TestCase):
+    def test_process_request_acquires_limiter(self):
+        client.QuickBooks.disable_global()
+        limiter = RateLimiter()
+        qb_client = client.QuickBooks(company_id="1", rate_limiter=limiter)
+        qb_client.session = MockSession(limiter)
+
+        qb_client.query("SELECT * FROM Customer")
+
+        self.assertEqual(qb_client.session.in_flight, [1])
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+        self.assertEqual(limiter.stats()["requests"], 1)
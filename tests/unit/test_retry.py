@@ -0,0 +1,203 @@
+import time
+import unittest
+
+import requests
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from quickbooks import client
+from quickbooks.exceptions import QuickbooksException
+from quickbooks.objects.batchrequest import Fault
+from quickbooks.retry import BatchRetryPolicy, RetryPolicy, parse_retry_after
+
+URL = "https://quickbooks.api.intuit.com/v3/company/1/customer"
+QUERY_URL = "https://quickbooks.api.intuit.com/v3/company/1/query"
+
+
+class MockResponse(object):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+        self.content = b'{"QueryResponse": {}}'
+
+
+class MockSession(object):
+    access_token = "access_token"
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, request_type, url, **kwargs):
+        self.calls.append(kwargs)
+
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=10, jitter=False)
+
+        self.assertEqual(policy.backoff(0), 1)
+        self.assertEqual(policy.backoff(2), 4)
+        self.assertEqual(policy.backoff(5), 10)
+        self.assertEqual(policy.backoff(0, retry_after=3), 3)
+
+    def test_backoff_jitter(self):
+        policy = RetryPolicy(backoff_factor=1)
+
+        for attempt in range(5):
+            self.assertTrue(0 <= policy.backoff(attempt) <= 2 ** attempt)
+
+    def test_is_idempotent(self):
+        policy = RetryPolicy()
+
+        self.assertTrue(policy.is_idempotent("GET", URL))
+        self.assertTrue(policy.is_idempotent("POST", QUERY_URL))
+        self.assertTrue(policy.is_idempotent("POST", URL, {"requestid": "1"}))
+        self.assertFalse(policy.is_idempotent("POST", URL, {}))
+
+    def test_throttled_post_retried(self):
+        policy = RetryPolicy()
+        delay = policy.next_delay(0, time.time(), "POST", URL, {}, response=MockResponse(429))
+
+        self.assertIsNotNone(delay)
+
+    def test_server_error_post_not_retried(self):
+        policy = RetryPolicy()
+
+        response = MockResponse(503)
+        self.assertIsNone(policy.next_delay(0, time.time(), "POST", URL, {}, response=response))
+        self.assertIsNotNone(policy.next_delay(0, time.time(), "GET", URL, {}, response=response))
+
+    def test_client_error_not_retried(self):
+        policy = RetryPolicy()
+
+        response = MockResponse(400)
+        self.assertIsNone(policy.next_delay(0, time.time(), "GET", URL, {}, response=response))
+
+    def test_connection_error(self):
+        policy = RetryPolicy()
+        error = requests.exceptions.ConnectionError()
+
+        self.assertIsNotNone(policy.next_delay(0, time.time(), "GET", URL, {}, exception=error))
+        self.assertIsNone(policy.next_delay(0, time.time(), "POST", URL, {}, exception=error))
+
+    def test_max_retries(self):
+        policy = RetryPolicy(max_retries=2)
+
+        response = MockResponse(503)
+        self.assertIsNone(policy.next_delay(2, time.time(), "GET", URL, {}, response=response))
+
+    def test_max_elapsed(self):
+        policy = RetryPolicy(max_elapsed=10, jitter=False)
+        started = time.time() - 9.9
+
+        self.assertIsNone(policy.next_delay(3, started, "GET", URL, {}, response=MockResponse(503)))
+
+    def test_retry_after(self):
+        policy = RetryPolicy()
+        response = MockResponse(429, headers={"Retry-After": "7"})
+
+        self.assertEqual(policy.next_delay(0, time.time(), "POST", URL, {}, response=response), 7)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after({"Retry-After": "12"}), 12)
+        self.assertIsNone(parse_retry_after({}))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertEqual(parse_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0)
+
+    def test_request_ids(self):
+        policy = RetryPolicy(use_request_ids=True)
+
+        params = policy.prepare_params("POST", {})
+        self.assertTrue(params["requestid"])
+        self.assertEqual(policy.prepare_params("POST", {"requestid": "1"}), {"requestid": "1"})
+        self.assertEqual(policy.prepare_params("GET", {}), {})
+
+    def test_hooks(self):
+        calls = []
+        policy = RetryPolicy(hooks=[lambda **kwargs: calls.append(kwargs)])
+        policy.next_delay(0, time.time(), "GET", URL, {}, response=MockResponse(503))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["attempt"], 1)
+        self.assertEqual(calls[0]["status_code"], 503)
+
+
+class BatchRetryPolicyTest(unittest.TestCase):
+    def fault(self, code, fault_type="ValidationFault"):
+        return Fault.from_json({"type": fault_type, "Error": [{"Message": "Error", "code": code}]})
+
+    def test_classify(self):
+        policy = BatchRetryPolicy()
+
+        self.assertEqual(policy.classify(self.fault("5010")), BatchRetryPolicy.STALE)
+        self.assertEqual(policy.classify(self.fault(3001)), BatchRetryPolicy.THROTTLED)
+        self.assertEqual(policy.classify(self.fault("10000")), BatchRetryPolicy.TRANSIENT)
+        self.assertEqual(policy.classify(self.fault("0", "SystemFault")),
+                         BatchRetryPolicy.TRANSIENT)
+        self.assertEqual(policy.classify(self.fault("6240")), BatchRetryPolicy.PERMANENT)
+
+    def test_is_retriable(self):
+        policy = BatchRetryPolicy()
+
+        self.assertTrue(policy.is_retriable(BatchRetryPolicy.TRANSIENT, "update"))
+        self.assertTrue(policy.is_retriable(BatchRetryPolicy.THROTTLED, "create"))
+        self.assertFalse(policy.is_retriable(BatchRetryPolicy.TRANSIENT, "create"))
+        self.assertFalse(policy.is_retriable(BatchRetryPolicy.PERMANENT, "delete"))
+
+    def test_custom_codes(self):
+        policy = BatchRetryPolicy(transient_codes=(6000,))
+
+        self.assertEqual(policy.classify(self.fault("6000")), BatchRetryPolicy.TRANSIENT)
+        self.assertEqual(policy.classify(self.fault("10000")), BatchRetryPolicy.PERMANENT)
+
+
+@patch('quickbooks.client.time.sleep')
+class ClientRetryTest(unittest.TestCase):
+    def setUp(self):
+        client.QuickBooks.disable_global()
+        self.qb_client = client.QuickBooks(company_id="1", retry_policy=RetryPolicy())
+
+    def test_retry_throttled(self, sleep):
+        self.qb_client.session = MockSession(
+            [MockResponse(429), MockResponse(429), MockResponse(200)])
+
+        self.assertEqual(self.qb_client.create_object("Customer", "{}"), {"QueryResponse": {}})
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_retry_connection_error(self, sleep):
+        self.qb_client.session = MockSession(
+            [requests.exceptions.ConnectionError(), MockResponse(200)])
+
+        self.assertEqual(self.qb_client.query("SELECT * FROM Customer"), {"QueryResponse": {}})
+
+    def test_no_retry_for_create(self, sleep):
+        self.qb_client.session = MockSession([MockResponse(503), MockResponse(200)])
+
+        self.assertRaises(QuickbooksException, self.qb_client.create_object, "Customer", "{}")
+        self.assertFalse(sleep.called)
+
+    def test_request_id_kept_between_attempts(self, sleep):
+        self.qb_client.retry_policy = RetryPolicy(use_request_ids=True)
+        self.qb_client.session = MockSession([MockResponse(503), MockResponse(200)])
+
+        self.qb_client.create_object("Customer", "{}")
+
+        request_ids = [call["params"]["requestid"] for call in self.qb_client.session.calls]
+        self.assertEqual(len(request_ids), 2)
+        self.assertEqual(request_ids[0], request_ids[1])
+
+    def test_without_policy(self, sleep):
+        self.qb_client.retry_policy = None
+        self.qb_client.session = MockSession([MockResponse(429), MockResponse(200)])
+
+        self.assertRaises(QuickbooksException, self.qb_client.query, "SELECT * FROM Customer")
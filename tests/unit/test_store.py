@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from quickbooks import client
+from quickbooks.objects.customer import Customer
+from quickbooks.objects.invoice import Invoice
+from quickbooks.store import LocalStore
+
+
+def invoice_json(id, sync_token="0", doc_number=None, sales_rep=None):
+    data = {"Id": str(id), "SyncToken": sync_token, "DocNumber": doc_number or str(1000 + id),
+            "CustomerRef": {"value": "1"},
+            "MetaData": {"LastUpdatedTime": "2020-01-01T00:00:00-08:00"}}
+    if sales_rep:
+        data["CustomField"] = [{"DefinitionId": "1", "Name": "Sales Rep", "Type": "StringType",
+                                "StringValue": sales_rep}]
+    return data
+
+
+def query_response(entity, items):
+    return {"QueryResponse": {entity: items}}
+
+
+def cdc_response(entity, items, time="2020-02-01T10:00:00.000-08:00"):
+    result = {entity: items, "startPosition": 1, "maxResults": len(items)}
+    return {"CDCResponse": [{"QueryResponse": [result]}], "time": time}
+
+
+class LocalStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.qb = client.QuickBooks(company_id="1234")
+        self.store = LocalStore()
+
+    def tearDown(self):
+        self.store.close()
+
+    def load_invoices(self, items):
+        with patch.object(self.qb, 'query', return_value=query_response("Invoice", items)):
+            return self.store.load(Invoice, qb=self.qb)
+
+    def test_load(self):
+        self.assertEqual(self.load_invoices([invoice_json(1, sales_rep="Ann"), invoice_json(2)]), 2)
+
+        self.assertEqual(self.store.count(Invoice), 2)
+        self.assertEqual(self.store.get(Invoice, 1).DocNumber, "1001")
+        self.assertEqual(self.store.get(Invoice, 1).CustomerRef.value, "1")
+        self.assertEqual(self.store.get(Invoice, 3), None)
+        found = self.store.find_by_doc_number(Invoice, "1002")
+        self.assertEqual([invoice.Id for invoice in found], ["2"])
+        found = self.store.find_by_custom_field(Invoice, "Sales Rep", "Ann")
+        self.assertEqual([invoice.Id for invoice in found], ["1"])
+        self.assertEqual(self.store.count(Customer), 0)
+
+    def test_load_high_water_mark(self):
+        before = datetime.now(timezone.utc)
+        self.load_invoices([invoice_json(1)])
+
+        changed_since = self.store.changed_since(Invoice)
+        self.assertTrue(before - timedelta(seconds=301) < changed_since <= before)
+        self.assertEqual(self.store.changed_since(Customer), None)
+
+    def test_reload_removes_missing(self):
+        self.load_invoices([invoice_json(1), invoice_json(2)])
+        self.load_invoices([invoice_json(2)])
+
+        self.assertEqual([invoice.Id for invoice in self.store.all(Invoice)], ["2"])
+
+    def test_find_by_name(self):
+        customers = [{"Id": "1", "SyncToken": "0", "DisplayName": "Acme"}]
+
+        with patch.object(self.qb, 'query', return_value=query_response("Customer", customers)):
+            self.store.load(Customer, qb=self.qb)
+
+        self.assertEqual(self.store.find_by_name(Customer, "Acme")[0].Id, "1")
+
+    def test_sync(self):
+        self.load_invoices([invoice_json(1), invoice_json(2), invoice_json(3, sync_token="5")])
+
+        changes = [
+            invoice_json(1, sync_token="1", doc_number="A-1"),
+            {"Id": "2", "status": "Deleted", "domain": "QBO",
+             "MetaData": {"LastUpdatedTime": "2020-01-02"}},
+            invoice_json(3, sync_token="4", doc_number="old"),
+            invoice_json(4, sales_rep="Bob"),
+        ]
+
+        response = cdc_response("Invoice", changes)
+        with patch.object(self.qb, 'change_data_capture', return_value=response) as cdc:
+            self.assertEqual(self.store.sync([Invoice], qb=self.qb), {"Invoice": 4})
+
+        self.assertEqual(cdc.call_args[0][0], "Invoice")
+        self.assertTrue(cdc.call_args[0][1].endswith("+00:00"))
+
+        self.assertEqual(self.store.get(Invoice, 1).DocNumber, "A-1")
+        self.assertEqual(self.store.get(Invoice, 2), None)
+        self.assertEqual(self.store.get(Invoice, 3).SyncToken, "5")
+        self.assertEqual(self.store.find_by_custom_field(Invoice, "Sales Rep", "Bob")[0].Id, "4")
+        self.assertEqual(self.store.changed_since(Invoice),
+                         datetime(2020, 2, 1, 17, 55, tzinfo=timezone.utc))
+
+    def test_sync_truncated(self):
+        self.load_invoices([invoice_json(1), invoice_json(2), invoice_json(3)])
+        changes = {"Invoice": [invoice_json(1, sync_token="1")]}
+
+        # Invoice 2 was deleted after the first 1000 changes
+        fetched = ("2020-02-01T10:00:00-08:00", changes, ["Invoice"])
+        response = query_response(
+            "Invoice", [{"Id": "1", "SyncToken": "1"}, {"Id": "3", "SyncToken": "0"}])
+        with patch('quickbooks.store.fetch_changes', return_value=fetched):
+            with patch.object(self.qb, 'query', return_value=response) as query:
+                self.assertEqual(self.store.sync([Invoice], qb=self.qb), {"Invoice": 2})
+
+        self.assertTrue(query.call_args[0][0].startswith("SELECT Id, SyncToken FROM Invoice "))
+        self.assertEqual([invoice.Id for invoice in self.store.all(Invoice)], ["1", "3"])
+        self.assertEqual(self.store.get(Invoice, 1).SyncToken, "1")
+
+    def test_sync_loads_new_classes(self):
+        response = query_response("Invoice", [invoice_json(1)])
+        with patch.object(self.qb, 'query', return_value=response):
+            with patch.object(self.qb, 'change_data_capture') as cdc:
+                self.assertEqual(self.store.sync([Invoice], qb=self.qb), {"Invoice": 1})
+
+        self.assertFalse(cdc.called)
+
+    def test_persisted(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "store.db")
+
+        store = LocalStore(path)
+        response = query_response("Invoice", [invoice_json(1)])
+        with patch.object(self.qb, 'query', return_value=response):
+            store.load(Invoice, qb=self.qb)
+        store.close()
+
+        store = LocalStore(path)
+        self.assertEqual(store.get(Invoice, 1).DocNumber, "1001")
+        self.assertNotEqual(store.changed_since(Invoice), None)
+        store.close()
@@ -0,0 +1,224 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from quickbooks import client
+from quickbooks.tokens import (
+    TokenManager, MemoryTokenStore, FileTokenStore, SQLiteTokenStore, RedisTokenStore
+)
+
+
+class MockAuthClient(object):
+    def __init__(self, access_token=None):
+        self.client_id = "client_id"
+        self.client_secret = "client_secret"
+        self.environment = client.Environments.SANDBOX
+        self.realm_id = "realm"
+        self.access_token = access_token
+        self.refresh_token = None
+        self.expires_in = None
+        self.refresh_count = 0
+
+    def refresh(self, refresh_token=None):
+        self.refresh_count += 1
+        self.access_token = "access_{0}".format(self.refresh_count)
+        self.refresh_token = "refresh_{0}".format(self.refresh_count)
+        self.expires_in = 3600
+
+
+class MockRedis(object):
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value):
+        self.data[key] = value.encode("utf-8")
+
+    @contextmanager
+    def lock(self, name, timeout=None):
+        with self._lock:
+            yield
+
+
+class MockResponse(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+        self.content = b'{"QueryResponse": {}}'
+
+
+class TokenManagerTest(unittest.TestCase):
+    def test_refresh_when_no_access_token(self):
+        auth_client = MockAuthClient()
+        manager = TokenManager(auth_client, refresh_token="refresh")
+
+        self.assertEqual(manager.get_access_token(), "access_1")
+        self.assertEqual(manager.refresh_token, "refresh_1")
+        self.assertAlmostEqual(manager.expires_at, time.time() + 3600, delta=5)
+
+    def test_token_without_expiry_is_used(self):
+        auth_client = MockAuthClient(access_token="existing")
+        manager = TokenManager(auth_client, refresh_token="refresh")
+
+        self.assertEqual(manager.get_access_token(), "existing")
+        self.assertEqual(auth_client.refresh_count, 0)
+
+    def test_refresh_ahead_of_expiry(self):
+        auth_client = MockAuthClient()
+        manager = TokenManager(auth_client, refresh_token="refresh", refresh_margin=300)
+        manager.get_access_token()
+
+        manager.expires_at = time.time() + 200
+        self.assertEqual(manager.get_access_token(), "access_2")
+
+    def test_stale_token_already_replaced(self):
+        auth_client = MockAuthClient()
+        manager = TokenManager(auth_client, refresh_token="refresh")
+        manager.get_access_token()
+
+        self.assertEqual(manager.refresh(stale_access_token="old"), "access_1")
+        self.assertEqual(auth_client.refresh_count, 1)
+
+        self.assertEqual(manager.refresh(stale_access_token="access_1"), "access_2")
+
+    def test_shared_store_refreshes_once(self):
+        store = MemoryTokenStore()
+        auth_client = MockAuthClient()
+
+        managers = [TokenManager(auth_client, refresh_token="refresh", store=store)
+                    for _ in range(5)]
+        threads = [threading.Thread(target=manager.get_access_token) for manager in managers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(auth_client.refresh_count, 1)
+        self.assertEqual(set(manager.access_token for manager in managers), {"access_1"})
+
+    def test_token_loaded_from_store(self):
+        store = MemoryTokenStore()
+        store.save("realm", {"access_token": "stored", "refresh_token": "r",
+                             "expires_at": time.time() + 3600})
+
+        auth_client = MockAuthClient()
+        manager = TokenManager(auth_client, store=store)
+
+        self.assertEqual(manager.get_access_token(), "stored")
+        self.assertEqual(auth_client.access_token, "stored")
+        self.assertEqual(auth_client.refresh_count, 0)
+
+    def test_background_refresh(self):
+        auth_client = MockAuthClient()
+        manager = TokenManager(auth_client, refresh_token="refresh", refresh_margin=4000)
+        manager.get_access_token()
+
+        manager.start_background_refresh(interval=0.01)
+        time.sleep(0.1)
+        manager.stop_background_refresh()
+
+        self.assertTrue(auth_client.refresh_count > 1)
+
+
+class TokenStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_store(self, store):
+        self.assertIsNone(store.load("realm"))
+
+        with store.lock("realm"):
+            store.save("realm", {"access_token": "a", "refresh_token": "r", "expires_at": 1})
+
+        self.assertEqual(store.load("realm"),
+                         {"access_token": "a", "refresh_token": "r", "expires_at": 1})
+
+    def test_memory_store(self):
+        self.check_store(MemoryTokenStore())
+
+    def test_file_store(self):
+        self.check_store(FileTokenStore(os.path.join(self.directory, "tokens")))
+
+    def test_sqlite_store(self):
+        self.check_store(SQLiteTokenStore(os.path.join(self.directory, "tokens.db")))
+
+    def test_sqlite_store_shared(self):
+        path = os.path.join(self.directory, "tokens.db")
+        SQLiteTokenStore(path).save("realm", {"access_token": "a"})
+
+        self.assertEqual(SQLiteTokenStore(path).load("realm"), {"access_token": "a"})
+
+    def test_redis_store(self):
+        self.check_store(RedisTokenStore(MockRedis()))
+
+
+class ClientTokenRefreshTest(unittest.TestCase):
+    def setUp(self):
+        client.QuickBooks.disable_global()
+
+    def test_start_session_refreshes(self):
+        auth_client = MockAuthClient()
+        qb_client = client.QuickBooks(auth_client=auth_client, refresh_token="refresh")
+
+        self.assertEqual(qb_client.session.access_token, "access_1")
+        self.assertIsNotNone(qb_client.token_manager)
+
+    def test_retry_after_unauthorized(self):
+        auth_client = MockAuthClient(access_token="expired")
+        qb_client = client.QuickBooks(
+            auth_client=auth_client, refresh_token="refresh", company_id="1")
+
+        responses = [MockResponse(401), MockResponse(200)]
+        with patch.object(qb_client.session, 'request', side_effect=responses) as request:
+            result = qb_client.query("SELECT * FROM Customer")
+
+        self.assertEqual(result, {"QueryResponse": {}})
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(request.call_args[1]["headers"]["Authorization"], "Bearer access_1")
+
+    def test_token_store_passed_to_manager(self):
+        store = MemoryTokenStore()
+        qb_client = client.QuickBooks(
+            auth_client=MockAuthClient(), refresh_token="refresh", token_store=store)
+
+        self.assertEqual(store.load("realm")["access_token"], "access_1")
+        self.assertIs(qb_client.token_manager.store, store)
+
+    def test_token_store_keyed_by_company(self):
+        store = MemoryTokenStore()
+        auth_client_a = MockAuthClient()
+        auth_client_b = MockAuthClient()
+        # AuthClient is usually built without realm_id
+        auth_client_a.realm_id = auth_client_b.realm_id = None
+        auth_client_b.refresh_count = 10
+
+        client_a = client.QuickBooks(
+            auth_client=auth_client_a, refresh_token="a", company_id="111", token_store=store)
+        client_b = client.QuickBooks(
+            auth_client=auth_client_b, refresh_token="b", company_id="222", token_store=store)
+
+        self.assertEqual(client_a.token_manager.key, "111")
+        self.assertEqual(client_b.token_manager.key, "222")
+        self.assertEqual(store.load("111")["access_token"], "access_1")
+        self.assertEqual(store.load("222")["access_token"], "access_11")
+        self.assertEqual(client_b.session.access_token, "access_11")
+
+        # A new worker for realm 222 picks up the tokens of realm 222
+        worker = client.QuickBooks(
+            auth_client=MockAuthClient(), company_id="222", token_store=store)
+        self.assertEqual(worker.token_manager.refresh_token, "refresh_11")
@@ -0,0 +1,80 @@
+import socket
+import unittest
+
+from quickbooks import client
+from quickbooks.transport import PooledHTTPAdapter, keep_alive_socket_options
+
+
+class MockAuthClient(object):
+    def __init__(self):
+        self.client_id = "client_id"
+        self.client_secret = "client_secret"
+        self.access_token = "access_token"
+        self.environment = client.Environments.SANDBOX
+
+
+class PooledHTTPAdapterTest(unittest.TestCase):
+    def test_keep_alive_socket_options(self):
+        options = keep_alive_socket_options()
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), options)
+
+    def test_pool_settings(self):
+        adapter = PooledHTTPAdapter(pool_connections=3, pool_maxsize=20)
+        pool = adapter.poolmanager.connection_from_host("quickbooks.api.intuit.com", 443, "https")
+
+        self.assertEqual(adapter.poolmanager.pools._maxsize, 3)
+        self.assertEqual(pool.pool.maxsize, 20)
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), pool.conn_kw["socket_options"])
+
+    def test_keep_alive_disabled(self):
+        adapter = PooledHTTPAdapter(keep_alive=False)
+        pool = adapter.poolmanager.connection_from_host("quickbooks.api.intuit.com", 443, "https")
+
+        self.assertNotIn("socket_options", pool.conn_kw)
+
+    def test_stats(self):
+        adapter = PooledHTTPAdapter()
+        self.assertEqual(adapter.stats(), {"requests": 0, "connections": 0, "hits": 0, "misses": 0})
+
+        pool = adapter.poolmanager.connection_from_host("quickbooks.api.intuit.com", 443, "https")
+        pool.num_requests = 10
+        pool.num_connections = 2
+
+        self.assertEqual(adapter.stats(),
+                         {"requests": 10, "connections": 2, "hits": 8, "misses": 2})
+
+    def test_stats_kept_for_evicted_pools(self):
+        adapter = PooledHTTPAdapter(pool_connections=1)
+
+        pool = adapter.poolmanager.connection_from_host("quickbooks.api.intuit.com", 443, "https")
+        pool.num_requests = 5
+        pool.num_connections = 1
+
+        adapter.poolmanager.connection_from_host("appcenter.intuit.com", 443, "https")
+
+        self.assertEqual(adapter.stats()["requests"], 5)
+        self.assertEqual(adapter.stats()["hits"], 4)
+
+
+class ClientTransportTest(unittest.TestCase):
+    def setUp(self):
+        client.QuickBooks.disable_global()
+
+    def test_session_uses_pooled_adapter(self):
+        qb_client = client.QuickBooks(auth_client=MockAuthClient(), pool_maxsize=25)
+
+        adapter = qb_client.session.get_adapter("https://quickbooks.api.intuit.com/v3")
+        self.assertIs(adapter, qb_client.transport_adapter)
+        self.assertEqual(adapter._pool_maxsize, 25)
+
+    def test_adapter_reused_by_new_session(self):
+        qb_client = client.QuickBooks(auth_client=MockAuthClient())
+        adapter = qb_client.transport_adapter
+
+        qb_client._start_session()
+        url = "https://quickbooks.api.intuit.com/v3"
+        self.assertIs(qb_client.session.get_adapter(url), adapter)
+
+    def test_pool_stats_without_session(self):
+        qb_client = client.QuickBooks()
+        self.assertEqual(qb_client.pool_stats()["requests"], 0)
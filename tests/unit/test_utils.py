@@ -1,5 +1,6 @@
 import unittest
 from quickbooks import utils
+from quickbooks.exceptions import QuickbooksException
 
 
 class UtilsTests(unittest.TestCase):
@@ -47,3 +48,16 @@ class UtilsTests(unittest.TestCase):
                                                  field="field1")
 
         self.assertEqual(where_clause, "field1 in ('Test - & % $', 'Another\\\'s Test')")
+
+    def test_build_select_fields(self):
+        self.assertEqual(utils.build_select_fields(["DocNumber", "Id", "MetaData.LastUpdatedTime"]),
+                         "Id, SyncToken, DocNumber, MetaData.LastUpdatedTime")
+
+    def test_build_select_fields_invalid(self):
+        self.assertRaises(QuickbooksException, utils.build_select_fields, ["Id FROM Bill"])
+        self.assertRaises(QuickbooksException, utils.build_select_fields, ["Id,DocNumber"])
+
+    def test_build_where_clause_backslash(self):
+        where_clause = utils.build_where_clause(field1="back\\' OR Id > '0")
+
+        self.assertEqual(where_clause, "field1 = 'back\\\\\\' OR Id > \\'0'")